@@ -17,7 +17,7 @@ class GameConsumer(AsyncWebsocketConsumer):
         self.game_group_name = f'game_{self.game_code}'
         
         # Log connection attempt
-        logger.info(f"WebSocket connection attempt for game: {self.game_code}")
+        logger.info("WebSocket connection attempt for game: %s", self.game_code)
         
         # Join the game group
         await self.channel_layer.group_add(
@@ -33,7 +33,7 @@ class GameConsumer(AsyncWebsocketConsumer):
             active_connections[self.game_code] = []
         active_connections[self.game_code].append(self)
         
-        logger.info(f"WebSocket connected for game: {self.game_code}")
+        logger.info("WebSocket connected for game: %s", self.game_code)
         
         # Send initial game state
         await self.send_game_state()
@@ -42,7 +42,7 @@ class GameConsumer(AsyncWebsocketConsumer):
         """
         Handle WebSocket disconnection
         """
-        logger.info(f"WebSocket disconnected for game: {self.game_code} with code: {close_code}")
+        logger.info("WebSocket disconnected for game: %s with code: %s", self.game_code, close_code)
         
         # Leave the game group
         await self.channel_layer.group_discard(
@@ -63,7 +63,7 @@ class GameConsumer(AsyncWebsocketConsumer):
         """
         try:
             text_data_json = json.loads(text_data)
-            logger.info(f"Received WebSocket message: {text_data_json}")
+            logger.debug("Received WebSocket message: %s", text_data_json)
             
             message_type = text_data_json.get('type')
             
@@ -87,7 +87,7 @@ class GameConsumer(AsyncWebsocketConsumer):
                     await self.peek_card(player, position)
             
         except json.JSONDecodeError:
-            logger.error(f"Failed to decode WebSocket message: {text_data}")
+            logger.error("Failed to decode WebSocket message: %s", text_data)
     
     async def send_game_state(self):
         """
@@ -96,7 +96,7 @@ class GameConsumer(AsyncWebsocketConsumer):
         from cameo_app.views import games
         
         if self.game_code not in games:
-            logger.error(f"Game {self.game_code} not found")
+            logger.error("Game %s not found", self.game_code)
             return
         
         game_state = games[self.game_code]
@@ -122,7 +122,7 @@ class GameConsumer(AsyncWebsocketConsumer):
         import random
         
         if self.game_code not in games:
-            logger.error(f"Game {self.game_code} not found")
+            logger.error("Game %s not found", self.game_code)
             return
         
         game_state = games[self.game_code]
@@ -155,7 +155,7 @@ class GameConsumer(AsyncWebsocketConsumer):
         import random
         
         if self.game_code not in games:
-            logger.error(f"Game {self.game_code} not found")
+            logger.error("Game %s not found", self.game_code)
             return
         
         game_state = games[self.game_code]
@@ -187,7 +187,7 @@ class GameConsumer(AsyncWebsocketConsumer):
         from cameo_app.views import games
         
         if self.game_code not in games:
-            logger.error(f"Game {self.game_code} not found")
+            logger.error("Game %s not found", self.game_code)
             return
         
         game_state = games[self.game_code]
@@ -228,7 +228,7 @@ class GameConsumer(AsyncWebsocketConsumer):
         from cameo_app.views import games
         
         if self.game_code not in games:
-            logger.error(f"Game {self.game_code} not found")
+            logger.error("Game %s not found", self.game_code)
             return
         
         game_state = games[self.game_code]
@@ -263,7 +263,7 @@ class GameConsumer(AsyncWebsocketConsumer):
         from cameo_app.views import games
         
         if self.game_code not in games:
-            logger.error(f"Game {self.game_code} not found")
+            logger.error("Game %s not found", self.game_code)
             return
         
         game_state = games[self.game_code]
@@ -291,7 +291,7 @@ class GameConsumer(AsyncWebsocketConsumer):
         from cameo_app.views import games
         
         if self.game_code not in games:
-            logger.error(f"Game {self.game_code} not found")
+            logger.error("Game %s not found", self.game_code)
             return
         
         game_state = games[self.game_code]
@@ -324,7 +324,7 @@ class GameConsumer(AsyncWebsocketConsumer):
         from cameo_app.views import games
         
         if self.game_code not in games:
-            logger.error(f"Game {self.game_code} not found")
+            logger.error("Game %s not found", self.game_code)
             return
         
         game_state = games[self.game_code]
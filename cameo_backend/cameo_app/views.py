@@ -35,8 +35,10 @@ def start_game(request):
     """
     logger.info("Start game endpoint called")
     
-    # Generate a random game code
+    # Generate a random game code that isn't already in use
     code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+    while code in games:
+        code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
     
     # Initialize game state
     games[code] = {
@@ -48,7 +50,7 @@ def start_game(request):
         'current_player': 1
     }
     
-    logger.info(f"Created new game with code: {code}")
+    logger.info("Created new game with code: %s", code)
     
     return Response({
         'code': code,
@@ -71,16 +73,16 @@ def connect_game(request):
             return Response({'error': True, 'message': 'Game code is required'})
         
         if code not in games:
-            logger.error(f"Invalid game code: {code}")
+            logger.error("Invalid game code: %s", code)
             return Response({'error': True, 'message': 'Invalid game code'})
         
         if games[code]['player2_connected']:
-            logger.error(f"Game {code} is already full")
+            logger.error("Game %s is already full", code)
             return Response({'error': True, 'message': 'Game is already full'})
         
         # Mark player 2 as connected
         games[code]['player2_connected'] = True
-        logger.info(f"Player 2 connected to game {code}")
+        logger.info("Player 2 connected to game %s", code)
         
         return Response({
             'code': code,
@@ -88,5 +90,5 @@ def connect_game(request):
         })
     
     except Exception as e:
-        logger.error(f"Error in connect_game: {str(e)}")
+        logger.error("Error in connect_game: %s", e)
         return Response({'error': True, 'message': f'Error: {str(e)}'}) 
\ No newline at end of file
@@ -12,19 +12,18 @@ import django
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
-from django.urls import path
 
 # Configure Django settings
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cameo_backend.settings')
 django.setup()
 
 # Import after Django setup
-from cameo_app.consumers import GameConsumer
+from game.routing import websocket_urlpatterns
+from game.store import get_store
 
-# Define WebSocket URL patterns
-websocket_urlpatterns = [
-    path('ws/game/<str:game_code>/', GameConsumer.as_asgi()),
-]
+# Build the game store now, so games restored from a snapshot are back
+# before the first socket is accepted.
+get_store()
 
 # Configure the ASGI application
 application = ProtocolTypeRouter({
@@ -0,0 +1,38 @@
+"""
+Channel layer selection.
+
+``CHANNEL_LAYER_BACKEND`` picks one of:
+
+* ``memory``       - ``InMemoryChannelLayer``; one process only, so it cannot
+  fan out between daphne workers.
+* ``redis``        - ``RedisChannelLayer``; per-channel Redis lists with a
+  bounded capacity and message expiry.
+* ``redis_pubsub`` - ``RedisPubSubChannelLayer``; Redis pub/sub, lower latency
+  but fire-and-forget: there is no capacity or expiry, and messages sent
+  while a worker is disconnected from Redis are lost.
+
+Kept out of settings.py so the benchmarks can build the same configuration
+for every backend.
+"""
+
+BACKENDS = ('memory', 'redis', 'redis_pubsub')
+
+
+def layer_config(backend, url, capacity=100, expiry=60, group_expiry=86400):
+    """The ``CHANNEL_LAYERS['default']`` entry for ``backend``."""
+    if backend == 'memory':
+        return {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+            'CONFIG': {'capacity': capacity, 'expiry': expiry, 'group_expiry': group_expiry},
+        }
+    if backend == 'redis':
+        return {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [url], 'capacity': capacity, 'expiry': expiry, 'group_expiry': group_expiry},
+        }
+    if backend == 'redis_pubsub':
+        return {
+            'BACKEND': 'channels_redis.pubsub.RedisPubSubChannelLayer',
+            'CONFIG': {'hosts': [url]},
+        }
+    raise ValueError(f"Unknown CHANNEL_LAYER_BACKEND: {backend!r} (expected one of {', '.join(BACKENDS)})")
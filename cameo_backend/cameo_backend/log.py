@@ -0,0 +1,52 @@
+"""
+Logging helpers for the game hot path.
+
+``QueueListenerHandler`` formats a record in the calling thread and hands the
+finished line to a background thread that does the blocking write, so a slow
+stdout never stalls the event loop. ``LazyJSON`` defers serializing large
+values until a record is actually emitted.
+"""
+import atexit
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+
+class LazyJSON:
+    """
+    Log argument rendered as JSON only if the record is emitted. Pass a
+    callable to defer building the value too.
+    """
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        value = self.value() if callable(self.value) else self.value
+        return json.dumps(value, default=str, separators=(',', ':'))
+
+
+class QueueListenerHandler(QueueHandler):
+    """
+    Non-blocking handler: records go into a bounded queue drained by a
+    ``QueueListener`` writing to ``stream`` (stderr by default). When the
+    queue is full the record is dropped and counted rather than blocking.
+    """
+
+    def __init__(self, queue_size=10000, stream=None):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.dropped = 0
+        target = logging.StreamHandler(stream or sys.stderr)
+        self.listener = QueueListener(self.queue, target)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
@@ -0,0 +1,37 @@
+"""
+WhiteNoise, able to sit in an async middleware chain.
+
+``WhiteNoiseMiddleware`` is sync-only, and one sync middleware is enough
+for Django to run an async view such as ``Matchmake`` from the shared
+thread it keeps for sync code. Every request then waits for whichever long
+poll holds that thread. This version runs async when the rest of the chain
+does, serving static files from a thread and handing everything else on
+without leaving the event loop.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        self._async = iscoroutinefunction(get_response)
+        if self._async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self._async:
+            return self._acall(request)
+        return super().__call__(request)
+
+    async def _acall(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
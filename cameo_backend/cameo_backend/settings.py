@@ -15,6 +15,8 @@ from pathlib import Path
 import dj_database_url
 from dotenv import load_dotenv
 
+from cameo_backend.channel_layers import layer_config
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -52,6 +54,7 @@ INSTALLED_APPS = [
     'whitenoise.runserver_nostatic',
     'channels',
     'cameo_app',
+    'game',
 ]
 
 # REST Framework settings
@@ -69,29 +72,104 @@ ASGI_APPLICATION = 'cameo_backend.asgi.application'
 
 # Redis configuration
 REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379')
+
+# Channel layer: 'memory', 'redis' or 'redis_pubsub' (see
+# cameo_backend.channel_layers). Uses Redis when REDIS_URL is set in the
+# environment, and the in-memory layer for local development otherwise.
+CHANNEL_LAYER_BACKEND = os.environ.get('CHANNEL_LAYER_BACKEND', 'redis' if os.environ.get('REDIS_URL') else 'memory')
+CHANNEL_LAYER_CAPACITY = int(os.environ.get('CHANNEL_LAYER_CAPACITY', 100))  # messages per channel
+CHANNEL_LAYER_EXPIRY = int(os.environ.get('CHANNEL_LAYER_EXPIRY', 60))  # seconds
+CHANNEL_LAYER_GROUP_EXPIRY = int(os.environ.get('CHANNEL_LAYER_GROUP_EXPIRY', 86400))  # seconds
 CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
-    },
+    'default': layer_config(
+        CHANNEL_LAYER_BACKEND,
+        REDIS_URL,
+        capacity=CHANNEL_LAYER_CAPACITY,
+        expiry=CHANNEL_LAYER_EXPIRY,
+        group_expiry=CHANNEL_LAYER_GROUP_EXPIRY,
+    ),
 }
 
-if REDIS_URL:
-    try:
-        CHANNEL_LAYERS = {
-            'default': {
-                'BACKEND': 'channels_redis.core.RedisChannelLayer',
-                'CONFIG': {
-                    'hosts': [REDIS_URL],
-                },
-            },
-        }
-    except:
-        # Fallback to in-memory channels if Redis isn't available
-        pass
+# Game storage: 'memory' keeps games in this process, 'redis' shares them
+# between workers through REDIS_URL.
+GAME_STORE_BACKEND = os.environ.get('GAME_STORE_BACKEND', 'memory')
+GAME_STORE_CACHE_SIZE = int(os.environ.get('GAME_STORE_CACHE_SIZE', 1024))
+GAME_STORE_CACHE_TTL = float(os.environ.get('GAME_STORE_CACHE_TTL', 0.5))  # seconds
+
+# Games are evicted once they sit untouched for longer than the TTL of their
+# phase: unjoined lobbies, in-progress games and ended games. The in-memory
+# store also caps how many games stay resident, evicting the least recently
+# used one; with Redis, key expiry and Redis's maxmemory policy do this.
+GAME_TTL_LOBBY = int(os.environ.get('GAME_TTL_LOBBY', 600))  # seconds
+GAME_TTL_IDLE = int(os.environ.get('GAME_TTL_IDLE', 3600))  # seconds
+GAME_TTL_ENDED = int(os.environ.get('GAME_TTL_ENDED', 120))  # seconds
+GAME_MAX_RESIDENT = int(os.environ.get('GAME_MAX_RESIDENT', 10000))
+GAME_SWEEP_INTERVAL = int(os.environ.get('GAME_SWEEP_INTERVAL', 30))  # seconds
+
+# In-memory games are snapshotted to this file every GAME_SNAPSHOT_INTERVAL
+# seconds and restored from it on startup, so restarts keep games alive.
+# Empty disables snapshots; the Redis store doesn't need them.
+GAME_SNAPSHOT_PATH = os.environ.get('GAME_SNAPSHOT_PATH', '')
+GAME_SNAPSHOT_INTERVAL = float(os.environ.get('GAME_SNAPSHOT_INTERVAL', 5))  # seconds
+
+# Every applied action is appended to a per-game log (files in
+# GAME_ACTION_LOG_DIR, or Redis lists with the Redis store), flushed in
+# batches every GAME_ACTION_LOG_FLUSH_INTERVAL seconds.
+GAME_ACTION_LOG_DIR = os.environ.get('GAME_ACTION_LOG_DIR', os.path.join(BASE_DIR, 'game_logs'))
+GAME_ACTION_LOG_FLUSH_INTERVAL = float(os.environ.get('GAME_ACTION_LOG_FLUSH_INTERVAL', 0.5))  # seconds
+GAME_ACTION_LOG_RETENTION = int(os.environ.get('GAME_ACTION_LOG_RETENTION', 86400))  # seconds
+
+# Each game's actions are applied in order by one task per worker; this bounds
+# how many actions may wait for it before clients are told to retry.
+GAME_ACTOR_QUEUE_SIZE = int(os.environ.get('GAME_ACTOR_QUEUE_SIZE', 64))
+GAME_ACTOR_IDLE_TIMEOUT = float(os.environ.get('GAME_ACTOR_IDLE_TIMEOUT', 30))  # seconds
+# How long an actor waits for more actions before applying and broadcasting
+# a batch, e.g. 0.005. Trades that much latency for fewer broadcasts.
+GAME_BROADCAST_WINDOW = float(os.environ.get('GAME_BROADCAST_WINDOW', 0))  # seconds
+
+# Games whose latest per-seat state projections are kept built.
+GAME_PROJECTION_CACHE_SIZE = int(os.environ.get('GAME_PROJECTION_CACHE_SIZE', 10000))
+
+# Broadcasts kept per game for clients reconnecting with ?since=, and how many
+# games keep them (least recently active dropped first).
+GAME_RESUME_BUFFER_SIZE = int(os.environ.get('GAME_RESUME_BUFFER_SIZE', 32))
+GAME_RESUME_MAX_GAMES = int(os.environ.get('GAME_RESUME_MAX_GAMES', 1000))
+
+# Frames queued per socket before a slow client's pending states are
+# coalesced (or, failing that, it is disconnected), and the per-connection
+# limit on inbound messages: GAME_ACTION_RATE a second, bursts of
+# GAME_ACTION_BURST. A rate of 0 turns the limit off.
+GAME_SOCKET_QUEUE_SIZE = int(os.environ.get('GAME_SOCKET_QUEUE_SIZE', 32))
+GAME_ACTION_RATE = float(os.environ.get('GAME_ACTION_RATE', 20))
+GAME_ACTION_BURST = int(os.environ.get('GAME_ACTION_BURST', 40))
+
+# Seconds a worker trusts its copy of a group's members read from Redis.
+# A socket joining on another worker may miss broadcasts for up to this long
+# and is sent a fresh state after it.
+GAME_GROUP_CACHE_TTL = float(os.environ.get('GAME_GROUP_CACHE_TTL', 1.0))
+
+# Spectators of a game are spread over this many groups, and each worker
+# accepts at most GAME_MAX_WATCHERS of them (measure with bench_watchers).
+GAME_SPECTATOR_SHARDS = int(os.environ.get('GAME_SPECTATOR_SHARDS', 4))
+GAME_MAX_WATCHERS = int(os.environ.get('GAME_MAX_WATCHERS', 2000))
+
+# Quick match (/api/matchmake/): how long a request waits for an opponent
+# before answering with a ticket to poll again with, and the width of the
+# rating buckets players are paired within.
+GAME_MATCH_WAIT = float(os.environ.get('GAME_MATCH_WAIT', 25))  # seconds
+GAME_MATCH_BUCKET_SIZE = int(os.environ.get('GAME_MATCH_BUCKET_SIZE', 200))
+
+# Bot opponents (StartGame with {"bot": true}): seconds of simulation per
+# move, processes the simulations run in, bots allowed per worker, and how
+# long a bot waits for a move from its opponent before leaving.
+GAME_BOT_THINK_TIME = float(os.environ.get('GAME_BOT_THINK_TIME', 0.3))  # seconds
+GAME_BOT_WORKERS = int(os.environ.get('GAME_BOT_WORKERS', 2))
+GAME_BOT_MAX = int(os.environ.get('GAME_BOT_MAX', 100))
+GAME_BOT_IDLE_TIMEOUT = float(os.environ.get('GAME_BOT_IDLE_TIMEOUT', 600))  # seconds
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'cameo_backend.middleware.AsyncWhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -193,27 +271,24 @@ WHITENOISE_MAX_AGE = 31536000  # 1 year in seconds
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-# Channel layers for WebSockets
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
-    },
-}
-
 # Logging configuration
+# Records are formatted in the calling thread and written by a background
+# thread (see cameo_backend.log), so logging never blocks the event loop.
+# Per-action game logs are DEBUG; keep LOG_LEVEL at INFO in production.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'formatters': {
         'verbose': {
-            'format': '{levelname} {asctime} {module} {message}',
+            'format': '{levelname} {asctime} {name} {message}',
             'style': '{',
         },
     },
     'handlers': {
         'console': {
-            'level': 'DEBUG',
-            'class': 'logging.StreamHandler',
+            'class': 'cameo_backend.log.QueueListenerHandler',
             'formatter': 'verbose',
         },
     },
@@ -225,8 +300,13 @@ LOGGING = {
         },
         'cameo_app': {
             'handlers': ['console'],
-            'level': 'DEBUG',
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        'game': {
+            'handlers': ['console'],
+            'level': LOG_LEVEL,
             'propagate': False,
         },
     },
-}
\ No newline at end of file
+}
@@ -19,11 +19,17 @@ from django.urls import path, include
 from django.views.generic import TemplateView
 from django.conf import settings
 from django.conf.urls.static import static
+from game.views import Matchmake, ReplayGame, metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', TemplateView.as_view(template_name='react.html'), name='react'),
+    # The game app serves start/connect; cameo_app still answers health checks.
+    path('api/', include('game.urls')),
     path('', include('cameo_app.urls')), # Include our app URLs
+    path('api/metrics', metrics_view, name='metrics'),
+    path('api/replay/<str:code>/', ReplayGame.as_view(), name='replay-game'),
+    path('api/matchmake/', Matchmake.as_view(), name='matchmake'),
 ]
 
 # Add static file serving
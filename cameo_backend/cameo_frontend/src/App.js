@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import './App.css';
 import config from './config';
@@ -10,12 +10,12 @@ function App() {
   const [connected, setConnected] = useState(false);
   const [gameState, setGameState] = useState(null);
   const [ws, setWs] = useState(null);
+  // seq of the last frame received, so a reconnect only replays what we missed
+  const lastSeq = useRef(null);
 
   // Game state variables
   const [player1Cards, setPlayer1Cards] = useState([]);
   const [player2Cards, setPlayer2Cards] = useState([]);
-  const [player1Peeked, setPlayer1Peeked] = useState([]);
-  const [player2Peeked, setPlayer2Peeked] = useState([]);
   const [currentPlayer, setCurrentPlayer] = useState(1);
   const [gameStarted, setGameStarted] = useState(false);
   const [drawnCard, setDrawnCard] = useState(null);
@@ -28,15 +28,15 @@ function App() {
   const [player2Sum, setPlayer2Sum] = useState(0);
   const [revealAll, setRevealAll] = useState(false);
 
-  const startGame = async () => {
-    console.log("🔍 startGame function called");
+  const startGame = async (bot = false) => {
+    console.log("🔍 startGame function called", bot ? "against a bot" : "");
     try {
       console.log("🔍 Making axios POST request to:", `${config.API_BASE_URL}/api/start/`);
-      const response = await axios.post(`${config.API_BASE_URL}/api/start/`, {});
+      const response = await axios.post(`${config.API_BASE_URL}/api/start/`, { bot });
       console.log("✅ Start API response:", response.data);
       setGameCode(response.data.code);
       setPlayer(1);
-      connectWebSocket(response.data.code);
+      connectWebSocket(response.data.code, 1, response.data.token);
     } catch (error) {
       console.error('🚨 Start Game Error:', error);
       if (error.response) {
@@ -52,13 +52,13 @@ function App() {
         const fetchResponse = await fetch(`${window.location.origin}/api/start/`, {
           method: 'POST',
           headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({})
+          body: JSON.stringify({ bot })
         });
         const data = await fetchResponse.json();
         console.log("✅ Direct fetch for start successful:", data);
         setGameCode(data.code);
         setPlayer(1);
-        connectWebSocket(data.code);
+        connectWebSocket(data.code, 1, data.token);
       } catch (fetchError) {
         console.error('🚨 Start fetch fallback also failed:', fetchError);
         alert('Failed to start game. Please try again.');
@@ -66,6 +66,29 @@ function App() {
     }
   };
 
+  const quickMatch = async () => {
+    console.log("🔍 quickMatch function called");
+    let ticket = null;
+    try {
+      // Each request waits on the server for an opponent; a 202 hands back
+      // our ticket, and posting it again keeps our place in the queue.
+      for (;;) {
+        const response = await axios.post(`${config.API_BASE_URL}/api/matchmake/`, ticket ? { ticket } : {});
+        console.log("✅ Matchmake API response:", response.data);
+        if (response.data.code) {
+          setGameCode(response.data.code);
+          setPlayer(response.data.player);
+          connectWebSocket(response.data.code, response.data.player, response.data.token);
+          return;
+        }
+        ticket = response.data.ticket;
+      }
+    } catch (error) {
+      console.error('🚨 Quick Match Error:', error);
+      alert('Failed to find a game. Please try again.');
+    }
+  };
+
   const connectGame = async () => {
     console.log("🔍 connectGame function called with code:", gameCode);
     try {
@@ -74,7 +97,7 @@ function App() {
       console.log("✅ Connect API response:", response.data);
       if (!response.data.error) {
         setPlayer(2);
-        connectWebSocket(response.data.code);
+        connectWebSocket(response.data.code, 2, response.data.token);
       } else {
         alert('Invalid or full game code');
       }
@@ -99,7 +122,7 @@ function App() {
         console.log("✅ Direct fetch for connect successful:", data);
         if (!data.error) {
           setPlayer(2);
-          connectWebSocket(data.code);
+          connectWebSocket(data.code, 2, data.token);
         } else {
           alert('Invalid or full game code');
         }
@@ -110,10 +133,43 @@ function App() {
     }
   };
 
-  const connectWebSocket = (code) => {
+  // Cards arrive as [rank, suit], or null for a card this seat hasn't seen
+  const handleMessage = (data) => {
+    if (data.seq !== undefined) lastSeq.current = data.seq;
+    if (data.error) {
+      console.warn('⚠️ Action rejected:', data.error);
+    } else if (data.type === 'game_state') {
+      setPlayer1Cards(data.player1_cards);
+      setPlayer2Cards(data.player2_cards || []);
+      setCurrentPlayer(data.current_player);
+      setGameStarted(data.game_started);
+      if (data.drawn_card !== undefined) setDrawnCard(data.drawn_card);
+      if (data.drawn_by !== undefined) setDrawnBy(data.drawn_by);
+      setRevealAll(data.reveal_all || false);
+    } else if (data.type === 'game_update') {
+      setDrawnCard(data.card);
+      setDrawnBy(data.player);
+      setPlayer1Discarded(false);
+      setPlayer2Discarded(false);
+    } else if (data.type === 'game_end') {
+      setPlayer1Cards(data.player1_cards);
+      setPlayer2Cards(data.player2_cards);
+      setPlayer1Sum(data.player1_sum);
+      setPlayer2Sum(data.player2_sum);
+      setWinner(data.winner);
+      setGameEnded(true);
+      setDrawnCard(null);
+      setDrawnBy(null);
+      setPlayer1Discarded(false);
+      setPlayer2Discarded(false);
+      setRevealAll(data.reveal_all !== undefined ? data.reveal_all : true);
+    }
+  };
+
+  const connectWebSocket = (code, seat, token) => {
     console.log("🔍 connectWebSocket function called with code:", code);
     try {
-      const wsUrl = config.getWebSocketURL(code);
+      const wsUrl = config.getWebSocketURL(code, seat, token, lastSeq.current);
       console.log("🔍 Creating WebSocket connection to:", wsUrl);
       const websocket = new WebSocket(wsUrl);
       
@@ -125,34 +181,7 @@ function App() {
         try {
           const data = JSON.parse(e.data);
           console.log('📩 WebSocket Message:', JSON.stringify(data));
-          if (data.type === 'game_state') {
-            setPlayer1Cards(data.player1_cards);
-            setPlayer2Cards(data.player2_cards || []);
-            setPlayer1Peeked(data.player1_peeked);
-            setPlayer2Peeked(data.player2_peeked || []);
-            setCurrentPlayer(data.current_player);
-            setGameStarted(data.game_started);
-            if (data.drawn_card !== undefined) setDrawnCard(data.drawn_card);
-            if (data.drawn_by !== undefined) setDrawnBy(data.drawn_by);
-            setRevealAll(data.reveal_all || false);
-          } else if (data.type === 'game_update') {
-            setDrawnCard(data.card);
-            setDrawnBy(data.player);
-            setPlayer1Discarded(false);
-            setPlayer2Discarded(false);
-          } else if (data.type === 'game_end') {
-            setPlayer1Cards(data.player1_cards);
-            setPlayer2Cards(data.player2_cards);
-            setPlayer1Sum(data.player1_sum);
-            setPlayer2Sum(data.player2_sum);
-            setWinner(data.winner);
-            setGameEnded(true);
-            setDrawnCard(null);
-            setDrawnBy(null);
-            setPlayer1Discarded(false);
-            setPlayer2Discarded(false);
-            setRevealAll(data.reveal_all !== undefined ? data.reveal_all : true);
-          }
+          handleMessage(data);
         } catch (err) {
           console.error('🚨 Error processing WebSocket message:', err);
           console.log('📩 Raw message data:', e.data);
@@ -165,6 +194,10 @@ function App() {
       
       websocket.onclose = (e) => {
         console.log('🔌 WebSocket closed with code:', e.code, 'reason:', e.reason);
+        if (!websocket.closedByClient) {
+          // Dropped: reconnect and pick up from the last frame we got
+          setTimeout(() => connectWebSocket(code, seat, token), 1000);
+        }
       };
       
       setWs(websocket);
@@ -175,7 +208,8 @@ function App() {
       try {
         console.log("🔄 Trying fallback WebSocket connection");
         const fallbackUrl = (window.location.protocol === 'https:' ? 'wss://' : 'ws://') + 
-                            window.location.host + '/ws/game/' + code + '/';
+                            window.location.host + '/ws/game/' + code + '/?player=' + seat + '&token=' + encodeURIComponent(token) +
+                            (lastSeq.current !== null ? '&since=' + lastSeq.current : '');
         console.log("🔍 Fallback WebSocket URL:", fallbackUrl);
         
         const fallbackWs = new WebSocket(fallbackUrl);
@@ -183,35 +217,7 @@ function App() {
         fallbackWs.onmessage = (e) => {
           const data = JSON.parse(e.data);
           console.log('📩 Fallback WebSocket Message:', data);
-          // Same handlers as above
-          if (data.type === 'game_state') {
-            setPlayer1Cards(data.player1_cards);
-            setPlayer2Cards(data.player2_cards || []);
-            setPlayer1Peeked(data.player1_peeked);
-            setPlayer2Peeked(data.player2_peeked || []);
-            setCurrentPlayer(data.current_player);
-            setGameStarted(data.game_started);
-            if (data.drawn_card !== undefined) setDrawnCard(data.drawn_card);
-            if (data.drawn_by !== undefined) setDrawnBy(data.drawn_by);
-            setRevealAll(data.reveal_all || false);
-          } else if (data.type === 'game_update') {
-            setDrawnCard(data.card);
-            setDrawnBy(data.player);
-            setPlayer1Discarded(false);
-            setPlayer2Discarded(false);
-          } else if (data.type === 'game_end') {
-            setPlayer1Cards(data.player1_cards);
-            setPlayer2Cards(data.player2_cards);
-            setPlayer1Sum(data.player1_sum);
-            setPlayer2Sum(data.player2_sum);
-            setWinner(data.winner);
-            setGameEnded(true);
-            setDrawnCard(null);
-            setDrawnBy(null);
-            setPlayer1Discarded(false);
-            setPlayer2Discarded(false);
-            setRevealAll(data.reveal_all !== undefined ? data.reveal_all : true);
-          }
+          handleMessage(data);
         };
         fallbackWs.onerror = (e) => console.error('🚨 Fallback WebSocket Error:', e);
         fallbackWs.onclose = () => console.log('🔌 Fallback WebSocket closed');
@@ -238,37 +244,55 @@ function App() {
     }
   };
 
-  const startGameAction = () => {
-    sendGameAction('start_game');
-  };
+  const isMyTurn = gameStarted && currentPlayer === player;
+  const holdingCard = isMyTurn && drawnBy === player;
 
   const drawCard = () => {
-    if (currentPlayer !== player) return;
-    sendGameAction('draw_card');
+    if (!isMyTurn || holdingCard) return;
+    sendGameAction('draw');
   };
 
-  const keepCard = () => {
-    if (drawnBy !== player) return;
-    sendGameAction('keep_card');
+  const discardCard = () => {
+    if (!holdingCard) return;
+    sendGameAction('discard');
   };
 
-  const discardCard = () => {
-    if (drawnBy !== player) return;
-    sendGameAction('discard_card');
+  const endGame = () => {
+    if (!isMyTurn || holdingCard) return;
+    sendGameAction('end_game');
   };
 
-  const peekCard = (position) => {
-    sendGameAction('peek_card', { position });
+  // Before the game starts: look at your bottom two cards. On your turn:
+  // put a drawn card in place of one of yours, or spend the turn looking
+  // at one of your cards or one of your opponent's.
+  const clickCard = (owner, position, card) => {
+    if (owner === player) {
+      if (!gameStarted) {
+        if (position >= 2 && card === null) sendGameAction('peek_own', { position });
+      } else if (holdingCard) {
+        sendGameAction('replace', { position });
+      } else if (isMyTurn) {
+        sendGameAction('peek_own', { position });
+      }
+    } else if (isMyTurn && !holdingCard) {
+      sendGameAction('peek_opponent', { position });
+    }
   };
 
   const handleGameCodeChange = (e) => {
     setGameCode(e.target.value.toUpperCase());
   };
 
+  const closeWebSocket = (socket) => {
+    socket.closedByClient = true;
+    socket.close();
+  };
+
   const resetGame = () => {
     if (ws) {
-      ws.close();
+      closeWebSocket(ws);
     }
+    lastSeq.current = null;
     setGameCode('');
     setPlayer(0);
     setGameStarted(false);
@@ -284,29 +308,29 @@ function App() {
   useEffect(() => {
     return () => {
       if (ws) {
-        ws.close();
+        closeWebSocket(ws);
       }
     };
   }, [ws]);
 
-  const renderCard = (card, index, isPlayerCard, isPeeked) => {
-    const isRevealed = revealAll || isPeeked;
+  const SUITS = { H: '♥', D: '♦', C: '♣', S: '♠' };
+
+  const formatCard = (card) => (card ? `${card[0]}${SUITS[card[1]]}` : '?');
+
+  const renderCard = (card, index, owner) => {
+    const isRevealed = revealAll || card !== null;
     return (
       <div 
         key={index} 
         className={`card ${isRevealed ? 'revealed' : ''}`}
-        onClick={() => isPlayerCard && !isRevealed && peekCard(index)}
+        onClick={() => !gameEnded && clickCard(owner, index, card)}
       >
-        {isRevealed ? card : '?'}
+        {formatCard(card)}
       </div>
     );
   };
 
   const renderGameBoard = () => {
-    const isMyTurn = currentPlayer === player;
-    const canDraw = isMyTurn && drawnCard === null;
-    const canKeepOrDiscard = drawnBy === player && drawnCard !== null;
-    
     return (
       <div className="game-board">
         {gameEnded ? (
@@ -314,7 +338,7 @@ function App() {
             <h2>Game Over!</h2>
             <p>Player 1 Sum: {player1Sum}</p>
             <p>Player 2 Sum: {player2Sum}</p>
-            <p>Winner: {winner === 0 ? 'Tie!' : `Player ${winner}`}</p>
+            <p>Winner: {winner === 'Tie' ? 'Tie!' : winner}</p>
             <button onClick={resetGame}>New Game</button>
           </div>
         ) : (
@@ -329,7 +353,7 @@ function App() {
               <h3>Player 1 Cards</h3>
               <div className="player-cards">
                 {player1Cards.map((card, index) => 
-                  renderCard(card, index, player === 1, player1Peeked.includes(index))
+                  renderCard(card, index, 1)
                 )}
               </div>
             </div>
@@ -338,26 +362,29 @@ function App() {
               <h3>Player 2 Cards</h3>
               <div className="player-cards">
                 {player2Cards.map((card, index) => 
-                  renderCard(card, index, player === 2, player2Peeked.includes(index))
+                  renderCard(card, index, 2)
                 )}
               </div>
             </div>
             
             <div className="game-actions">
-              {!gameStarted && player === 1 && (
-                <button onClick={startGameAction}>Start Game</button>
+              {!gameStarted && (
+                <p>Click your bottom two cards to look at them; the game starts once both players have.</p>
               )}
               
-              {gameStarted && canDraw && (
-                <button onClick={drawCard}>Draw Card</button>
+              {isMyTurn && !holdingCard && (
+                <div className="card-actions">
+                  <button onClick={drawCard}>Draw Card</button>
+                  <button onClick={endGame}>End Game</button>
+                </div>
               )}
               
               {drawnCard !== null && (
                 <div className="drawn-card">
-                  <p>Drawn Card: {drawnCard}</p>
-                  {canKeepOrDiscard && (
+                  <p>Drawn Card: {formatCard(drawnCard)}</p>
+                  {holdingCard && (
                     <div className="card-actions">
-                      <button onClick={keepCard}>Keep Card</button>
+                      <p>Click one of your cards to swap it for this one, or</p>
                       <button onClick={discardCard}>Discard Card</button>
                     </div>
                   )}
@@ -381,7 +408,9 @@ function App() {
           <div className="game-start-options">
             <div className="start-game-option">
               <h2>Start New Game</h2>
-              <button onClick={startGame}>Start Game</button>
+              <button onClick={() => startGame()}>Start Game</button>
+              <button onClick={() => startGame(true)}>Play the Computer</button>
+              <button onClick={quickMatch}>Quick Match</button>
             </div>
             
             <div className="connect-game-option">
@@ -12,25 +12,27 @@ const API_BASE_URL = isProduction
   ? window.location.origin 
   : 'http://127.0.0.1:8000';
 
-// WebSocket URL generator
-const getWebSocketURL = (code) => {
+// WebSocket URL generator; `token` is the seat token the game API returned.
+// Pass the last frame's seq as `since` when reconnecting
+const getWebSocketURL = (code, player, token, since = null) => {
   // Determine WebSocket protocol based on page protocol
   const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+  const query = `?player=${player}&token=${encodeURIComponent(token)}` + (since !== null ? `&since=${since}` : '');
   
   // In production, use the same host as the page
   if (isProduction) {
-    return `${protocol}//${window.location.host}/ws/game/${code}/`;
+    return `${protocol}//${window.location.host}/ws/game/${code}/${query}`;
   }
   
   // In development, use localhost:8000
-  return `ws://127.0.0.1:8000/ws/game/${code}/`;
+  return `ws://127.0.0.1:8000/ws/game/${code}/${query}`;
 };
 
 // Log configuration for debugging
 console.log('📝 Configuration loaded:');
 console.log('📝 isProduction:', isProduction);
 console.log('📝 API_BASE_URL:', API_BASE_URL);
-console.log('📝 WebSocket URL example:', getWebSocketURL('TEST123'));
+console.log('📝 WebSocket URL example:', getWebSocketURL('TEST123', 1, 'TOKEN'));
 
 // Export the configuration
 const config = {
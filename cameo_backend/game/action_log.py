@@ -0,0 +1,242 @@
+"""
+Append-only action log per game, and replay.
+
+A game's log starts with its initial state (``GameState.to_bytes`` right
+after creation, version 1). Every save after that adds one entry: the
+version it produced and the actions applied to get there, in order. Replay
+decodes the initial state and feeds the actions back through
+``engine.apply``; the rules are deterministic given the state (the deck is
+part of it), so replay rebuilds any version exactly.
+
+Recording only appends to an in-process buffer. A background thread flushes
+the buffer every ``flush_interval`` seconds, writing all pending entries of a
+game in one go, so the event loop never waits on disk or Redis.
+
+Sinks follow ``GAME_STORE_BACKEND``: one append-only file per game under
+``GAME_ACTION_LOG_DIR`` for ``memory``, a Redis list per game for ``redis``.
+Logs are kept for ``GAME_ACTION_LOG_RETENTION`` seconds after their last
+write. Codes are reused, so starting a new game's log first deletes
+whatever log its code still had. That delete happens straight away rather
+than on the next flush (``create_game`` runs it before anyone has the code,
+and off the event loop), so it can't wipe records other workers flushed for
+the new game.
+"""
+import atexit
+import logging
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+
+import msgpack
+from django.conf import settings
+
+from .engine import ActionError, apply
+from .state import GameState, join_game
+
+logger = logging.getLogger(__name__)
+
+_RECORD = struct.Struct('<BI')
+_START, _ACTIONS = 1, 2
+
+# Logged in place of a client action when player 2 joins (see state.join_game).
+JOIN = {'action': '_join'}
+
+
+def _record(kind, body):
+    return _RECORD.pack(kind, len(body)) + body
+
+
+def _parse(data):
+    """Yield ``(kind, body)`` for every complete record in ``data``."""
+    offset = 0
+    while offset + _RECORD.size <= len(data):
+        kind, length = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        if offset + length > len(data):
+            return  # Torn write at the end
+        yield kind, bytes(data[offset:offset + length])
+        offset += length
+
+
+class FileLogSink:
+    def __init__(self, directory, retention):
+        self.directory = directory
+        self.retention = retention
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, code):
+        return os.path.join(self.directory, f'{code}.log')
+
+    def append(self, code, records):
+        with open(self._path(code), 'ab') as f:
+            f.write(b''.join(records))
+
+    def delete(self, code):
+        try:
+            os.remove(self._path(code))
+        except FileNotFoundError:
+            pass
+
+    def read(self, code):
+        try:
+            with open(self._path(code), 'rb') as f:
+                return list(_parse(f.read()))
+        except FileNotFoundError:
+            return []
+
+    def expire(self):
+        cutoff = time.time() - self.retention
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.log') and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+
+
+class RedisLogSink:
+    def __init__(self, url, retention, prefix='cameo:log:'):
+        import redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.retention = retention
+        self.prefix = prefix
+
+    def append(self, code, records):
+        key = f'{self.prefix}{code}'
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.rpush(key, *records)
+        pipe.expire(key, self.retention)
+        pipe.execute()
+
+    def delete(self, code):
+        self.redis.delete(f'{self.prefix}{code}')
+
+    def read(self, code):
+        records = []
+        for item in self.redis.lrange(f'{self.prefix}{code}', 0, -1):
+            records.extend(_parse(item))
+        return records
+
+    def expire(self):
+        pass  # Key TTLs do it
+
+
+class ActionLog:
+    def __init__(self, sink, flush_interval=0.5):
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self._pending = defaultdict(list)  # code -> encoded records
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def record_start(self, game):
+        """
+        Start ``game``'s log, first deleting whatever an earlier game with the
+        same code left. Called before the code is handed out, so no worker
+        can have logged anything for this game yet.
+        """
+        # Under the flush lock, so a flush already under way can't write the
+        # old game's records after the delete.
+        with self._flush_lock:
+            with self._lock:
+                self._pending.pop(game.code, None)
+            self.sink.delete(game.code)
+        self._add(game.code, _record(_START, game.to_bytes()))
+
+    def record(self, code, version, actions):
+        self._add(code, _record(_ACTIONS, msgpack.packb([version, actions])))
+
+    def _add(self, code, record):
+        with self._lock:
+            self._pending[code].append(record)
+
+    def flush(self):
+        # One flush at a time, so a game's records reach the sink in order.
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, defaultdict(list)
+            for code, records in pending.items():
+                try:
+                    self.sink.append(code, records)
+                except Exception:
+                    logger.exception("Game %s: lost %d action log record(s)", code, len(records))
+
+    def entries(self, code):
+        """``(initial state bytes or None, [(version, actions), ...])`` sorted by version."""
+        self.flush()
+        start, entries = None, []
+        for kind, body in self.sink.read(code):
+            if kind == _START:
+                start = body
+            elif kind == _ACTIONS:
+                version, actions = msgpack.unpackb(body)
+                entries.append((version, actions))
+        entries.sort(key=lambda entry: entry[0])
+        return start, entries
+
+    def replay(self, code, version=None):
+        """
+        The game as it was at ``version`` (the latest logged one by default),
+        or None when the log doesn't reach back to the game's creation.
+        """
+        start, entries = self.entries(code)
+        if start is None:
+            return None
+        game = GameState.from_bytes(start)
+        for entry_version, actions in entries:
+            if version is not None and entry_version > version:
+                break
+            for data in actions:
+                if data == JOIN:
+                    join_game(game)
+                    continue
+                if game.game_ended:
+                    break
+                try:
+                    game, _ = apply(game, data)
+                except ActionError:
+                    pass  # Rejected the same way live
+                except Exception:
+                    logger.exception("Game %s: failed to replay %s at v%s", code, data.get('action'), entry_version)
+                    raise
+            game.version = entry_version
+        return game
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._flush_forever, name='game-action-log', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _flush_forever(self):
+        last_expiry = time.monotonic()
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+            if time.monotonic() - last_expiry > 60:
+                last_expiry = time.monotonic()
+                try:
+                    self.sink.expire()
+                except Exception:
+                    logger.exception("Action log expiry failed")
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_action_log():
+    """Return the process-wide action log for ``GAME_STORE_BACKEND``."""
+    global _log
+    if _log is None:
+        with _log_lock:
+            if _log is None:
+                retention = getattr(settings, 'GAME_ACTION_LOG_RETENTION', 86400)
+                if getattr(settings, 'GAME_STORE_BACKEND', 'memory') == 'redis':
+                    sink = RedisLogSink(settings.REDIS_URL, retention)
+                else:
+                    sink = FileLogSink(getattr(settings, 'GAME_ACTION_LOG_DIR', 'game_logs'), retention)
+                _log = ActionLog(sink, getattr(settings, 'GAME_ACTION_LOG_FLUSH_INTERVAL', 0.5))
+                _log.start()
+    return _log
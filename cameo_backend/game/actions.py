@@ -0,0 +1,88 @@
+"""
+Client actions over the wire.
+
+``apply_action`` runs a client message through ``engine.apply`` and turns
+the resulting events into the messages broadcast to the game's seats. It
+also logs, counts and times every action, which the engine itself never
+does.
+
+Rejections raise ``ActionError`` with a short code, which clients receive as
+``{"error": "<code>"}``:
+
+* ``bad_message``: not a JSON object / msgpack map
+* ``unknown_action``
+* ``bad_<field>``: a field is missing or out of range, e.g. ``bad_position``
+* ``not_your_seat``: ``player`` isn't the seat the socket connected as
+* ``not_started`` / ``game_ended``: wrong phase for the action
+* ``not_joined``: player 2 acting before joining
+* ``not_your_turn``, ``no_drawn_card``, ``already_drawn``, ``already_peeked``,
+  ``deck_empty``
+* ``busy``, ``rate_limited``: retry later (see ``actors``, ``backpressure``)
+* ``internal_error``: a bug; logged server-side
+"""
+import logging
+import time
+
+from . import engine, metrics
+from .engine import ActionError  # noqa: F401  (raised to callers of apply_action)
+from .state import card_to_wire, hand_to_wire, peeked_to_wire
+
+logger = logging.getLogger(__name__)
+
+
+def state_message(game):
+    """Full, unprojected state. Clients get ``projections.project`` instead."""
+    return {
+        'type': 'game_state',
+        'player1_cards': hand_to_wire(game.player1_cards),
+        'player2_cards': hand_to_wire(game.player2_cards) or [],
+        'player1_peeked': peeked_to_wire(game.player1_peeked),
+        'player2_peeked': peeked_to_wire(game.player2_peeked) or [],
+        'current_player': game.current_player,
+        'game_started': game.game_started,
+        'drawn_card': card_to_wire(game.drawn_card),
+        'drawn_by': game.drawn_by,
+        'reveal_all': game.reveal_all,
+        'version': game.version
+    }
+
+
+def _message(game, event):
+    kind = event[0]
+    if kind == engine.CHANGED:
+        return state_message(game)
+    if kind == engine.DREW:
+        return {'type': 'game_update', 'card': card_to_wire(event[2]), 'player': event[1]}
+    _, winner, p1_sum, p2_sum = event
+    return {
+        'type': 'game_end',
+        'player1_cards': hand_to_wire(game.player1_cards),
+        'player2_cards': hand_to_wire(game.player2_cards),
+        'player1_sum': p1_sum,
+        'player2_sum': p2_sum,
+        'winner': winner,
+        'reveal_all': game.reveal_all
+    }
+
+
+def apply_action(game, data):
+    """
+    Apply one client action to ``game``. Returns the new state and the
+    messages to broadcast; ``game`` itself is left as it was. Raises
+    ``ActionError`` when the action is malformed or not allowed right now.
+    """
+    started = time.perf_counter()
+    try:
+        new, events = engine.apply(game, data)
+    except ActionError as e:
+        metrics.actions_rejected.inc(code=e.code)
+        raise
+    action = data['action']
+    metrics.action_apply_latency.observe(time.perf_counter() - started, action=action)
+
+    logger.debug("Game %s: applied %s from player %s", game.code, action, data['player'])
+    if new.game_started and not game.game_started:
+        logger.info("Game %s started: both players have peeked their bottom cards", game.code)
+    if new.game_ended:
+        logger.info("Game %s ended by player %s: %s", game.code, data['player'], new.winner)
+    return new, [_message(new, event) for event in events]
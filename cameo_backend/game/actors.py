@@ -0,0 +1,234 @@
+"""
+Per-game command actors.
+
+Every game gets a single asyncio task that owns all writes to it from this
+process. Consumers drop actions into the actor's bounded queue and return;
+the actor applies them strictly in arrival order, so two players clicking at
+the same time can no longer interleave half-applied updates. Actions that
+pile up while a batch is being processed are applied together and share one
+broadcast. With ``GAME_BROADCAST_WINDOW`` set, the actor also waits that long
+after the first action of a batch, so bursts arriving within a few
+milliseconds of each other share it too.
+
+A broadcast is one group event per seat: when it has several frames (a draw
+sends ``game_update`` and then ``game_state``) they travel together as a
+``game_batch``. The players' events are sent by the actor itself. The
+spectators' event goes to the actor's fan-out task, which sends it to every
+spectator shard, so however many people are watching, the players' next
+broadcast never waits for them. If the task is still sending when the next
+broadcast comes, the event waiting for it is replaced: spectators skip to
+the newest state rather than fall further behind.
+
+Cross-worker ordering is still handled by the store's compare-and-set: a
+batch that loses the race is re-applied to the fresh state.
+"""
+import asyncio
+import logging
+import time
+
+from django.conf import settings
+
+from . import groups, history, metrics
+from .action_log import get_action_log
+from .actions import ActionError, apply_action
+from .frames import state_patch
+from .projections import SEATS, project, project_message, seat_group, spectator_groups
+from .store import get_store, CAS_RETRIES
+
+logger = logging.getLogger(__name__)
+
+_actors = {}
+
+
+class GameActor:
+    def __init__(self, code, queue_size, idle_timeout, window=0):
+        self.code = code
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.idle_timeout = idle_timeout
+        self.window = window
+        self.task = None
+        # Last game_state this actor broadcast to each seat, used as the base
+        # for patches.
+        self.last_states = {}
+        # Spectator event waiting for the fan-out task
+        self.spectator_event = None
+        self.spectator_task = None
+
+    def submit(self, data, reply):
+        """
+        Queue ``data`` for this game. ``reply`` is the submitting consumer's
+        ``send_message`` and receives errors for this action only. Returns
+        False when the queue is full.
+        """
+        try:
+            self.queue.put_nowait((data, reply, time.perf_counter()))
+        except asyncio.QueueFull:
+            return False
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self._run())
+        return True
+
+    async def _run(self):
+        try:
+            while True:
+                try:
+                    batch = [await asyncio.wait_for(self.queue.get(), self.idle_timeout)]
+                except asyncio.TimeoutError:
+                    return
+                if self.window:
+                    await asyncio.sleep(self.window)
+                while not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                try:
+                    await self._process(batch)
+                except Exception:
+                    logger.exception("Game %s: failed to process %d action(s)", self.code, len(batch))
+        finally:
+            # Nothing can be queued between the timeout and this point (no
+            # await in between), so retiring here never strands an action.
+            if _actors.get(self.code) is self:
+                del _actors[self.code]
+
+    async def _process(self, batch):
+        store = get_store()
+        for _ in range(CAS_RETRIES):
+            game = await store.aget(self.code)
+            if game is None:
+                logger.info("Game %s: rejecting %d action(s) for unknown game", self.code, len(batch))
+                for _, reply, _ in batch:
+                    await reply({'type': 'error', 'code': 'no_game'})
+                return
+            base_version = game.version
+            messages = []
+            errors = []
+            applied = []
+            logged = []
+            for data, reply, _ in batch:
+                try:
+                    game, result = apply_action(game, data)
+                except ActionError as e:
+                    errors.append((reply, e.code))
+                    continue
+                except Exception:
+                    logger.exception("Game %s: failed to apply %s", self.code, data.get('action'))
+                    errors.append((reply, 'internal_error'))
+                    continue
+                messages.extend(result)
+                logged.append(data)
+                applied.append(data['action'])
+            if not messages or await store.asave(game):
+                break
+        else:
+            messages = []
+            applied = []
+            errors = [(reply, 'busy') for _, reply, _ in batch]
+
+        for action in applied:
+            metrics.actions_processed.inc(action=action)
+
+        for reply, error in errors:
+            await reply({'error': error})
+
+        if not messages:
+            return
+        get_action_log().record(self.code, game.version, logged)
+        messages = _coalesce(messages)
+        seqs = [history.frame_seq(game.version, i, len(messages)) for i in range(len(messages))]
+        broadcast = {}
+        for seat in SEATS:
+            patch = self._patch(seat, project(game, seat), base_version)
+            broadcast[seat] = [
+                _event(project_message(message, game, seat), game.version, patch, seq)
+                for message, seq in zip(messages, seqs)
+            ]
+        history.record(self.code, base_version, game.version, broadcast)
+        for seat, events in broadcast.items():
+            event = events[0] if len(events) == 1 else {'type': 'game_batch', 'events': events}
+            if seat == 'spectator':
+                self._watch(event)
+                continue
+            started = time.perf_counter()
+            await groups.group_send(seat_group(self.code, seat), event)
+            metrics.group_send_latency.observe(time.perf_counter() - started)
+
+        sent = time.perf_counter()
+        for _, _, queued_at in batch:
+            metrics.action_latency.observe(sent - queued_at)
+
+    def _watch(self, event):
+        """Hand ``event`` to the spectator fan-out, replacing one still waiting."""
+        if self.spectator_event is not None:
+            metrics.spectator_broadcasts_superseded.inc()
+        self.spectator_event = event
+        if self.spectator_task is None or self.spectator_task.done():
+            self.spectator_task = asyncio.get_running_loop().create_task(self._fan_out())
+
+    async def _fan_out(self):
+        while self.spectator_event is not None:
+            event, self.spectator_event = self.spectator_event, None
+            started = time.perf_counter()
+            results = await asyncio.gather(
+                *(groups.group_send(group, event) for group in spectator_groups(self.code)),
+                return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error("Game %s: spectator broadcast failed: %r", self.code, result)
+            metrics.spectator_fanout_latency.observe(time.perf_counter() - started)
+
+    def _patch(self, seat, state, base_version):
+        """
+        Patch from the previous broadcast to ``seat`` to ``state``. Only
+        possible when that broadcast is exactly the version this batch
+        started from; otherwise another worker wrote in between and clients
+        get a full snapshot.
+        """
+        previous, self.last_states[seat] = self.last_states.get(seat), state
+        if previous is None or previous['version'] != base_version:
+            return None
+        return {
+            'type': 'game_patch',
+            'version': state['version'],
+            'base_version': base_version,
+            'changes': state_patch(previous, state),
+        }
+
+
+def _event(message, version, patch, seq):
+    """
+    Group event for ``message``. Recipients encode it through
+    ``frames.event_frame``, which does so once per format for all of them.
+    """
+    message = dict(message, seq=seq)
+    if message['type'] == 'game_end':
+        message['version'] = version
+    event = {'type': message['type'], 'seq': seq, 'frame': message}
+    if message['type'] in ('game_state', 'game_end'):
+        event['version'] = version
+    if message['type'] == 'game_state' and patch is not None:
+        event['base_version'] = patch['base_version']
+        event['patch'] = dict(patch, seq=seq)
+    return event
+
+
+def _coalesce(messages):
+    """
+    Keep every game_update/game_end in order, but only the last game_state
+    the batch produced; it is projected from the final state when sent.
+    """
+    last_state = max((i for i, m in enumerate(messages) if m['type'] == 'game_state'), default=None)
+    return [
+        message for i, message in enumerate(messages)
+        if message['type'] != 'game_state' or i == last_state
+    ]
+
+
+def get_actor(code):
+    actor = _actors.get(code)
+    if actor is None:
+        actor = _actors[code] = GameActor(
+            code,
+            queue_size=getattr(settings, 'GAME_ACTOR_QUEUE_SIZE', 64),
+            idle_timeout=getattr(settings, 'GAME_ACTOR_IDLE_TIMEOUT', 30),
+            window=getattr(settings, 'GAME_BROADCAST_WINDOW', 0),
+        )
+    return actor
@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 
 
 class GameConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'game'
+
+    def ready(self):
+        from .history import MAX_BATCH
+
+        # The actor takes one action off its queue and then everything queued
+        # behind it, and each broadcast's frames must fit in one version's seqs.
+        queue_size = getattr(settings, 'GAME_ACTOR_QUEUE_SIZE', 64)
+        if queue_size + 1 > MAX_BATCH:
+            raise ImproperlyConfigured(f"GAME_ACTOR_QUEUE_SIZE must be below {MAX_BATCH}, not {queue_size}")
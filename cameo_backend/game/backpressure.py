@@ -0,0 +1,83 @@
+"""
+Per-connection flow control.
+
+Broadcasts used to be written to each socket from inside ``group_send``, so
+one client on a bad link slowed down the broadcast for everyone else, and
+under a server that waits for the socket to drain, the whole game. Each
+consumer now queues its frames in an ``Outbox`` that a task of its own
+writes out. The outbox is bounded: when it fills up, the ``game_state``
+frames still waiting are dropped, since the one being queued supersedes
+them. ``game_update``, ``game_end`` and errors are never dropped: one that
+finds the outbox full makes room the same way, except that the newest of
+the dropped states is queued again, as a full state. A client so far behind
+that no states are left to drop is disconnected instead, and can resume
+with ``?since=``.
+
+Inbound actions are limited per connection by a ``TokenBucket``, so one
+client flooding the socket can't monopolize its game's actor.
+"""
+import asyncio
+import time
+from collections import deque
+
+
+class Outbox:
+    """Frames waiting to be written to one socket, at most ``size`` of them."""
+
+    def __init__(self, size):
+        self.size = size
+        self.frames = deque()  # (is_state, payload)
+        self.closed = False
+        self._ready = asyncio.Event()
+
+    def full(self):
+        return len(self.frames) >= self.size
+
+    def put(self, payload, state=False):
+        """Queue ``payload``. Returns False when the outbox is full."""
+        if self.full():
+            return False
+        self.frames.append((state, payload))
+        self._ready.set()
+        return True
+
+    def drop_states(self):
+        """Drop the queued state frames; returns how many there were."""
+        count = len(self.frames)
+        self.frames = deque(frame for frame in self.frames if not frame[0])
+        return count - len(self.frames)
+
+    async def get(self):
+        while not self.frames:
+            self._ready.clear()
+            await self._ready.wait()
+        return self.frames.popleft()[1]
+
+    def take_all(self):
+        """Remove and return every queued frame."""
+        frames = [payload for _, payload in self.frames]
+        self.frames.clear()
+        return frames
+
+    def close(self):
+        self.closed = True
+        self.frames.clear()
+
+
+class TokenBucket:
+    """Allows ``rate`` actions a second on average, and bursts of up to ``burst``."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
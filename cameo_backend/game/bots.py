@@ -0,0 +1,182 @@
+"""
+Computer opponents.
+
+``StartGame`` with ``{"bot": true}`` seats a bot as player 2 through the
+same ``seat_player2`` call ``ConnectGame`` makes, then starts one asyncio
+task for it on this worker. The bot listens on its seat's group like a
+player's socket would, and submits its moves to the game's actor, so they
+are validated, logged and broadcast exactly like a person's.
+
+Moves are picked by ``simulator.choose``, which plays every option out over
+games sampled from what the bot can see, for ``GAME_BOT_THINK_TIME``
+seconds a decision. That is CPU-bound NumPy work, so it runs in a process
+pool of ``GAME_BOT_WORKERS`` processes and the event loop keeps serving
+sockets meanwhile. A bot only looks at what its seat's projection would
+show: cards it has peeked or swapped in, and the card it drew.
+
+A bot lives on the worker that started it. It stops when its game ends or
+disappears, or after ``GAME_BOT_IDLE_TIMEOUT`` seconds without a move from
+anyone; a restarted worker doesn't bring its bots back.
+"""
+import asyncio
+import contextvars
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from . import metrics, simulator
+from .actors import get_actor
+from .projections import seat_for, seat_group
+from .store import get_store
+
+logger = logging.getLogger(__name__)
+
+# Seconds between looks at the game when no broadcast arrives, e.g. to
+# retry a move the actor was too busy for.
+POLL_INTERVAL = 1
+
+# code -> Bot, for bots running on this worker
+_bots = {}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process pool bots think in."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Forking a worker that runs background threads can deadlock
+                # the child; spawned processes start clean.
+                _pool = ProcessPoolExecutor(
+                    max_workers=getattr(settings, 'GAME_BOT_WORKERS', 2),
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+    return _pool
+
+
+def available():
+    """Whether this worker may start another bot."""
+    return len(_bots) < getattr(settings, 'GAME_BOT_MAX', 100)
+
+
+def start(code, player=2):
+    """
+    Start the bot already seated as ``player`` in game ``code``. Called
+    from sync views; the bot runs on the server's event loop, so this needs
+    the ASGI server.
+    """
+    async_to_sync(_spawn)(code, player)
+
+
+async def _spawn(code, player):
+    bot = _bots[code] = Bot(
+        code,
+        player,
+        think_time=getattr(settings, 'GAME_BOT_THINK_TIME', 0.3),
+        idle_timeout=getattr(settings, 'GAME_BOT_IDLE_TIMEOUT', 600),
+    )
+    # Not in this call's context: it belongs to the view's sync_to_async
+    # call, whose executor is gone by the time the bot needs it.
+    bot.task = contextvars.Context().run(asyncio.get_running_loop().create_task, bot.run())
+
+
+class Bot:
+    def __init__(self, code, player, think_time, idle_timeout):
+        self.code = code
+        self.player = player
+        self.think_time = think_time
+        self.idle_timeout = idle_timeout
+        self.task = None
+        self.version = None
+        self.changed_at = time.monotonic()
+        # Version the bot last submitted moves for; cleared when one fails.
+        self.pending = None
+
+    async def run(self):
+        channel_layer = get_channel_layer()
+        group = seat_group(self.code, seat_for(self.player))
+        channel = await channel_layer.new_channel('bot.')
+        await channel_layer.group_add(group, channel)
+        metrics.bots_active.inc()
+        logger.info("Bot playing player %s in game %s", self.player, self.code)
+        try:
+            while await self._act():
+                try:
+                    # Any broadcast to the seat means the game changed.
+                    await asyncio.wait_for(channel_layer.receive(channel), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+        except Exception:
+            logger.exception("Bot for game %s failed", self.code)
+        finally:
+            metrics.bots_active.dec()
+            if _bots.get(self.code) is self:
+                del _bots[self.code]
+            await channel_layer.group_discard(group, channel)
+            logger.info("Bot for game %s stopped", self.code)
+
+    async def _act(self):
+        """Submit the bot's next moves, if it has any. Returns False once it is done."""
+        game = await get_store().aget(self.code)
+        if game is None or game.game_ended:
+            return False
+        now = time.monotonic()
+        if game.version != self.version:
+            self.version, self.changed_at = game.version, now
+        elif now - self.changed_at > self.idle_timeout:
+            logger.info("Bot for game %s giving up after %ss without a move", self.code, self.idle_timeout)
+            return False
+        if self.pending == game.version:
+            return True
+
+        moves = await self._moves(game)
+        if moves:
+            self.pending = game.version
+            actor = get_actor(self.code)
+            for data in moves:
+                if not actor.submit(data, self._reply):
+                    self.pending = None
+                    break
+        return True
+
+    async def _moves(self, game):
+        player = self.player
+        cards = game.player1_cards if player == 1 else game.player2_cards
+        peeked = game.player1_peeked if player == 1 else game.player2_peeked
+        if not game.game_started:
+            return [{'action': 'peek_own', 'player': player, 'position': position}
+                    for position in (2, 3) if not peeked[position]]
+        if game.current_player != player:
+            return []
+
+        # What its seat's projection shows: the peek flags follow cards
+        # swapped in or out of the hand.
+        hand = [card if flag else None for card, flag in zip(cards, peeked)]
+        drawn = game.drawn_card if game.drawn_by == player else None
+        move = await self._think(hand, drawn, len(game.deck.cards))
+        if move in ('end', 'draw', 'discard'):
+            return [{'action': 'end_game' if move == 'end' else move, 'player': player}]
+        return [{'action': 'swap', 'player': player, 'pos': move},
+                {'action': 'discard', 'player': player}]
+
+    async def _think(self, hand, drawn, deck_size):
+        started = time.perf_counter()
+        move = await asyncio.get_running_loop().run_in_executor(
+            get_pool(), simulator.choose, hand, drawn, deck_size, self.think_time)
+        metrics.bot_think_latency.observe(time.perf_counter() - started)
+        return move
+
+    async def _reply(self, message):
+        # Rejected: the game moved on while the bot was thinking, or the actor
+        # was busy. Look again on the next broadcast or poll.
+        logger.debug("Bot for game %s: %s", self.code, message.get('error'))
+        self.pending = None
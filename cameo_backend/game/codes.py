@@ -0,0 +1,175 @@
+"""
+Game code allocation.
+
+Codes are the six-digit numbers 100000-999999. A bitmap records which are
+taken, and allocation tries codes drawn uniformly at random with
+``secrets``: a code is all it takes to join a game or watch it, so the
+next one must not be guessable from the ones handed out before. A free
+code is found in O(1) expected probes while the space is mostly empty.
+Only when ``max_probes`` draws in a row are taken does allocation fall
+back to scanning the bitmap for the first free bit after a random point.
+Releasing a code clears its bit.
+
+The Redis allocator keeps the bitmap and count in Redis and runs each step
+as a Lua script, given the random draws as arguments, so several workers
+never hand out the same code.
+Games that Redis expires can't release their codes, so allocation also
+reclaims any taken code whose game key no longer exists.
+``GameStore.create`` is the final guard: it refuses a code that already has
+a game.
+"""
+import secrets
+import threading
+
+from django.conf import settings
+
+FIRST_CODE = 100000
+SIZE = 900000
+
+
+class CodeSpaceExhausted(Exception):
+    pass
+
+
+class InMemoryCodeAllocator:
+    """Allocator for a single process, paired with ``InMemoryGameStore``."""
+
+    def __init__(self, max_probes=64):
+        self.max_probes = max_probes
+        self._taken = bytearray(SIZE)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def allocate(self):
+        with self._lock:
+            for _ in range(self.max_probes):
+                index = secrets.randbelow(SIZE)
+                if not self._taken[index]:
+                    break
+            else:
+                start = secrets.randbelow(SIZE)
+                index = self._taken.find(0, start)
+                if index < 0:
+                    index = self._taken.find(0)
+                if index < 0:
+                    raise CodeSpaceExhausted()
+            self._taken[index] = 1
+            self._count += 1
+            return str(FIRST_CODE + index)
+
+    def reserve(self, code):
+        """Mark ``code`` as taken, e.g. for a game restored from a snapshot."""
+        index = _index(code)
+        if index is None:
+            return
+        with self._lock:
+            if not self._taken[index]:
+                self._taken[index] = 1
+                self._count += 1
+
+    def release(self, code):
+        index = _index(code)
+        if index is None:
+            return
+        with self._lock:
+            if self._taken[index]:
+                self._taken[index] = 0
+                self._count -= 1
+
+    def allocated(self):
+        return self._count
+
+
+# KEYS = bitmap, count; ARGV = size, game key prefix, byte to start a scan
+# at, then the indexes to try. Redis scripts replicate deterministically,
+# so the random draws are made by the caller.
+_ALLOCATE_SCRIPT = """
+local size = tonumber(ARGV[1])
+for i = 4, #ARGV do
+    local index = tonumber(ARGV[i])
+    if redis.call('SETBIT', KEYS[1], index, 1) == 0 then
+        redis.call('INCR', KEYS[2])
+        return index
+    end
+    if redis.call('EXISTS', ARGV[2] .. (index + 100000)) == 0 then
+        return index
+    end
+end
+local last = math.floor((size - 1) / 8)
+local index = redis.call('BITPOS', KEYS[1], 0, tonumber(ARGV[3]), last)
+if index < 0 or index >= size then
+    index = redis.call('BITPOS', KEYS[1], 0, 0, last)
+end
+if index < 0 or index >= size then
+    return -1
+end
+redis.call('SETBIT', KEYS[1], index, 1)
+redis.call('INCR', KEYS[2])
+return index
+"""
+
+# KEYS = bitmap, count; ARGV = index.
+_RELEASE_SCRIPT = """
+if redis.call('SETBIT', KEYS[1], ARGV[1], 0) == 1 then
+    redis.call('DECR', KEYS[2])
+end
+return 1
+"""
+
+
+class RedisCodeAllocator:
+    """
+    Cluster-wide allocator. ``game_prefix`` is the ``RedisGameStore`` key
+    prefix, used to reclaim codes of expired games; the scripts touch those
+    keys directly, so this needs a single (non-cluster) Redis.
+    """
+
+    def __init__(self, url, prefix='cameo:codes:', game_prefix='cameo:game:', max_probes=64):
+        import redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.keys = [f'{prefix}bitmap', f'{prefix}count']
+        self.game_prefix = game_prefix
+        self.max_probes = max_probes
+        self._allocate = self.redis.register_script(_ALLOCATE_SCRIPT)
+        self._release = self.redis.register_script(_RELEASE_SCRIPT)
+
+    def allocate(self):
+        draws = [secrets.randbelow(SIZE) for _ in range(self.max_probes)]
+        index = self._allocate(keys=self.keys, args=[SIZE, self.game_prefix, secrets.randbelow(SIZE // 8), *draws])
+        if index < 0:
+            raise CodeSpaceExhausted()
+        return str(FIRST_CODE + index)
+
+    def release(self, code):
+        index = _index(code)
+        if index is not None:
+            self._release(keys=self.keys, args=[index])
+
+    def allocated(self):
+        return int(self.redis.get(self.keys[1]) or 0)
+
+
+def _index(code):
+    try:
+        index = int(code) - FIRST_CODE
+    except (TypeError, ValueError):
+        return None
+    return index if 0 <= index < SIZE else None
+
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+
+def get_allocator():
+    """Return the process-wide allocator matching ``GAME_STORE_BACKEND``."""
+    global _allocator
+    if _allocator is None:
+        with _allocator_lock:
+            if _allocator is None:
+                if getattr(settings, 'GAME_STORE_BACKEND', 'memory') == 'redis':
+                    _allocator = RedisCodeAllocator(settings.REDIS_URL)
+                else:
+                    _allocator = InMemoryCodeAllocator()
+    return _allocator
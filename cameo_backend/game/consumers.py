@@ -1,241 +1,283 @@
+import asyncio
 import json
+import logging
+from urllib.parse import parse_qs
+from channels.consumer import get_handler_name
 from channels.generic.websocket import AsyncWebsocketConsumer
-from .views import games, Deck
+from django.conf import settings
+from cameo_backend.log import LazyJSON
+from . import groups, history, metrics
+from .actors import get_actor
+from .backpressure import Outbox, TokenBucket
+from .frames import (MSGPACK_SUBPROTOCOL, decode_binary_frame, encode_batch, encode_binary_batch,
+                     encode_binary_frame, encode_frame, event_frame)
+from .projections import seat_for, seat_group, snapshot_event, spectator_group
+from .store import get_store
+from .tokens import check_seat_token
+
+logger = logging.getLogger(__name__)
+
+# Spectator sockets open on this worker
+_watchers = 0
+
 
 class GameConsumer(AsyncWebsocketConsumer):
+    """
+    Clients that connect with ``?deltas=1`` get ``game_patch`` messages
+    holding only the fields that changed since ``base_version``. A client that
+    sees a version gap sends ``{"action": "sync"}`` for a full snapshot; the
+    server also falls back to a snapshot whenever it cannot vouch for the
+    client's base version.
+
+    Clients that offer the ``cameo.msgpack.v1`` subprotocol send and receive
+    binary msgpack frames with the same messages, keyed by ``frames.FIELD_CODES``.
+    Everyone else gets JSON text.
+
+    ``?player=1`` / ``?player=2`` with that seat's ``&token=`` (see
+    ``tokens``) picks the seat whose projection the socket receives; a seat
+    without a valid token is refused. Without ``?player`` the socket gets
+    the spectator view, as on ``SpectatorConsumer``. Each worker takes at most ``GAME_MAX_WATCHERS``
+    spectators (see ``manage.py bench_watchers``); beyond that the handshake
+    is refused and the client may retry later.
+
+    Every frame carries a ``seq`` (see ``history``). A client reconnecting
+    with ``?since=<last seq it got>`` is sent only the frames it missed when
+    they are still buffered, and a snapshot otherwise.
+
+    Frames go out through a bounded ``Outbox`` and inbound actions are rate
+    limited; see ``backpressure``. Clients that connect with ``?batch=1``
+    get every frame queued at once in a single ``batch`` message, e.g. both
+    frames of a draw, which means fewer WebSocket writes under load.
+    """
+
+    watch_only = False
+
     async def connect(self):
+        global _watchers
+
         self.game_code = self.scope['url_route']['kwargs']['game_code']
-        self.game_group = f'game_{self.game_code}'
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        self.seat = 'spectator' if self.watch_only else seat_for(query.get('player', [None])[0])
+        self.player = {'player1': 1, 'player2': 2}.get(self.seat)
+        if self.player is not None and not check_seat_token(self.game_code, self.player,
+                                                            query.get('token', [None])[0]):
+            logger.warning("Game %s: refusing seat %s without a valid token", self.game_code, self.player)
+            await self.close()  # Before accept(): the handshake is refused
+            return
+        if self.player is None:
+            if _watchers >= getattr(settings, 'GAME_MAX_WATCHERS', 2000):
+                logger.warning("Game %s: turning a spectator away, %d already watching", self.game_code, _watchers)
+                metrics.watchers_rejected.inc()
+                await self.close()  # Before accept(): the handshake is refused
+                return
+            _watchers += 1
+            self.game_group = spectator_group(self.game_code, self.channel_name)
+        else:
+            self.game_group = seat_group(self.game_code, self.seat)
+        self.deltas = query.get('deltas', ['0'])[0] == '1'
+        self.version = None  # Last state version this client was sent
+        self.seq = None  # Last frame this client was sent
+        self.latest_state = None  # Event holding the last full state queued
+        self.binary = MSGPACK_SUBPROTOCOL in self.scope.get('subprotocols', [])
+        self.batch = query.get('batch', ['0'])[0] == '1'
+        try:
+            since = int(query['since'][0])
+        except (KeyError, ValueError):
+            since = None
         await self.channel_layer.group_add(self.game_group, self.channel_name)
-        await self.accept()
+        await self.accept(subprotocol=MSGPACK_SUBPROTOCOL if self.binary else None)
+        self.accepted = True
+        self.outbox = Outbox(getattr(settings, 'GAME_SOCKET_QUEUE_SIZE', 32))
+        self.writer = asyncio.create_task(self._write())
+        self.catch_up = None
+        rate = getattr(settings, 'GAME_ACTION_RATE', 20)
+        self.bucket = TokenBucket(rate, getattr(settings, 'GAME_ACTION_BURST', 40)) if rate > 0 else None
+        metrics.websocket_connections.inc(seat=self.seat)
+        if since is None:
+            await self.send_snapshot()
+        else:
+            await self.resume(since)
+        # Local broadcasts call our handlers directly, so only once the client
+        # is caught up. Until then they reach us through the channel layer,
+        # queued behind this handler, and _fresh drops any we already sent.
+        groups.join(self.game_group, self)
+        # Other workers may broadcast on group membership they read before
+        # this socket joined (see groups); look again once that has expired.
+        delay = groups.cache_ttl(self.channel_layer)
+        if delay:
+            self.catch_up = asyncio.create_task(self._catch_up(delay))
 
-        game = games.get(self.game_code)
-        if game:
-            print(f"Player connected to game {self.game_code}: player1_peeked={game.player1_peeked}, player2_peeked={game.player2_peeked}, game_started={game.game_started}, reveal_all={game.reveal_all}")
-            await self.send(text_data=json.dumps({
-                'type': 'game_state',
-                'player1_cards': game.player1_cards,
-                'player2_cards': game.player2_cards or [],
-                'player1_peeked': game.player1_peeked,
-                'player2_peeked': game.player2_peeked or [],
-                'current_player': game.current_player,
-                'game_started': game.game_started,
-                'drawn_card': getattr(game, 'drawn_card', None),
-                'drawn_by': getattr(game, 'drawn_by', None),
-                'reveal_all': game.reveal_all
-            }))
+    async def _catch_up(self, delay):
+        await asyncio.sleep(delay)
+        game = await get_store().aget(self.game_code)
+        if game is not None and (self.version is None or game.version > self.version):
+            await self.send_snapshot(game)
 
-    async def disconnect(self, close_code):
-        print(f"WebSocket disconnected for game {self.game_code} with code {close_code}")
-        await self.channel_layer.group_discard(self.game_group, self.channel_name)
+    async def send_message(self, message, state=False):
+        frame = encode_binary_frame(message) if self.binary else encode_frame(message)
+        await self.queue_frame(frame, state)
 
-    async def receive(self, text_data):
-        try:
-            data = json.loads(text_data)
-            game = games.get(self.game_code)
-            print(f"Received message: {data}")
-            if not game:
-                print(f"No game found for code {self.game_code}")
-                return
-            if game.game_ended:
-                print(f"Game {self.game_code} already ended")
-                return
+    async def forward(self, event, key, state=False):
+        """Send the message ``event`` carries under ``key``, in this client's format."""
+        await self.queue_frame(event_frame(event, key, self.binary), state)
 
-            action = data['action']
-            player = data['player']
-            print(f"Processing action: {action} from Player {player}")
-
-            if action == 'peek_own' and not game.game_started:
-                pos = data['position']
-                if player == 1 and pos in [2, 3] and not game.player1_peeked[pos]:
-                    game.player1_peeked[pos] = True
-                    print(f"Player 1 peeked position {pos}: player1_peeked={game.player1_peeked}")
-                elif player == 2 and pos in [2, 3] and game.player2_peeked and not game.player2_peeked[pos]:
-                    game.player2_peeked[pos] = True
-                    print(f"Player 2 peeked position {pos}: player2_peeked={game.player2_peeked}")
-
-                if (all(game.player1_peeked[2:4]) and 
-                    game.player2_cards and game.player2_peeked and all(game.player2_peeked[2:4])):
-                    game.game_started = True
-                    print(f"Game {self.game_code} started: Both players have peeked bottom cards")
-
-            elif action == 'draw' and game.game_started:
-                if game.current_player != player:
-                    print(f"Player {player} tried to draw, but it's not their turn (current_player={game.current_player})")
-                    return
-                card = game.deck.draw()[0] if game.deck.cards else None
-                if card:
-                    game.drawn_card = card
-                    game.drawn_by = player
-                    draw_message = {'type': 'game_update', 'card': card, 'player': player}
-                    print(f"Player {player} drew card: {card}, deck remaining: {len(game.deck.cards)}, sending: {json.dumps(draw_message)}")
-                    await self.channel_layer.group_send(self.game_group, draw_message)
-                    state_message = {
-                        'type': 'game_state',
-                        'player1_cards': game.player1_cards,
-                        'player2_cards': game.player2_cards or [],
-                        'player1_peeked': game.player1_peeked,
-                        'player2_peeked': game.player2_peeked or [],
-                        'current_player': game.current_player,
-                        'game_started': game.game_started,
-                        'drawn_card': game.drawn_card,
-                        'drawn_by': game.drawn_by,
-                        'reveal_all': game.reveal_all
-                    }
-                    print(f"Sending game_state after draw: {json.dumps(state_message)}")
-                    await self.channel_layer.group_send(self.game_group, state_message)
-                    return
-
-            elif action == 'discard' and game.game_started:
-                if game.current_player != player or not hasattr(game, 'drawn_card') or game.drawn_by != player:
-                    print(f"Player {player} tried to discard, but invalid: current_player={game.current_player}, drawn_by={game.drawn_by}")
-                    return
-                previous_player = game.current_player
-                game.current_player = 2 if player == 1 else 1
-                state_message = {
-                    'type': 'game_state',
-                    'player1_cards': game.player1_cards,
-                    'player2_cards': game.player2_cards,
-                    'player1_peeked': game.player1_peeked,
-                    'player2_peeked': game.player2_peeked,
-                    'current_player': game.current_player,
-                    'game_started': game.game_started,
-                    'drawn_card': game.drawn_card,
-                    'drawn_by': game.drawn_by,
-                    'reveal_all': game.reveal_all
-                }
-                print(f"Player {previous_player} discarded, turn switched to Player {game.current_player}, sending: {json.dumps(state_message)}")
-                await self.channel_layer.group_send(self.game_group, state_message)
-                return
+    async def queue_frame(self, frame, state=False):
+        if self.outbox.closed:
+            return
+        if not state:
+            self.make_room(keep_state=True)
+        if not self.outbox.put(frame, state):
+            logger.warning("Game %s: %s can't keep up, disconnecting it", self.game_code, self.channel_name)
+            metrics.slow_consumer_disconnects.inc()
+            self.outbox.close()
+            self.writer.cancel()
+            await self.close(code=1013)  # Try again later; the client resumes with ?since=
 
-            elif action == 'swap' and game.game_started:
-                if game.current_player != player:
-                    print(f"Player {player} tried to swap, but it's not their turn (current_player={game.current_player})")
-                    return
-                if 'pos1' in data and 'pos2' in data:  # Player-to-player swap
-                    pos1 = data['pos1']  # Player 1's card position
-                    pos2 = data['pos2']  # Player 2's card position
-                    if not (0 <= pos1 <= 3 and 0 <= pos2 <= 3):
-                        print(f"Invalid swap positions: pos1={pos1}, pos2={pos2}")
-                        return
-                    if player == 1:
-                        game.player1_cards[pos1], game.player2_cards[pos2] = game.player2_cards[pos2], game.player1_cards[pos1]
-                        print(f"Player 1 swapped card at pos {pos1} with Player 2's card at pos {pos2}")
-                    else:  # player == 2
-                        game.player1_cards[pos1], game.player2_cards[pos2] = game.player2_cards[pos2], game.player1_cards[pos1]
-                        print(f"Player 2 swapped card at pos {pos2} with Player 1's card at pos {pos1}")
-                elif 'pos' in data:  # Drawn card swap
-                    if not hasattr(game, 'drawn_card') or game.drawn_by != player:
-                        print(f"Player {player} tried to swap drawn card, but invalid: drawn_by={game.drawn_by}")
-                        return
-                    pos = data['pos']  # Player's card position
-                    if not (0 <= pos <= 3):
-                        print(f"Invalid swap position: pos={pos}")
-                        return
-                    if player == 1:
-                        game.player1_cards[pos], game.drawn_card = game.drawn_card, game.player1_cards[pos]
-                        print(f"Player 1 swapped drawn card with card at pos {pos}")
-                    else:  # player == 2
-                        game.player2_cards[pos], game.drawn_card = game.drawn_card, game.player2_cards[pos]
-                        print(f"Player 2 swapped drawn card with card at pos {pos}")
-                else:
-                    print(f"Invalid swap data: {data}")
-                    return
-
-                state_message = {
-                    'type': 'game_state',
-                    'player1_cards': game.player1_cards,
-                    'player2_cards': game.player2_cards,
-                    'player1_peeked': game.player1_peeked,
-                    'player2_peeked': game.player2_peeked,
-                    'current_player': game.current_player,
-                    'game_started': game.game_started,
-                    'drawn_card': getattr(game, 'drawn_card', None),
-                    'drawn_by': getattr(game, 'drawn_by', None),
-                    'reveal_all': game.reveal_all
-                }
-                print(f"Sending game_state after swap: {json.dumps(state_message)}")
-                await self.channel_layer.group_send(self.game_group, state_message)
-                return
+    def make_room(self, keep_state=False):
+        """
+        If the outbox is full, drop the states still waiting in it. Before
+        queueing a game_state that is all, as the new one supersedes them.
+        Before any other frame, ``keep_state`` puts the newest of them back
+        as a full state (a patch may build on one just dropped), so a client
+        is only disconnected when dropping states frees no room.
+        """
+        if not self.outbox.full():
+            return
+        dropped = self.outbox.drop_states()
+        if not dropped:
+            return
+        if keep_state and self.latest_state is not None:
+            self.outbox.put(event_frame(self.latest_state, 'frame', self.binary), state=True)
+            dropped -= 1
+        else:
+            # The client won't see what a patch would build on.
+            self.version = None
+        metrics.frames_coalesced.inc(dropped)
 
-            elif action == 'replace' and game.game_started:
-                pos = data['position']
-                card = data['card']
-                if player == 1:
-                    game.player1_cards[pos] = card
-                else:
-                    game.player2_cards[pos] = card
-                game.drawn_card = None
-                game.drawn_by = None
-                game.current_player = 2 if player == 1 else 1
-
-            elif action == 'peek_own' and game.game_started:
-                pos = data['position']
-                if player == 1:
-                    game.player1_peeked[pos] = True
-                else:
-                    game.player2_peeked[pos] = True
-                game.drawn_card = None
-                game.drawn_by = None
-                game.current_player = 2 if player == 1 else 1
-
-            elif action == 'peek_opponent' and game.game_started:
-                pos = data['position']
-                if player == 1:
-                    game.player2_peeked[pos] = True
-                else:
-                    game.player1_peeked[pos] = True
-                game.drawn_card = None
-                game.drawn_by = None
-                game.current_player = 2 if player == 1 else 1
-
-            elif action == 'end_game' and game.game_started:
-                print(f"End game triggered by Player {player}")
-                p1_sum = sum(Deck.values[card[0]] if card[0] != 'K' or card[1] in ['C', 'S'] else 0 for card in game.player1_cards)
-                p2_sum = sum(Deck.values[card[0]] if card[0] != 'K' or card[1] in ['C', 'S'] else 0 for card in game.player2_cards)
-                game.winner = 'Player 1' if p1_sum < p2_sum else 'Player 2' if p2_sum < p1_sum else 'Tie'
-                game.game_ended = True
-                game.reveal_all = True
-                end_game_message = {
-                    'type': 'game_end',
-                    'player1_cards': game.player1_cards,
-                    'player2_cards': game.player2_cards,
-                    'player1_sum': p1_sum,
-                    'player2_sum': p2_sum,
-                    'winner': game.winner,
-                    'reveal_all': game.reveal_all
-                }
-                print(f"Game {self.game_code} ended: Sending game_end message: {json.dumps(end_game_message)}")
-                await self.channel_layer.group_send(self.game_group, end_game_message)
-                return
+    async def _write(self):
+        while True:
+            frame = await self.outbox.get()
+            if self.batch and self.outbox.frames:
+                frames = [frame] + self.outbox.take_all()
+                frame = encode_binary_batch(frames) if self.binary else encode_batch(frames)
+            if isinstance(frame, bytes):
+                await self.send(bytes_data=frame)
+            else:
+                await self.send(text_data=frame)
+
+    async def send_snapshot(self, game=None):
+        game = game or await get_store().aget(self.game_code)
+        if game:
+            logger.debug("Game %s: sending snapshot v%s: %s", self.game_code, game.version, LazyJSON(game.to_dict))
+            self.make_room()
+            self.version = game.version
+            self.seq = history.snapshot_seq(game.version)
+            self.latest_state = snapshot_event(game, self.seat)
+            await self.forward(self.latest_state, 'frame', state=True)
+
+    async def resume(self, since):
+        """Catch up a client whose last frame was ``since``."""
+        game = await get_store().aget(self.game_code)
+        if game is None:
+            return
+        events = history.since(self.game_code, self.seat, since, game.version)
+        if events is None:
+            logger.debug("Game %s: can't resume from %s, sending snapshot", self.game_code, since)
+            metrics.resumes.inc(result='snapshot')
+            await self.send_snapshot(game)
+            return
+        logger.debug("Game %s: resuming from %s with %d frame(s)", self.game_code, since, len(events))
+        metrics.resumes.inc(result='frames')
+        self.seq = since
+        for event in events:
+            await self.dispatch(event)
 
-            state_message = {
-                'type': 'game_state',
-                'player1_cards': game.player1_cards,
-                'player2_cards': game.player2_cards or [],
-                'player1_peeked': game.player1_peeked,
-                'player2_peeked': game.player2_peeked or [],
-                'current_player': game.current_player,
-                'game_started': game.game_started,
-                'drawn_card': getattr(game, 'drawn_card', None),
-                'drawn_by': getattr(game, 'drawn_by', None),
-                'reveal_all': game.reveal_all
-            }
-            print(f"Sending game_state message after {action}: {json.dumps(state_message)}")
-            await self.channel_layer.group_send(self.game_group, state_message)
+    def _fresh(self, event):
+        """False for a frame this client already has, e.g. one it was replayed on resume."""
+        if self.seq is not None and event['seq'] <= self.seq:
+            return False
+        self.seq = event['seq']
+        return True
 
+    async def disconnect(self, close_code):
+        global _watchers
+
+        logger.info("WebSocket disconnected from game %s with code %s", self.game_code, close_code)
+        if not hasattr(self, 'game_group'):
+            return  # Turned away in connect
+        if self.player is None:
+            _watchers -= 1
+        if getattr(self, 'accepted', False):
+            metrics.websocket_connections.dec(seat=self.seat)
+            self.outbox.close()
+            self.writer.cancel()
+            if self.catch_up is not None:
+                self.catch_up.cancel()
+        groups.leave(self.game_group, self)
+        await self.channel_layer.group_discard(self.game_group, self.channel_name)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        if self.bucket is not None and not self.bucket.take():
+            metrics.actions_rate_limited.inc()
+            await self.send_message({'error': 'rate_limited'})
+            return
+        try:
+            data = json.loads(text_data) if text_data is not None else decode_binary_frame(bytes_data)
+            if not isinstance(data, dict):
+                raise ValueError("Expected an object")
         except Exception as e:
-            print(f"Error processing message: {e}")
-            await self.send(text_data=json.dumps({'error': str(e)}))
+            logger.debug("Game %s: undecodable message: %s", self.game_code, e)
+            await self.send_message({'error': 'bad_message'})
+            return
+        logger.debug("Game %s: received %s", self.game_code, data)
+        if data.get('action') == 'sync':
+            await self.send_snapshot()
+            return
+        if self.player is None or data.get('player') != self.player:
+            await self.send_message({'error': 'not_your_seat'})
+            return
+        # The game's actor validates and applies actions one at a time, in order.
+        if not get_actor(self.game_code).submit(data, self.send_message):
+            logger.warning("Game %s: action queue full, rejecting %s", self.game_code, data.get('action'))
+            await self.send_message({'error': 'busy'})
+
+    # Group events carry their messages (see actors._event); forward encodes them once per format.
+    async def game_batch(self, event):
+        # Handlers called directly: dispatch() yields to a thread to close DB
+        # connections, which would let the writer send the frames one by one.
+        for frame_event in event['events']:
+            await getattr(self, get_handler_name(frame_event))(frame_event)
 
     async def game_update(self, event):
-        print(f"Sending game_update message: {json.dumps(event)}")
-        await self.send(text_data=json.dumps(event))
+        if not self._fresh(event):
+            return
+        logger.debug("Game %s: sending game_update", self.game_code)
+        await self.forward(event, 'frame')
 
     async def game_state(self, event):
-        print(f"Sending game_state to client: {json.dumps(event)}")
-        await self.send(text_data=json.dumps(event))
+        if not self._fresh(event):
+            return
+        self.make_room()
+        if self.deltas and 'base_version' in event and event['base_version'] == self.version:
+            kind, key = 'game_patch', 'patch'
+        else:
+            kind, key = 'game_state', 'frame'
+        self.version = event['version']
+        self.latest_state = event
+        logger.debug("Game %s: sending %s v%s", self.game_code, kind, self.version)
+        await self.forward(event, key, state=True)
 
     async def game_end(self, event):
-        print(f"Sending game_end to client: {json.dumps(event)}")
-        await self.send(text_data=json.dumps(event))
\ No newline at end of file
+        if not self._fresh(event):
+            return
+        self.version = event['version']
+        logger.debug("Game %s: sending game_end", self.game_code)
+        await self.forward(event, 'frame')
+
+
+class SpectatorConsumer(GameConsumer):
+    """
+    ``/ws/game/<code>/watch/``: the spectator projection, read-only. Watchers
+    may ``sync``; any action gets ``not_your_seat``.
+    """
+    watch_only = True
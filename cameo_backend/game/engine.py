@@ -0,0 +1,229 @@
+"""
+The Cameo rules as a pure function.
+
+``apply(state, action)`` checks a client action against a ``GameState`` and
+returns ``(new_state, events)``. ``state`` itself is never modified: the new
+state shares every part the action left alone and copies only what it
+changes, so a discard copies no containers at all and a draw copies just
+the deck. Nothing here logs, does I/O or reads the clock, and the deck order
+is part of the state, so the same state and action always give the same
+result. Because states share parts, treat one as immutable once it has
+been passed to ``apply``. The actors, action log replay, bots and benchmarks all go through
+it; ``actions`` turns its events into wire messages.
+
+Events are tuples:
+
+* ``(DREW, player, card)``: ``player`` drew card id ``card``
+* ``(CHANGED,)``: the visible state changed
+* ``(ENDED, winner, player1_sum, player2_sum)``
+
+An action that is malformed or not allowed raises ``ActionError`` with a
+short code (``bad_<field>``, ``unknown_action``, ``not_started``,
+``game_ended``, ``not_your_turn``, ``no_drawn_card``, ``already_drawn``,
+``already_peeked``, ``deck_empty``, ``not_joined``).
+
+``ACTIONS`` maps every action name to its handler and a check compiled from
+a schema when this module loads, so rejecting a message costs a dict lookup
+and a few comparisons.
+"""
+from collections import namedtuple
+
+from .state import hand_score
+
+DREW, CHANGED, ENDED = 'drew', 'changed', 'ended'
+_CHANGED = ((CHANGED,),)
+
+
+class ActionError(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+# Field predicates
+
+def _one_of(*values):
+    values = frozenset(values)
+    # bool is an int subclass; true must not pass for 1.
+    return lambda value: type(value) is int and value in values
+
+
+PLAYER = _one_of(1, 2)
+POSITION = _one_of(0, 1, 2, 3)
+
+
+def schema(**fields):
+    """
+    Compile ``fields`` (name -> predicate) into a check that returns None
+    for a valid action and ``bad_<name>`` for the first invalid field.
+    Every schema includes ``player``.
+    """
+    checks = tuple((name, predicate, f'bad_{name}') for name, predicate in dict(player=PLAYER, **fields).items())
+
+    def check(data):
+        for name, predicate, error in checks:
+            if not predicate(data.get(name)):
+                return error
+        return None
+    return check
+
+
+def _swaps_hands(data):
+    return 'pos1' in data and 'pos2' in data
+
+
+def variants(test, when_true, when_false):
+    """Check with ``when_true`` for actions passing ``test``, else ``when_false``."""
+    def check(data):
+        return when_true(data) if test(data) else when_false(data)
+    return check
+
+
+# Handlers: called with a validated action, in the phase and turn their
+# table entry requires. They return ``(new_state, events)``.
+
+def _pass_turn(game, player):
+    game.drawn_card = None
+    game.drawn_by = None
+    game.current_player = 2 if player == 1 else 1
+
+
+def _drew_into(game, player, pos):
+    """The drawer has seen the card now at ``pos`` of their hand; their opponent hasn't."""
+    (game.player1_peeked if player == 1 else game.player2_peeked)[pos] = True
+    (game.player1_seen_by_opponent if player == 1 else game.player2_seen_by_opponent)[pos] = False
+
+
+def peek_own(state, player, data):
+    pos = data['position']
+    if state.game_started:
+        # Spending a turn on looking at one of your own cards.
+        if state.current_player != player:
+            raise ActionError('not_your_turn')
+        game = state.copy(peeked=True)
+        (game.player1_peeked if player == 1 else game.player2_peeked)[pos] = True
+        _pass_turn(game, player)
+        return game, _CHANGED
+
+    # Before the game starts each player looks at their bottom two cards.
+    peeked = state.player1_peeked if player == 1 else state.player2_peeked
+    if peeked is None:
+        raise ActionError('not_joined')
+    if pos not in (2, 3):
+        raise ActionError('bad_position')
+    if peeked[pos]:
+        raise ActionError('already_peeked')
+    game = state.copy(peeked=True)
+    (game.player1_peeked if player == 1 else game.player2_peeked)[pos] = True
+    if (all(game.player1_peeked[2:4]) and
+            game.player2_peeked is not None and all(game.player2_peeked[2:4])):
+        game.game_started = True
+    return game, _CHANGED
+
+
+def draw(state, player, data):
+    if state.drawn_by == player:
+        # The drawn card has to be kept or discarded first.
+        raise ActionError('already_drawn')
+    if not state.deck.cards:
+        raise ActionError('deck_empty')
+    game = state.copy(deck=True)
+    card = game.deck.cards.pop()
+    game.drawn_card = card
+    game.drawn_by = player
+    return game, ((DREW, player, card), (CHANGED,))
+
+
+def discard(state, player, data):
+    if state.drawn_by != player:
+        raise ActionError('no_drawn_card')
+    game = state.copy()
+    game.current_player = 2 if player == 1 else 1
+    return game, _CHANGED
+
+
+def swap(state, player, data):
+    if _swaps_hands(data):
+        # Player 1's card at pos1 trades places with player 2's at pos2, and
+        # each card takes along what both players had seen of it.
+        game = state.copy(hands=True, peeked=True)
+        pos1, pos2 = data['pos1'], data['pos2']
+        game.player1_cards[pos1], game.player2_cards[pos2] = game.player2_cards[pos2], game.player1_cards[pos1]
+        game.player1_peeked[pos1], game.player2_seen_by_opponent[pos2] = \
+            game.player2_seen_by_opponent[pos2], game.player1_peeked[pos1]
+        game.player2_peeked[pos2], game.player1_seen_by_opponent[pos1] = \
+            game.player1_seen_by_opponent[pos1], game.player2_peeked[pos2]
+        return game, _CHANGED
+    # The drawn card goes into the hand, and the card it replaces becomes
+    # the drawn card, to be discarded.
+    if state.drawn_by != player:
+        raise ActionError('no_drawn_card')
+    game = state.copy(hands=True, peeked=True)
+    hand = game.player1_cards if player == 1 else game.player2_cards
+    pos = data['pos']
+    hand[pos], game.drawn_card = game.drawn_card, hand[pos]
+    _drew_into(game, player, pos)
+    return game, _CHANGED
+
+
+def replace(state, player, data):
+    # The drawn card takes the place of a card in the hand, which is discarded.
+    if state.drawn_by != player:
+        raise ActionError('no_drawn_card')
+    game = state.copy(hands=True, peeked=True)
+    (game.player1_cards if player == 1 else game.player2_cards)[data['position']] = game.drawn_card
+    _drew_into(game, player, data['position'])
+    _pass_turn(game, player)
+    return game, _CHANGED
+
+
+def peek_opponent(state, player, data):
+    # Only the peeking player gets to see the card, not its owner.
+    game = state.copy(peeked=True)
+    (game.player2_seen_by_opponent if player == 1 else game.player1_seen_by_opponent)[data['position']] = True
+    _pass_turn(game, player)
+    return game, _CHANGED
+
+
+def end_game(state, player, data):
+    game = state.copy()
+    p1_sum = hand_score(game.player1_cards)
+    p2_sum = hand_score(game.player2_cards)
+    game.winner = 'Player 1' if p1_sum < p2_sum else 'Player 2' if p2_sum < p1_sum else 'Tie'
+    game.game_ended = True
+    game.reveal_all = True
+    return game, ((ENDED, game.winner, p1_sum, p2_sum),)
+
+
+# started: only once both players have peeked; turn: only by current_player.
+Action = namedtuple('Action', 'handler check started turn')
+
+ACTIONS = {
+    'peek_own': Action(peek_own, schema(position=POSITION), started=False, turn=False),
+    'draw': Action(draw, schema(), started=True, turn=True),
+    'discard': Action(discard, schema(), started=True, turn=True),
+    'swap': Action(swap, variants(_swaps_hands, schema(pos1=POSITION, pos2=POSITION), schema(pos=POSITION)),
+                   started=True, turn=True),
+    'replace': Action(replace, schema(position=POSITION), started=True, turn=True),
+    'peek_opponent': Action(peek_opponent, schema(position=POSITION), started=True, turn=True),
+    'end_game': Action(end_game, schema(), started=True, turn=False),
+}
+
+
+def apply(state, data):
+    """Return ``(new_state, events)`` for action ``data``; raises ``ActionError``."""
+    try:
+        action = ACTIONS[data['action']]
+    except (KeyError, TypeError):
+        raise ActionError('unknown_action') from None
+    error = action.check(data)
+    if error is None:
+        if state.game_ended:
+            error = 'game_ended'
+        elif action.started and not state.game_started:
+            error = 'not_started'
+        elif action.turn and state.current_player != data['player']:
+            error = 'not_your_turn'
+    if error is not None:
+        raise ActionError(error)
+    return action.handler(state, data['player'], data)
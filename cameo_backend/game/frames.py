@@ -0,0 +1,122 @@
+"""
+Client frame encodings.
+
+Every message goes to clients as compact JSON text, or, for sockets that
+negotiated ``MSGPACK_SUBPROTOCOL``, as msgpack with the short keys in
+``FIELD_CODES``. The actors, projections and consumers all encode through
+here.
+
+Group events carry their messages unencoded, under ``frame`` (and
+``patch`` for a state with a patch). ``event_frame`` encodes one of them in one
+format the first time a recipient asks, and keeps the result on the event:
+a seat's local subscribers share one event, so each (message, format) is
+encoded at most once per broadcast, and formats nobody uses never are.
+Events that go through the channel layer are sent with every frame
+encoded in both formats (``for_layer``), since the recipients' formats
+aren't known there.
+"""
+import json
+
+import msgpack
+
+# Clients that offer this in Sec-WebSocket-Protocol get binary msgpack frames.
+MSGPACK_SUBPROTOCOL = 'cameo.msgpack.v1'
+
+# Short keys used in msgpack frames, in both directions. Values are unchanged.
+FIELD_CODES = {
+    'type': 't',
+    'version': 'v',
+    'seq': 'q',
+    'base_version': 'bv',
+    'changes': 'ch',
+    'frames': 'f',
+    'error': 'e',
+    'action': 'a',
+    'player': 'p',
+    'position': 'ps',
+    'pos': 'po',
+    'pos1': 'po1',
+    'pos2': 'po2',
+    'card': 'c',
+    'player1_cards': 'c1',
+    'player2_cards': 'c2',
+    'player1_peeked': 'k1',
+    'player2_peeked': 'k2',
+    'player1_sum': 's1',
+    'player2_sum': 's2',
+    'current_player': 'cp',
+    'game_started': 'gs',
+    'drawn_card': 'dc',
+    'drawn_by': 'db',
+    'reveal_all': 'ra',
+    'winner': 'w',
+}
+FIELD_NAMES = {code: name for name, code in FIELD_CODES.items()}
+
+
+def encode_frame(message):
+    return json.dumps(message, separators=(',', ':'))
+
+
+def _rename(value, names):
+    if isinstance(value, dict):
+        return {names.get(key, key): _rename(item, names) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_rename(item, names) for item in value]
+    return value
+
+
+def encode_binary_frame(message):
+    return msgpack.packb(_rename(message, FIELD_CODES))
+
+
+def decode_binary_frame(data):
+    message = msgpack.unpackb(data)
+    if not isinstance(message, dict):
+        raise ValueError("Expected a msgpack map")
+    return _rename(message, FIELD_NAMES)
+
+
+def encode_batch(frames):
+    """``{"type": "batch", "frames": [...]}`` around already-encoded JSON frames."""
+    return '{"type":"batch","frames":[' + ','.join(frames) + ']}'
+
+
+def encode_binary_batch(frames):
+    """``encode_batch`` for msgpack frames."""
+    packer = msgpack.Packer()
+    header = [
+        packer.pack_map_header(2),
+        packer.pack(FIELD_CODES['type']), packer.pack('batch'),
+        packer.pack(FIELD_CODES['frames']), packer.pack_array_header(len(frames)),
+    ]
+    return b''.join(header + frames)
+
+
+def state_patch(old, new):
+    """Fields of state message ``new`` that differ from ``old``."""
+    return {
+        key: value for key, value in new.items()
+        if key not in ('type', 'version') and old.get(key) != value
+    }
+
+
+def event_frame(event, key, binary):
+    """Message ``key`` ('frame' or 'patch') of ``event`` as a client frame, encoded on first use."""
+    name = f'{key}_bytes' if binary else f'{key}_text'
+    encoded = event.get(name)
+    if encoded is None:
+        encoded = event[name] = encode_binary_frame(event[key]) if binary else encode_frame(event[key])
+    return encoded
+
+
+def for_layer(event):
+    """Copy of ``event`` for the channel layer: every frame encoded both ways, no raw messages."""
+    if event['type'] == 'game_batch':
+        return dict(event, events=[for_layer(inner) for inner in event['events']])
+    copy = {key: value for key, value in event.items() if key not in ('frame', 'patch')}
+    for key in ('frame', 'patch'):
+        if key in event:
+            copy[f'{key}_text'] = event_frame(event, key, False)
+            copy[f'{key}_bytes'] = event_frame(event, key, True)
+    return copy
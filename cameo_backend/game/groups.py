@@ -0,0 +1,166 @@
+"""
+Same-process fast path for group broadcasts.
+
+Most games have both players connected to the same worker, yet a
+``group_send`` through ``RedisChannelLayer`` costs a msgpack encode, Redis
+round-trips and a decode for every recipient. Consumers therefore also
+register here, and ``group_send`` hands events straight to the members
+connected to this process. Only the members that live elsewhere go through
+the channel layer, one ``send`` each; a group with no local members goes
+through ``group_send`` as before, and one with no members at all (most
+spectator shards) isn't sent to.
+
+Which channels belong to a group is read from Redis in one round trip and
+then trusted for ``GAME_GROUP_CACHE_TTL`` seconds, with local joins and
+leaves applied to it straight away, so a game whose sockets are all on
+this worker broadcasts without touching Redis. A socket that joins on
+another worker may miss broadcasts sent on cached membership until the
+cache expires; consumers re-check the game once that long has passed (see
+``GameConsumer.connect``).
+
+Local members get the event by a direct call to its handler rather than
+through ``dispatch``, which would first hop to a thread to close database
+connections the game consumers never open; for thousands of spectators
+those hops were most of the cost of a broadcast.
+
+Membership still lives in the channel layer, so broadcasts from other
+workers reach local sockets as before. Layers that cannot list a group's
+members (``RedisPubSubChannelLayer``) always take the normal path, because
+they would deliver to local members a second time. Listing members of a
+``RedisChannelLayer`` relies on channels_redis internals, which only
+``_redis_members`` touches; a version without them takes the normal path
+too.
+"""
+import logging
+import time
+
+from channels.consumer import get_handler_name
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.conf import settings
+
+from . import metrics
+from .frames import for_layer
+
+logger = logging.getLogger(__name__)
+
+# group -> {channel_name: consumer} for consumers connected to this process
+_local = {}
+
+# group -> (expires_at, set of channel names) read from a Redis channel layer
+_cached = {}
+
+
+def join(group, consumer):
+    _local.setdefault(group, {})[consumer.channel_name] = consumer
+    entry = _cached.get(group)
+    if entry is not None:
+        entry[1].add(consumer.channel_name)
+
+
+def leave(group, consumer):
+    members = _local.get(group)
+    if members is not None:
+        members.pop(consumer.channel_name, None)
+        if not members:
+            del _local[group]
+    entry = _cached.get(group)
+    if entry is not None:
+        entry[1].discard(consumer.channel_name)
+
+
+def _redis_layer(channel_layer):
+    try:
+        from channels_redis.core import RedisChannelLayer
+    except ImportError:
+        return False
+    return isinstance(channel_layer, RedisChannelLayer)
+
+
+# The RedisChannelLayer internals _redis_members uses (channels_redis 4).
+_REDIS_METHODS = ('_group_key', 'connection', 'consistent_hash')
+
+# Layer classes found without them, or whose lookup failed once
+_unsupported = set()
+
+
+def _lists_members(channel_layer):
+    """Whether ``_redis_members`` can read ``channel_layer``'s groups."""
+    return (_redis_layer(channel_layer)
+            and type(channel_layer) not in _unsupported
+            and all(callable(getattr(channel_layer, name, None)) for name in _REDIS_METHODS)
+            and isinstance(getattr(channel_layer, 'group_expiry', None), int))
+
+
+def cache_ttl(channel_layer):
+    """How long a join may go unseen by other workers' broadcasts, in seconds."""
+    return getattr(settings, 'GAME_GROUP_CACHE_TTL', 1.0) if _lists_members(channel_layer) else 0
+
+
+async def _redis_members(channel_layer, group):
+    """
+    The channel names in ``group``, read the way ``RedisChannelLayer.group_send``
+    does but in one round trip; None, from then on, if the layer's
+    internals turn out not to work that way.
+    """
+    try:
+        key = channel_layer._group_key(group)
+        connection = channel_layer.connection(channel_layer.consistent_hash(group))
+        pipe = connection.pipeline(transaction=False)
+        pipe.zremrangebyscore(key, min=0, max=int(time.time()) - channel_layer.group_expiry)
+        pipe.zrange(key, 0, -1)
+        _, names = await pipe.execute()
+        return {name.decode() for name in names}
+    except (AttributeError, TypeError, ValueError):
+        logger.exception("Cannot list group members of %s; broadcasting through group_send",
+                         type(channel_layer).__name__)
+        _unsupported.add(type(channel_layer))
+        return None
+
+
+async def _members(channel_layer, group):
+    """Channel names in ``group`` according to the layer, or None if it can't say."""
+    if isinstance(channel_layer, InMemoryChannelLayer):
+        return set(channel_layer.groups.get(group, ()))
+    if not _lists_members(channel_layer):
+        return None
+    now = time.monotonic()
+    entry = _cached.get(group)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+    members = await _redis_members(channel_layer, group)
+    if members is None:
+        return None
+    members.update(_local.get(group, ()))
+    _cached[group] = (now + cache_ttl(channel_layer), members)
+    if len(_cached) > 2 * len(_local) + 1000:
+        for stale in [name for name, (expires, _) in _cached.items() if expires <= now]:
+            del _cached[stale]
+    return members
+
+
+async def group_send(group, event):
+    """``channel_layer.group_send``, delivering to local members directly."""
+    channel_layer = get_channel_layer()
+    local = _local.get(group)
+    members = await _members(channel_layer, group)
+    if members is None or (not local and members):
+        await channel_layer.group_send(group, for_layer(event))
+        metrics.broadcast_deliveries.inc(path='layer')
+        return
+    if not local:
+        return  # Nobody to send to
+
+    handler = get_handler_name(event)
+    for consumer in list(local.values()):
+        try:
+            await getattr(consumer, handler)(event)
+        except Exception:
+            logger.exception("Failed to deliver %s to %s", event['type'], consumer.channel_name)
+    metrics.broadcast_deliveries.inc(len(local), path='local')
+
+    remote = members.difference(local)
+    if remote:
+        event = for_layer(event)
+    for channel in remote:
+        await channel_layer.send(channel, event)
+    metrics.broadcast_deliveries.inc(len(remote), path='remote')
@@ -0,0 +1,90 @@
+"""
+Recent broadcasts per game, so a reconnecting client only gets what it missed.
+
+Every frame sent to a client carries ``seq``. Sequence numbers come from the
+game version, so every worker numbers a game's frames the same way: the
+frames broadcast for version ``v`` are ``v * SEQ_PER_VERSION + i``, except
+the last one, which is always ``v * SEQ_PER_VERSION + SEQ_PER_VERSION - 1``.
+A snapshot of version ``v`` carries that same number, since it stands for
+everything up to and including ``v``.
+
+Actors record each broadcast here, as the already-encoded group events for
+every seat. A client that reconnects with ``?since=<seq>`` is replayed the
+events after ``seq`` when this worker's ring holds all of them. Otherwise it
+gets a snapshot: the ring has overflowed, this worker never broadcast for the
+game, or the game changed somewhere the ring didn't see (another worker, or
+a player joining).
+"""
+from collections import OrderedDict, deque
+
+from django.conf import settings
+
+SEQ_PER_VERSION = 256
+# A broadcast holds at most one frame per action in the actor's batch plus
+# the closing game_state, so batches must stay below this many actions for
+# the frames to fit in their version's numbers. An actor batch is at most
+# GAME_ACTOR_QUEUE_SIZE + 1 actions; ``GameConfig.ready`` checks the setting.
+MAX_BATCH = SEQ_PER_VERSION - 1
+
+# code -> FrameRing; least recently recorded first
+_rings = OrderedDict()
+
+
+def frame_seq(version, index, count):
+    """``seq`` of frame ``index`` of the ``count`` broadcast for ``version``."""
+    if count > SEQ_PER_VERSION:
+        raise ValueError(f"{count} frames don't fit in one version's sequence numbers")
+    if index == count - 1:
+        return snapshot_seq(version)
+    return version * SEQ_PER_VERSION + index
+
+
+def snapshot_seq(version):
+    return version * SEQ_PER_VERSION + SEQ_PER_VERSION - 1
+
+
+class FrameRing:
+    """The last ``size`` broadcasts of one game, from consecutive saves."""
+
+    def __init__(self, size):
+        self.broadcasts = deque(maxlen=size)  # (base_version, version, {seat: [event, ...]})
+
+    def record(self, base_version, version, events):
+        if self.broadcasts and self.broadcasts[-1][1] != base_version:
+            # Saved elsewhere in between; what we hold no longer chains up.
+            self.broadcasts.clear()
+        self.broadcasts.append((base_version, version, events))
+
+    def since(self, seat, seq, version):
+        """
+        ``seat``'s events after ``seq`` up to ``version``, or None unless
+        the ring holds every one of them.
+        """
+        if not self.broadcasts or self.broadcasts[-1][1] != version:
+            return None
+        if not snapshot_seq(self.broadcasts[0][0]) <= seq <= snapshot_seq(version):
+            return None
+        return [
+            event
+            for _, _, events in self.broadcasts
+            for event in events.get(seat, ())
+            if event['seq'] > seq
+        ]
+
+
+def record(code, base_version, version, events):
+    """Remember the broadcast that took ``code`` from ``base_version`` to ``version``."""
+    ring = _rings.get(code)
+    if ring is None:
+        ring = _rings[code] = FrameRing(getattr(settings, 'GAME_RESUME_BUFFER_SIZE', 32))
+        limit = getattr(settings, 'GAME_RESUME_MAX_GAMES', 1000)
+        while len(_rings) > limit:
+            _rings.popitem(last=False)
+    _rings.move_to_end(code)
+    ring.record(base_version, version, events)
+
+
+def since(code, seat, seq, version):
+    """Events ``seat`` missed after ``seq``, or None when it needs a snapshot."""
+    ring = _rings.get(code)
+    return ring.since(seat, seq, version) if ring is not None else None
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import logging
+import tempfile
+import time
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from channels.auth import AuthMiddlewareStack
+from channels.layers import channel_layers
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from cameo_backend import log
+from game.action_log import get_action_log
+from game.routing import websocket_urlpatterns
+from game.state import GameState
+from game.tokens import seat_token
+from game.views import create_game, seat_player2
+
+# Frames that complete an action from the sender's point of view.
+STATE_FRAMES = ('game_state', 'game_patch', 'game_end')
+
+
+class _CountingHandler(logging.Handler):
+    """Formats records like a real handler would, then throws them away."""
+
+    def __init__(self):
+        super().__init__()
+        self.setFormatter(logging.Formatter('{levelname} {asctime} {name} {message}', style='{'))
+        self.emitted = 0
+
+    def emit(self, record):
+        self.format(record)
+        self.emitted += 1
+
+
+class _Seat:
+    """One player's socket, waiting for the state frame that answers an action."""
+
+    def __init__(self, application, code, player):
+        self.communicator = WebsocketCommunicator(
+            application, f'/ws/game/{code}/?player={player}&token={seat_token(code, player)}')
+        self.version = 0
+
+    async def connect(self):
+        connected, _ = await self.communicator.connect()
+        if not connected:
+            raise CommandError("WebSocket connection refused")
+        await self.until_state()
+
+    async def until_state(self, after=0):
+        while True:
+            message = await self.communicator.receive_json_from(timeout=10)
+            if message.get('type') in STATE_FRAMES and message.get('version', 0) > after:
+                self.version = message['version']
+                return
+
+
+class Command(BaseCommand):
+    help = ("Play games over WebSockets through GameConsumer and the game actors at INFO and DEBUG, "
+            "and report throughput, emitted log records and how often logging serialized game state.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=20)
+        parser.add_argument('--rounds', type=int, default=10,
+                            help="Turns played by each player; the player reconnects after every turn.")
+
+    def handle(self, *args, **options):
+        game_logger = logging.getLogger('game')
+        saved = game_logger.handlers, game_logger.level, game_logger.propagate
+        self.application = AuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+        results = {}
+        try:
+            with tempfile.TemporaryDirectory() as log_dir, override_settings(
+                CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+                GAME_ACTION_LOG_DIR=log_dir,
+                GAME_ACTION_RATE=0,
+            ):
+                channel_layers.backends.clear()
+                for level in (logging.INFO, logging.DEBUG):
+                    handler = _CountingHandler()
+                    game_logger.handlers, game_logger.propagate = [handler], False
+                    game_logger.setLevel(level)
+                    with mock.patch.object(GameState, 'to_dict', autospec=True,
+                                           side_effect=GameState.to_dict) as to_dict, \
+                            mock.patch.object(log, 'json', wraps=json) as log_json:
+                        actions, elapsed = asyncio.run(self._bench(options))
+                    results[level] = to_dict.call_count + log_json.dumps.call_count
+                    self.stdout.write(
+                        f"{logging.getLevelName(level):5}  {actions / elapsed:8.0f} actions/s  "
+                        f"{handler.emitted:6d} records  {to_dict.call_count:5d} to_dict calls  "
+                        f"{log_json.dumps.call_count:5d} json.dumps calls from logging"
+                    )
+                get_action_log().flush()
+        finally:
+            channel_layers.backends.clear()
+            game_logger.handlers, level, game_logger.propagate = saved
+            game_logger.setLevel(level)
+
+        if results[logging.INFO]:
+            raise CommandError("Game state was serialized for logging at INFO level")
+        self.stdout.write(self.style.SUCCESS("INFO hot path did not serialize game state"))
+
+    async def _bench(self, options):
+        start = time.perf_counter()
+        actions = await asyncio.gather(*(self._play(options['rounds']) for _ in range(options['games'])))
+        return sum(actions), time.perf_counter() - start
+
+    async def _play(self, rounds):
+        code = (await sync_to_async(create_game)()).code
+        await sync_to_async(seat_player2)(code)
+        seats = {player: _Seat(self.application, code, player) for player in (1, 2)}
+        for seat in seats.values():
+            await seat.connect()
+        actions = 0
+
+        async def act(player, name, **data):
+            nonlocal actions
+            latest = max(seat.version for seat in seats.values())
+            await seats[player].communicator.send_json_to({'action': name, 'player': player, **data})
+            await seats[player].until_state(after=latest)
+            actions += 1
+
+        for player in (1, 2):
+            for position in (2, 3):
+                await act(player, 'peek_own', position=position)
+        for turn in range(rounds * 2):
+            player = 1 + turn % 2
+            await act(player, 'draw')
+            await act(player, 'swap', pos=turn % 4)
+            await act(player, 'discard')
+            # Reconnects take the snapshot path, which logs the whole game at DEBUG.
+            await seats[player].communicator.disconnect()
+            seats[player] = _Seat(self.application, code, player)
+            await seats[player].connect()
+        for seat in seats.values():
+            await seat.communicator.disconnect()
+        return actions
@@ -0,0 +1,56 @@
+import random
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from game.engine import apply
+from game.state import GameState, join_game
+
+
+def _started_game():
+    game = GameState('bench')
+    join_game(game)
+    for player in (1, 2):
+        for position in (2, 3):
+            game, _ = apply(game, {'action': 'peek_own', 'player': player, 'position': position})
+    return game
+
+
+class Command(BaseCommand):
+    help = ("Play random games through the rules engine alone (no sockets, store or logging) "
+            "and report actions/s and games/s.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        # Deck shuffles use the module-level generator.
+        random.seed(options['seed'])
+        rng = random.Random(options['seed'])
+        actions = 0
+        winners = Counter()
+        start = time.perf_counter()
+        for _ in range(options['games']):
+            game = _started_game()
+            actions += 4
+            player = 1
+            while True:
+                if not game.deck.cards or rng.random() < 0.05:
+                    game, _ = apply(game, {'action': 'end_game', 'player': player})
+                    actions += 1
+                    break
+                game, _ = apply(game, {'action': 'draw', 'player': player})
+                actions += 1
+                if rng.random() < 0.5:
+                    game, _ = apply(game, {'action': 'swap', 'player': player, 'pos': rng.randrange(4)})
+                    actions += 1
+                game, _ = apply(game, {'action': 'discard', 'player': player})
+                actions += 1
+                player = 2 if player == 1 else 1
+            winners[game.winner] += 1
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"{actions / elapsed:.0f} actions/s, {options['games'] / elapsed:.0f} games/s "
+                          f"({actions} actions in {elapsed:.2f}s)")
+        self.stdout.write(", ".join(f"{winner}: {count}" for winner, count in sorted(winners.items())))
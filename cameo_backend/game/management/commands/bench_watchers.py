@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from channels.auth import AuthMiddlewareStack
+from channels.layers import channel_layers
+from channels.routing import URLRouter
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from game import actors, groups
+from game.management.commands.bench_ws import Client, percentile
+from game.projections import spectator_groups
+from game.routing import websocket_urlpatterns
+from game.views import ConnectGame, StartGame
+
+
+class Command(BaseCommand):
+    help = ("Watch one game with growing numbers of spectator sockets on this process (in-memory "
+            "channel layer) and report how long the players' broadcasts take, how long the server "
+            "takes to write each broadcast to every watcher, and how long until the (in-process, "
+            "much slower) test clients have all read it. The ceiling is the most watchers whose "
+            "p95 server fan-out stays within --target-ms.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--watchers', default='100,500,1000,2000,4000',
+                            help="Comma-separated spectator counts to try, smallest first.")
+        parser.add_argument('--turns', type=int, default=10, help="Draw/discard turns played per count.")
+        parser.add_argument('--target-ms', type=float, default=100.0,
+                            help="Longest acceptable p95 for a broadcast to reach every watcher.")
+        parser.add_argument('--deltas', action='store_true', help="Spectators connect with ?deltas=1.")
+
+    def handle(self, *args, **options):
+        self.application = AuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+        self.factory = APIRequestFactory()
+        counts = [int(count) for count in options['watchers'].split(',')]
+        ceiling = None
+        self.stdout.write(f"{'watchers':>8} {'player p50':>11} {'player p95':>11} "
+                          f"{'fan-out p50':>12} {'fan-out p95':>12} {'read p95':>9} {'connect s':>10}")
+        for count in counts:
+            with override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+                                   GAME_ACTION_RATE=0, GAME_MAX_WATCHERS=count):
+                channel_layers.backends.clear()
+                try:
+                    players, fanout, read, connect = asyncio.run(self._bench(count, options))
+                finally:
+                    channel_layers.backends.clear()
+            for samples in (players, fanout, read):
+                samples.sort()
+            self.stdout.write(
+                f"{count:8d} {percentile(players, 0.5) * 1000:11.2f} {percentile(players, 0.95) * 1000:11.2f} "
+                f"{percentile(fanout, 0.5) * 1000:12.2f} {percentile(fanout, 0.95) * 1000:12.2f} "
+                f"{percentile(read, 0.95) * 1000:9.2f} {connect:10.2f}")
+            if percentile(fanout, 0.95) * 1000 > options['target_ms']:
+                break
+            ceiling = count
+        if ceiling is None:
+            self.stdout.write(f"Even {counts[0]} watchers took over {options['target_ms']:g} ms at p95.")
+        else:
+            self.stdout.write(f"Ceiling: {ceiling} watchers per worker within {options['target_ms']:g} ms "
+                              f"(GAME_MAX_WATCHERS)")
+
+    def _post(self, view, path, data):
+        return view.as_view()(self.factory.post(path, data, format='json')).data
+
+    async def _bench(self, count, options):
+        post = sync_to_async(self._post, thread_sensitive=False)
+        seats = [await post(StartGame, '/api/start/', {})]
+        code = seats[0]['code']
+        seats.append(await post(ConnectGame, '/api/connect/', {'code': code}))
+        players = {seat['player']: Client(self.application, f"/ws/game/{code}/?player={seat['player']}&token={seat['token']}")
+                   for seat in seats}
+        for client in players.values():
+            await client.connect()
+
+        started = time.perf_counter()
+        query = '?deltas=1' if options['deltas'] else ''
+        watchers = [Client(self.application, f'/ws/game/{code}/watch/{query}') for _ in range(count)]
+        for start in range(0, count, 100):
+            await asyncio.gather(*(watcher.connect() for watcher in watchers[start:start + 100]))
+        connect = time.perf_counter() - started
+
+        player_latency, fanout, read = [], [], []
+
+        async def act(player, name, **data):
+            latest = max(client.version for client in players.values())
+            start = time.perf_counter()
+            await players[player].send({'action': name, 'player': player, **data})
+            await players[player].until_state(after=latest)
+            player_latency.append(time.perf_counter() - start)
+            await self._written(code)
+            fanout.append(time.perf_counter() - start)
+            await asyncio.gather(*(watcher.until_state(after=latest) for watcher in watchers))
+            read.append(time.perf_counter() - start)
+
+        for player in (1, 2):
+            for position in (2, 3):
+                await act(player, 'peek_own', position=position)
+        for turn in range(options['turns'] * 2):
+            player = 1 + turn % 2
+            await act(player, 'draw')
+            await act(player, 'discard')
+        await act(1, 'end_game')
+
+        for client in list(players.values()) + watchers:
+            await client.communicator.disconnect()
+        return player_latency, fanout, read, connect
+
+    async def _written(self, code):
+        """Wait for the game's spectator fan-out to finish and every watcher's outbox to be written."""
+        actor = actors._actors.get(code)
+        if actor is not None and actor.spectator_task is not None:
+            await actor.spectator_task
+        watching = [consumer for group in spectator_groups(code) for consumer in groups._local.get(group, {}).values()]
+        while any(consumer.outbox.frames for consumer in watching):
+            await asyncio.sleep(0.001)
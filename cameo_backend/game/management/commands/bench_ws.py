@@ -0,0 +1,202 @@
+import asyncio
+import json
+import time
+from collections import defaultdict, deque
+
+from asgiref.sync import sync_to_async
+from channels.auth import AuthMiddlewareStack
+from channels.layers import channel_layers
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from cameo_backend.channel_layers import BACKENDS, layer_config
+from game.frames import MSGPACK_SUBPROTOCOL, decode_binary_frame, encode_binary_frame
+from game.routing import websocket_urlpatterns
+from game.views import ConnectGame, StartGame
+
+# Frames that complete an action from the sender's point of view.
+STATE_FRAMES = ('game_state', 'game_patch', 'game_end')
+
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class Client:
+    """One player's socket, counting every frame and byte the server sends it."""
+
+    def __init__(self, application, path, binary=False):
+        self.communicator = WebsocketCommunicator(
+            application, path, subprotocols=[MSGPACK_SUBPROTOCOL] if binary else None)
+        self.binary = binary
+        self.frames = 0
+        self.bytes = 0
+        self.version = 0  # Newest state version received
+        self.pending = deque()  # Messages unpacked from a batch, not returned yet
+
+    async def connect(self):
+        connected, _ = await self.communicator.connect()
+        if not connected:
+            raise RuntimeError("WebSocket connection refused")
+        await self.until_state()
+
+    async def receive(self, timeout):
+        if not self.pending:
+            message = await self.communicator.receive_output(timeout)
+            self.frames += 1
+            if message.get('bytes') is not None:
+                self.bytes += len(message['bytes'])
+                message = decode_binary_frame(message['bytes'])
+            else:
+                self.bytes += len(message['text'].encode())
+                message = json.loads(message['text'])
+            self.pending.extend(message['frames'] if message.get('type') == 'batch' else [message])
+        message = self.pending.popleft()
+        self.version = max(self.version, message.get('version', 0))
+        return message
+
+    async def send(self, message):
+        if self.binary:
+            await self.communicator.send_to(bytes_data=encode_binary_frame(message))
+        else:
+            await self.communicator.send_json_to(message)
+
+    async def until_state(self, after=0, timeout=10):
+        """Wait for a state frame newer than version ``after``."""
+        while True:
+            message = await self.receive(timeout)
+            if message.get('type') in STATE_FRAMES and message.get('version', 0) > after:
+                return
+
+    async def drain(self):
+        self.pending.clear()
+        while not await self.communicator.receive_nothing(timeout=0.01):
+            await self.receive(1)
+
+
+class Command(BaseCommand):
+    help = ("Play N concurrent simulated games over WebSockets (StartGame, ConnectGame, peeks, "
+            "draw/swap/discard rounds, end_game) and report per-action latency percentiles, "
+            "fan-out latency to both seats, actions/sec and bytes/action for each channel layer.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=50)
+        parser.add_argument('--rounds', type=int, default=5, help="Turns played by each player before end_game.")
+        parser.add_argument('--layers', default=','.join(BACKENDS), help=f"Comma-separated: {', '.join(BACKENDS)}.")
+        parser.add_argument('--redis-url', default=settings.REDIS_URL or 'redis://localhost:6379',
+                            help="Redis used by the redis layer, e.g. a local throwaway redis-server.")
+        parser.add_argument('--deltas', action='store_true', help="Connect with ?deltas=1.")
+        parser.add_argument('--msgpack', action='store_true', help=f"Negotiate the {MSGPACK_SUBPROTOCOL} subprotocol.")
+        parser.add_argument('--batch', action='store_true', help="Connect with ?batch=1.")
+        parser.add_argument('--window', type=float, default=settings.GAME_BROADCAST_WINDOW,
+                            help="GAME_BROADCAST_WINDOW in seconds, e.g. 0.005.")
+
+    def handle(self, *args, **options):
+        # Same stack as cameo_backend.asgi.
+        self.application = AuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+        self.factory = APIRequestFactory()
+        for layer in options['layers'].split(','):
+            if layer != 'memory' and not self._redis_available(options['redis_url']):
+                self.stdout.write(self.style.WARNING(f"Skipping {layer} layer: nothing answering at {options['redis_url']}"))
+                continue
+            config = layer_config(
+                layer,
+                options['redis_url'],
+                capacity=settings.CHANNEL_LAYER_CAPACITY,
+                expiry=settings.CHANNEL_LAYER_EXPIRY,
+                group_expiry=settings.CHANNEL_LAYER_GROUP_EXPIRY,
+            )
+            # Simulated players act faster than people; measure the pipeline, not the rate limit.
+            with override_settings(CHANNEL_LAYERS={'default': config}, GAME_ACTION_RATE=0,
+                                   GAME_BROADCAST_WINDOW=options['window']):
+                channel_layers.backends.clear()
+                try:
+                    self._report(layer, asyncio.run(self._bench(options)))
+                finally:
+                    channel_layers.backends.clear()
+
+    def _redis_available(self, url):
+        import redis
+
+        try:
+            return redis.Redis.from_url(url, socket_connect_timeout=1).ping()
+        except redis.RedisError:
+            return False
+
+    async def _bench(self, options):
+        latencies = defaultdict(list)
+        counts = []  # (frames, bytes) per client
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            self._play(options, latencies, counts) for _ in range(options['games'])
+        ))
+        elapsed = time.perf_counter() - start
+        return latencies, sum(frames for frames, _ in counts), sum(size for _, size in counts), elapsed
+
+    async def _timed(self, latencies, name, coroutine):
+        start = time.perf_counter()
+        result = await coroutine
+        latencies[name].append(time.perf_counter() - start)
+        return result
+
+    def _post(self, view, path, data):
+        return view.as_view()(self.factory.post(path, data, format='json')).data
+
+    async def _play(self, options, latencies, counts):
+        post = sync_to_async(self._post, thread_sensitive=False)
+        seats = [await self._timed(latencies, 'start', post(StartGame, '/api/start/', {}))]
+        code = seats[0]['code']
+        seats.append(await self._timed(latencies, 'connect', post(ConnectGame, '/api/connect/', {'code': code})))
+
+        query = ('&deltas=1' if options['deltas'] else '') + ('&batch=1' if options['batch'] else '')
+        players = {seat['player']: Client(self.application,
+                                          f"/ws/game/{code}/?player={seat['player']}&token={seat['token']}{query}",
+                                          options['msgpack'])
+                   for seat in seats}
+        for client in players.values():
+            await client.connect()
+
+        async def act(player, name, **data):
+            # Wait for a version neither socket has seen yet: the latency of
+            # the sender's own update, then of the broadcast reaching the
+            # other seat too (fan-out).
+            latest = max(client.version for client in players.values())
+            start = time.perf_counter()
+            await players[player].send({'action': name, 'player': player, **data})
+            await players[player].until_state(after=latest)
+            latencies[name].append(time.perf_counter() - start)
+            await players[3 - player].until_state(after=latest)
+            latencies['fanout'].append(time.perf_counter() - start)
+
+        for player in (1, 2):
+            for position in (2, 3):
+                await act(player, 'peek_own', position=position)
+        for turn in range(options['rounds'] * 2):
+            player = 1 + turn % 2
+            await act(player, 'draw')
+            await act(player, 'swap', pos=turn % 4)
+            await act(player, 'discard')
+        await act(1, 'end_game')
+
+        for client in players.values():
+            await client.drain()
+            counts.append((client.frames, client.bytes))
+            await client.communicator.disconnect()
+
+    def _report(self, layer, result):
+        latencies, total_frames, total_bytes, elapsed = result
+        ws_actions = sum(len(samples) for name, samples in latencies.items() if name not in ('start', 'connect', 'fanout'))
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{layer} channel layer"))
+        self.stdout.write(f"{'action':10} {'count':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for name, samples in latencies.items():
+            samples.sort()
+            self.stdout.write(
+                f"{name:10} {len(samples):7d} "
+                + " ".join(f"{percentile(samples, q) * 1000:8.2f}" for q in (0.5, 0.95, 0.99))
+            )
+        self.stdout.write(f"{ws_actions / elapsed:.0f} actions/s, {total_frames / ws_actions:.2f} frames/action, "
+                          f"{total_bytes / ws_actions:.0f} bytes/action over {elapsed:.2f}s")
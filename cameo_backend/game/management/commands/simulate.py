@@ -0,0 +1,80 @@
+import time
+from array import array
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game import simulator
+from game.engine import apply
+from game.state import GameState, hand_score, join_game
+
+
+def _replay(games, index, history):
+    """Play game ``index`` of a dealt batch through the engine, following ``history``."""
+    game = GameState('sim')
+    game.deck.cards = bytearray(games.deck[index].tobytes())
+    game.player1_cards = array('B', game.deck.draw(4))
+    join_game(game)
+    for player in (1, 2):
+        for position in (2, 3):
+            game, _ = apply(game, {'action': 'peek_own', 'player': player, 'position': position})
+    for seat, ended, drew, kept_at in history:
+        player = seat + 1
+        if ended[index]:
+            game, _ = apply(game, {'action': 'end_game', 'player': player})
+            break
+        if drew[index]:
+            game, _ = apply(game, {'action': 'draw', 'player': player})
+            if kept_at[index] >= 0:
+                game, _ = apply(game, {'action': 'swap', 'player': player, 'pos': int(kept_at[index])})
+            game, _ = apply(game, {'action': 'discard', 'player': player})
+    return game
+
+
+class Command(BaseCommand):
+    help = ("Play batches of games with game/simulator.py and report win rates for player 1's "
+            "strategy against player 2's. Pass several --end-at values to compare them.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=1_000_000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--end-at', type=float, nargs='+', default=[10],
+                            help="Player 1 ends the game once their hand looks worth at most this")
+        parser.add_argument('--keep-margin', type=float, default=0.0,
+                            help="Player 1 keeps a drawn card worth this much less than their worst card")
+        parser.add_argument('--opponent-end-at', type=float, default=10)
+        parser.add_argument('--opponent-keep-margin', type=float, default=0.0)
+        parser.add_argument('--check', type=int, default=200,
+                            help="Replay this many games through the rules engine and compare scores")
+
+    def handle(self, *args, **options):
+        opponent = simulator.Strategy(options['opponent_end_at'], options['opponent_keep_margin'])
+        if options['check']:
+            self.compare(options['check'], (simulator.Strategy(options['end_at'][0], options['keep_margin']), opponent),
+                       options['seed'])
+
+        for end_at in options['end_at']:
+            strategies = (simulator.Strategy(end_at, options['keep_margin']), opponent)
+            start = time.perf_counter()
+            summary = simulator.summarize(simulator.simulate(options['games'], strategies, seed=options['seed']))
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"end_at={end_at:g} keep_margin={options['keep_margin']:g}: "
+                f"P1 {summary['player1_wins']:.1%} / P2 {summary['player2_wins']:.1%} / tie {summary['ties']:.1%}, "
+                f"mean score {summary['player1_mean']:.2f} vs {summary['player2_mean']:.2f}, "
+                f"{summary['mean_turns']:.1f} draws/game, {options['games'] / elapsed:.0f} games/s")
+
+    def compare(self, count, strategies, seed):
+        games = simulator.deal(count, seed)
+        dealt = games.take(slice(None))
+        history = []
+        results = simulator.play(games, strategies, history=history)
+        winners = {simulator.P1_WINS: 'Player 1', simulator.P2_WINS: 'Player 2', simulator.TIE: 'Tie'}
+        for index in range(count):
+            game = _replay(dealt, index, history)
+            simulated = (list(games.hands[index, 0]), list(games.hands[index, 1]),
+                         list(results.scores[index]), winners[int(results.winner[index])])
+            engine = (list(game.player1_cards), list(game.player2_cards),
+                      [hand_score(game.player1_cards), hand_score(game.player2_cards)], game.winner)
+            if simulated != engine:
+                raise CommandError(f"Game {index} differs from the rules engine: simulated {simulated}, engine {engine}")
+        self.stdout.write(f"{count} simulated games match the rules engine")
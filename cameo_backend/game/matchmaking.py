@@ -0,0 +1,319 @@
+"""
+Quick match: pair up players who ask for a game, without a shared code.
+
+``POST /api/matchmake/`` (optionally with ``{"rating": 1450}``) either pairs
+the caller with the player who has waited longest in their bucket, or puts
+them in the queue and holds the request open for up to
+``GAME_MATCH_WAIT`` seconds (a long poll). Either way the answer is
+``{"code", "player"}`` once there is a game. If the wait runs out first it
+is ``202 {"ticket"}``, and posting again with ``{"ticket": ...}`` keeps the
+caller's place. ``DELETE /api/matchmake/?ticket=...`` leaves the queue.
+
+Players are queued per bucket: one bucket for everyone, or ``rating //
+GAME_MATCH_BUCKET_SIZE`` when a rating is given, each ordered by the time
+they joined. With the Redis game store a bucket is a sorted set, so every
+worker shares one queue. Pairing is a ``ZPOPMIN`` in a Lua script, so it is
+O(log n) and two workers can never pop the same player. Without Redis, each
+bucket is a heap in this process. A ticket stays queued only while its owner
+keeps polling: tickets not seen for ``GAME_MATCH_WAIT`` plus
+``TICKET_GRACE`` seconds are skipped when popped.
+
+The player who completes a pair creates the game the way ``StartGame`` does
+and takes seat 2 through ``seat_player2``. The one who was waiting gets seat
+1 and moves first. Their request learns the code through a per-ticket result
+key. With Redis, a pub/sub message also wakes the request on whichever worker
+holds it. Popping a ticket sets its result to ``PENDING`` in the same step,
+so a poll that finds its ticket gone can tell "paired, game on its way"
+(wait for the code) from "expired" (queue again).
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import secrets
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds a ticket outlives its last poll, covering the client's reconnect.
+TICKET_GRACE = 10
+
+# Result of a ticket that has been popped but whose game isn't created yet.
+PENDING = ''
+
+
+class MatchQueue:
+    """
+    Waiting players, and the long-polling requests on this worker waiting
+    for their tickets to be paired.
+    """
+
+    def __init__(self):
+        self._waiters = {}  # ticket -> (loop, future)
+
+    def pair(self, ticket, bucket, ttl):
+        """
+        Pop the longest-waiting live ticket in ``bucket`` other than
+        ``ticket``, mark its result ``PENDING`` and return it, or queue
+        ``ticket`` and return None. ``ttl`` is how long ``ticket`` stays
+        live without another poll.
+        """
+        raise NotImplementedError
+
+    def requeue(self, ticket, bucket, ttl):
+        """
+        Put a popped ``ticket`` back in ``bucket`` and clear its ``PENDING``
+        result, e.g. when its game couldn't be created.
+        """
+        raise NotImplementedError
+
+    def touch(self, ticket, ttl):
+        """Keep a queued ``ticket`` live; returns its bucket, or None if it isn't queued."""
+        raise NotImplementedError
+
+    def leave(self, ticket):
+        raise NotImplementedError
+
+    def assign(self, ticket, code):
+        """Tell ``ticket``'s owner, on whichever worker, that their game is ``code``."""
+        raise NotImplementedError
+
+    def result(self, ticket):
+        """The code assigned to ``ticket``, ``PENDING`` while its game is being created, or None."""
+        raise NotImplementedError
+
+    async def wait(self, ticket, timeout):
+        """The code assigned to ``ticket`` within ``timeout`` seconds, or None."""
+        from asgiref.sync import sync_to_async
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # Registered before the result check, so an assignment in between isn't missed.
+        self._waiters[ticket] = (loop, future)
+        try:
+            code = await sync_to_async(self.result, thread_sensitive=False)(ticket)
+            if not code:
+                code = await asyncio.wait_for(future, timeout)
+            return code
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            if self._waiters.get(ticket, (None, future))[1] is future:
+                del self._waiters[ticket]
+
+    def _notify(self, ticket, code):
+        """Wake the request on this worker waiting for ``ticket``, if there is one."""
+        waiter = self._waiters.get(ticket)
+        if waiter is not None:
+            loop, future = waiter
+            loop.call_soon_threadsafe(_resolve, future, code)
+
+
+def _resolve(future, code):
+    if not future.done():
+        future.set_result(code)
+
+
+class InMemoryMatchQueue(MatchQueue):
+    """Queue for a single process, paired with ``InMemoryGameStore``."""
+
+    def __init__(self):
+        super().__init__()
+        self._buckets = {}  # bucket -> heap of (joined, n, ticket)
+        self._tickets = {}  # ticket -> (bucket, expires)
+        self._results = {}  # ticket -> (code, expires)
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def pair(self, ticket, bucket, ttl):
+        now = time.time()
+        with self._lock:
+            heap = self._buckets.setdefault(bucket, [])
+            while heap:
+                _, _, other = heapq.heappop(heap)
+                entry = self._tickets.pop(other, None)
+                if other != ticket and entry is not None and entry[1] > now:
+                    if not heap:
+                        del self._buckets[bucket]
+                    self._results[other] = (PENDING, now + ttl)
+                    return other
+            heapq.heappush(heap, (now, next(self._counter), ticket))
+            self._tickets[ticket] = (bucket, now + ttl)
+            return None
+
+    def requeue(self, ticket, bucket, ttl):
+        now = time.time()
+        with self._lock:
+            # Joined "before" everyone else, so it is next.
+            heapq.heappush(self._buckets.setdefault(bucket, []), (0, next(self._counter), ticket))
+            self._tickets[ticket] = (bucket, now + ttl)
+            self._results.pop(ticket, None)
+
+    def touch(self, ticket, ttl):
+        with self._lock:
+            entry = self._tickets.get(ticket)
+            if entry is None:
+                return None
+            self._tickets[ticket] = (entry[0], time.time() + ttl)
+            return entry[0]
+
+    def leave(self, ticket):
+        with self._lock:
+            # Its heap entry is skipped when popped.
+            self._tickets.pop(ticket, None)
+            self._results.pop(ticket, None)
+
+    def assign(self, ticket, code):
+        now = time.time()
+        with self._lock:
+            self._results[ticket] = (code, now + getattr(settings, 'GAME_MATCH_WAIT', 25) + TICKET_GRACE)
+            for stale in [t for t, (_, expires) in self._results.items() if expires < now]:
+                del self._results[stale]
+        self._notify(ticket, code)
+
+    def result(self, ticket):
+        with self._lock:
+            entry = self._results.get(ticket)
+        return entry[0] if entry is not None and entry[1] > time.time() else None
+
+
+# KEYS[1] = bucket sorted set; ARGV = ticket, now, ttl, ticket key prefix,
+# result key prefix. Pops until it finds a ticket that is still live; stale
+# ones are dropped. The popped ticket's result becomes PENDING.
+_PAIR_SCRIPT = """
+while true do
+    local popped = redis.call('ZPOPMIN', KEYS[1])
+    if not popped[1] then
+        break
+    end
+    if popped[1] ~= ARGV[1] and redis.call('DEL', ARGV[4] .. popped[1]) == 1 then
+        redis.call('SET', ARGV[5] .. popped[1], '', 'EX', ARGV[3])
+        return popped[1]
+    end
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+redis.call('SET', ARGV[4] .. ARGV[1], KEYS[1], 'EX', ARGV[3])
+return false
+"""
+
+
+class RedisMatchQueue(MatchQueue):
+    """
+    Queue shared by every worker. A sorted set per bucket holds the waiting
+    tickets, scored by when they joined. ``<prefix>ticket:<t>`` names a live
+    ticket's bucket and expires unless polled, and ``<prefix>result:<t>``
+    holds its game code once paired.
+    """
+
+    def __init__(self, url, prefix='cameo:match:'):
+        super().__init__()
+        import redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.channel = f'{prefix}assigned'
+        self._pair = self.redis.register_script(_PAIR_SCRIPT)
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def _bucket_key(self, bucket):
+        return f'{self.prefix}bucket:{bucket}'
+
+    def _ticket_key(self, ticket):
+        return f'{self.prefix}ticket:{ticket}'
+
+    def _result_key(self, ticket):
+        return f'{self.prefix}result:{ticket}'
+
+    def pair(self, ticket, bucket, ttl):
+        other = self._pair(keys=[self._bucket_key(bucket)],
+                           args=[ticket, time.time(), int(ttl), self._ticket_key(''), self._result_key('')])
+        return other.decode() if other else None
+
+    def requeue(self, ticket, bucket, ttl):
+        pipe = self.redis.pipeline()
+        pipe.zadd(self._bucket_key(bucket), {ticket: 0})
+        pipe.set(self._ticket_key(ticket), self._bucket_key(bucket), ex=int(ttl))
+        pipe.delete(self._result_key(ticket))
+        pipe.execute()
+
+    def touch(self, ticket, ttl):
+        key = self._ticket_key(ticket)
+        pipe = self.redis.pipeline()
+        pipe.get(key)
+        pipe.expire(key, int(ttl))
+        bucket, _ = pipe.execute()
+        return bucket.decode().removeprefix(f'{self.prefix}bucket:') if bucket else None
+
+    def leave(self, ticket):
+        bucket = self.redis.get(self._ticket_key(ticket))
+        pipe = self.redis.pipeline()
+        if bucket:
+            pipe.zrem(bucket, ticket)
+        pipe.delete(self._ticket_key(ticket), self._result_key(ticket))
+        pipe.execute()
+
+    def assign(self, ticket, code):
+        pipe = self.redis.pipeline()
+        pipe.set(self._result_key(ticket), code, ex=int(getattr(settings, 'GAME_MATCH_WAIT', 25) + TICKET_GRACE))
+        pipe.publish(self.channel, f'{ticket} {code}')
+        pipe.execute()
+
+    def result(self, ticket):
+        code = self.redis.get(self._result_key(ticket))
+        return code.decode() if code is not None else None
+
+    async def wait(self, ticket, timeout):
+        self._listen()
+        return await super().wait(ticket, timeout)
+
+    def _listen(self):
+        if self._listener is None:
+            with self._listener_lock:
+                if self._listener is None:
+                    self._listener = threading.Thread(target=self._listen_forever, name='match-listener', daemon=True)
+                    self._listener.start()
+
+    def _listen_forever(self):
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    ticket, code = message['data'].decode().split()
+                    self._notify(ticket, code)
+            except Exception:
+                # Waiters still find their result when their long poll ends.
+                logger.exception("Match listener lost its subscription, resubscribing")
+                time.sleep(1)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """Return the process-wide match queue for ``GAME_STORE_BACKEND``."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                if getattr(settings, 'GAME_STORE_BACKEND', 'memory') == 'redis':
+                    _queue = RedisMatchQueue(settings.REDIS_URL)
+                else:
+                    _queue = InMemoryMatchQueue()
+    return _queue
+
+
+def new_ticket():
+    return secrets.token_urlsafe(12)
+
+
+def bucket_for(rating):
+    """Queue bucket for ``rating`` (None for no rating)."""
+    if rating is None:
+        return 'any'
+    return str(int(rating) // getattr(settings, 'GAME_MATCH_BUCKET_SIZE', 200))
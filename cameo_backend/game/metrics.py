@@ -0,0 +1,210 @@
+"""
+Process-local metrics in the Prometheus text exposition format.
+
+Each daphne worker keeps its own counters and serves them at ``/api/metrics``;
+scrape every worker (or sum by instance) to get totals. Values that live
+elsewhere, such as games per phase in the store, are read at scrape time
+through ``CallbackMetric``.
+"""
+import threading
+from bisect import bisect_left
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; covers in-process sends (sub-millisecond) up to a slow Redis.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# Seconds; applying one action in memory takes microseconds.
+APPLY_BUCKETS = (0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001)
+
+_registry = []
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{n}="{v}"' for (n, _), v in zip(pairs, escaped)) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(labels[name] for name in self.labelnames)
+
+    def samples(self):
+        """Yield ``(suffix, label values, extra labels, value)``."""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield '', key, (), value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        for suffix, key, extra, value in self.samples():
+            lines.append(f'{self.name}{suffix}{_labels(self.labelnames, key, extra)} {_number(value)}')
+        return lines
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Per-bucket (non-cumulative) counts, then count and sum.
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            entry[0][bisect_left(self.buckets, value)] += 1
+            entry[1] += 1
+            entry[2] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), count, total) for key, (counts, count, total) in self._values.items()]
+        for key, counts, count, total in items:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket
+                yield '_bucket', key, (('le', _number(bound)),), cumulative
+            yield '_count', key, (), count
+            yield '_sum', key, (), total
+
+
+class CallbackMetric(Metric):
+    """Metric read at scrape time from ``collect()``, a dict of label tuples to values."""
+
+    def __init__(self, name, help, type, collect, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.type = type
+        self.collect = collect
+
+    def samples(self):
+        for key, value in self.collect().items():
+            yield '', key, (), value
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+websocket_connections = Gauge(
+    'cameo_websocket_connections', 'Open game WebSocket connections.', ['seat'])
+actions_processed = Counter(
+    'cameo_actions_processed_total', 'Game actions applied by the game actors.', ['action'])
+actions_rejected = Counter(
+    'cameo_actions_rejected_total', 'Actions rejected before changing the game, by error code.', ['code'])
+action_apply_latency = Histogram(
+    'cameo_action_apply_seconds', 'Time to apply one validated action to the game state.', ['action'],
+    buckets=APPLY_BUCKETS)
+action_latency = Histogram(
+    'cameo_action_broadcast_seconds', 'Time from an action being queued to its broadcast being sent.')
+group_send_latency = Histogram(
+    'cameo_group_send_seconds', 'Time spent broadcasting one event to a group.')
+resumes = Counter(
+    'cameo_websocket_resumes_total',
+    'Reconnects with ?since=, by whether the missed frames were replayed (frames) or a '
+    'snapshot was sent instead (snapshot).', ['result'])
+frames_coalesced = Counter(
+    'cameo_frames_coalesced_total', 'Queued game_state frames dropped for a newer one because the client fell behind.')
+slow_consumer_disconnects = Counter(
+    'cameo_slow_consumer_disconnects_total', 'Sockets closed because their outbound queue was full.')
+actions_rate_limited = Counter(
+    'cameo_actions_rate_limited_total', 'Inbound messages rejected by the per-connection rate limit.')
+spectator_fanout_latency = Histogram(
+    'cameo_spectator_fanout_seconds', 'Time to send one broadcast to every spectator shard of a game.')
+spectator_broadcasts_superseded = Counter(
+    'cameo_spectator_broadcasts_superseded_total',
+    'Spectator broadcasts replaced by a newer one before the fan-out got to them.')
+watchers_rejected = Counter(
+    'cameo_watchers_rejected_total', 'Spectator connections refused because the worker had GAME_MAX_WATCHERS.')
+matches_made = Counter(
+    'cameo_matches_made_total', 'Games created by pairing two quick-match players.')
+match_waiters = Gauge(
+    'cameo_match_waiters', 'Quick-match requests waiting for an opponent on this worker.')
+bots_active = Gauge(
+    'cameo_bots_active', 'Bot opponents playing games on this worker.')
+bot_think_latency = Histogram(
+    'cameo_bot_think_seconds', 'Time a bot took to pick a move, including waiting for a free pool process.')
+broadcast_deliveries = Counter(
+    'cameo_broadcast_deliveries_total',
+    'Broadcast deliveries: straight to a socket on this worker (local), through the layer '
+    'to one socket elsewhere (remote), or whole-group channel layer sends (layer).', ['path'])
+
+
+def _games_by_phase():
+    from .store import get_store
+
+    return {(phase,): count for phase, count in get_store().count_by_phase().items()}
+
+
+def _codes_allocated():
+    from .codes import get_allocator
+
+    return {(): get_allocator().allocated()}
+
+
+def _code_space_fill():
+    from .codes import SIZE, get_allocator
+
+    return {(): get_allocator().allocated() / SIZE}
+
+
+def _evictions():
+    from .store import get_store
+
+    return {(reason,): count for reason, count in get_store().evictions.items()}
+
+
+CallbackMetric('cameo_games', 'Games in the store by phase.', 'gauge', _games_by_phase, ['phase'])
+CallbackMetric('cameo_game_codes_allocated',
+               'Game codes currently allocated; with Redis this includes expired games not reclaimed yet.',
+               'gauge', _codes_allocated)
+CallbackMetric('cameo_game_code_space_fill', 'Fraction of the game code space allocated.', 'gauge',
+               _code_space_fill)
+CallbackMetric('cameo_game_evictions_total', 'Games evicted from the store, by phase or lru.',
+               'counter', _evictions, ['reason'])
@@ -0,0 +1,142 @@
+"""
+Per-seat views of a game.
+
+The server used to broadcast both hands to everyone and leave hiding them to
+the client. Each seat now gets a projection holding only what it may see:
+
+* a player sees the cards in their own hand they have peeked, the cards of
+  the opponent's hand they have peeked with ``peek_opponent``, and the card
+  they drew;
+* every other card, including anybody else's drawn card, stays hidden
+  (``null``);
+* spectators see no cards at all;
+* once ``reveal_all`` is set everyone sees everything.
+
+Sockets of each seat share a group (``game_<code>_<seat>``), so a frame is
+only ever delivered to the seat it was projected for. Spectators are spread
+over ``GAME_SPECTATOR_SHARDS`` groups instead, so a featured game with
+thousands of watchers is broadcast as several smaller group sends.
+Projections are cached per game version: each one is built, and encoded as
+a snapshot frame in each format asked for, once per change however many
+sockets, reconnects or syncs ask for it.
+"""
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .history import snapshot_seq
+from .state import card_to_wire, peeked_to_wire
+
+SEATS = ('player1', 'player2', 'spectator')
+
+# code -> (version, {seat: game_state message}); least recently used first
+_projections = OrderedDict()
+
+
+def seat_for(player):
+    """Seat name for a player number (int or query-string value)."""
+    return f'player{player}' if str(player) in ('1', '2') else 'spectator'
+
+
+def seat_group(code, seat):
+    return f'game_{code}_{seat}'
+
+
+def spectator_groups(code):
+    """Every group a game's spectators are spread over."""
+    return [f'game_{code}_spectator_{shard}' for shard in range(getattr(settings, 'GAME_SPECTATOR_SHARDS', 4))]
+
+
+def spectator_group(code, channel_name):
+    """The spectator group for the socket on ``channel_name``."""
+    groups = spectator_groups(code)
+    return groups[zlib.crc32(channel_name.encode()) % len(groups)]
+
+
+def _hand(cards, seen, reveal):
+    """``cards`` with the ones not marked in ``seen`` (None: none of them) hidden."""
+    if cards is None:
+        return []
+    return [card_to_wire(card) if reveal or (seen is not None and seen[i]) else None
+            for i, card in enumerate(cards)]
+
+
+def _seen(peeked, seen_by_opponent, seat, owner):
+    """Flags of the cards in ``owner``'s hand that ``seat`` has seen."""
+    if seat == owner:
+        return peeked
+    if seat == 'spectator':
+        return None
+    return seen_by_opponent
+
+
+def _project(game, seat):
+    reveal = game.reveal_all
+    return {
+        'type': 'game_state',
+        'player1_cards': _hand(game.player1_cards, _seen(game.player1_peeked, game.player1_seen_by_opponent,
+                                                         seat, 'player1'), reveal),
+        'player2_cards': _hand(game.player2_cards, _seen(game.player2_peeked, game.player2_seen_by_opponent,
+                                                         seat, 'player2'), reveal),
+        'player1_peeked': peeked_to_wire(game.player1_peeked),
+        'player2_peeked': peeked_to_wire(game.player2_peeked) or [],
+        'current_player': game.current_player,
+        'game_started': game.game_started,
+        'drawn_card': card_to_wire(game.drawn_card) if reveal or seat == seat_for(game.drawn_by) else None,
+        'drawn_by': game.drawn_by,
+        'reveal_all': reveal,
+        'version': game.version
+    }
+
+
+def _views(game):
+    """The cache for ``game``'s version, or None for a stale read."""
+    entry = _projections.get(game.code)
+    if entry is not None and entry[0] > game.version:
+        # Don't let a stale read push the current version out.
+        return None
+    if entry is None or entry[0] != game.version:
+        entry = _projections[game.code] = (game.version, {})
+        limit = getattr(settings, 'GAME_PROJECTION_CACHE_SIZE', 10000)
+        while len(_projections) > limit:
+            _projections.popitem(last=False)
+    _projections.move_to_end(game.code)
+    return entry[1]
+
+
+def project(game, seat):
+    """
+    ``game_state`` message for ``seat``. The returned dict is shared with
+    other callers and must not be mutated.
+    """
+    views = _views(game)
+    if views is None:
+        return _project(game, seat)
+    if seat not in views:
+        views[seat] = _project(game, seat)
+    return views[seat]
+
+
+def snapshot_event(game, seat):
+    """
+    ``{"frame": message}`` holding the snapshot of ``project(game, seat)``,
+    for ``frames.event_frame``; cached, so its encodings are too.
+    """
+    views = _views(game)
+    key = (seat, 'snapshot')
+    event = views.get(key) if views is not None else None
+    if event is None:
+        event = {'frame': dict(project(game, seat), seq=snapshot_seq(game.version))}
+        if views is not None:
+            views[key] = event
+    return event
+
+
+def project_message(message, game, seat):
+    """``message`` from ``apply_action`` as ``seat`` should receive it."""
+    if message['type'] == 'game_state':
+        return project(game, seat)
+    if message['type'] == 'game_update' and seat != seat_for(message['player']) and not game.reveal_all:
+        return dict(message, card=None)
+    return message
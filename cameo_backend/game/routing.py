@@ -3,4 +3,5 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/game/(?P<game_code>\w+)/$', consumers.GameConsumer.as_asgi()),
+    re_path(r'ws/game/(?P<game_code>\w+)/watch/$', consumers.SpectatorConsumer.as_asgi()),
 ]
\ No newline at end of file
@@ -0,0 +1,228 @@
+"""
+Many Cameo games at once, as NumPy arrays.
+
+Playing out deals one ``GameState`` at a time through ``engine.apply`` runs
+a few thousand games a second, which is too slow for comparing strategies
+over millions of deals. ``Games`` holds a whole batch as arrays instead
+(decks, hands and what each player has seen of their own hand), and
+``play`` advances every game in the batch one turn per step with
+vectorized operations, so a step costs about the same for ten games as for
+ten thousand.
+
+Scores come from ``state.CARD_SCORES``, the table the game itself scores
+with, so red kings count 0 and black kings 13 here too. Seat 0 is player 1.
+A simulated turn is what the UI offers: end the game, or draw and then
+either discard the card or swap it into the hand. Simulated players
+remember every card they have seen in their own hand; cards they haven't
+seen are valued at the deck average.
+
+``choose`` picks a move for one real player by sampling what they can't
+see and playing each option out; bots call it in worker processes.
+
+``manage.py simulate`` reports win rates for pairs of strategies and can
+replay part of a batch through ``engine.apply`` to check the two agree.
+"""
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from .state import CARD_SCORES
+
+SCORES = np.frombuffer(CARD_SCORES, dtype=np.uint8).astype(np.int16)
+# What a card nobody has looked at is worth on average.
+UNSEEN = float(SCORES.mean())
+
+# Results.winner values
+P1_WINS, P2_WINS, TIE = 0, 1, 2
+
+# Deck positions dealt to player 1 then player 2; like ``Deck.draw``,
+# cards come off the end of the deck.
+_DEAL = np.arange(51, 43, -1)
+
+# end_at: end the game instead of drawing once the hand looks worth at most
+# this much. keep_margin: keep a drawn card only if it is worth at least
+# this much less than the hand's worst-looking card, which it replaces.
+Strategy = namedtuple('Strategy', 'end_at keep_margin', defaults=(10, 0.0))
+
+# scores: (n, 2) final hand scores; winner: P1_WINS, P2_WINS or TIE; ender:
+# seat that ended each game; turns: draws per game.
+Results = namedtuple('Results', 'scores winner ender turns')
+
+
+class Games:
+    """``n`` games as arrays; every game's deck runs from index 0 to ``top``."""
+    __slots__ = ('deck', 'top', 'hands', 'seen')
+
+    def __init__(self, deck, top, hands, seen):
+        self.deck = deck    # (n, 52) uint8 card ids
+        self.top = top      # (n,) int16: index of the next card to draw, -1 when empty
+        self.hands = hands  # (n, 2, 4) uint8 card ids
+        self.seen = seen    # (n, 2, 4) bool: cards each seat has seen in its own hand
+
+    def __len__(self):
+        return len(self.top)
+
+    def take(self, index):
+        """Copy of the games at ``index`` (anything NumPy can index with)."""
+        return Games(self.deck[index].copy(), self.top[index].copy(),
+                     self.hands[index].copy(), self.seen[index].copy())
+
+
+def deal(n, seed=None):
+    """``n`` freshly dealt games, both players having peeked their bottom two cards."""
+    rng = np.random.default_rng(seed)
+    deck = rng.permuted(np.broadcast_to(np.arange(52, dtype=np.uint8), (n, 52)), axis=1)
+    hands = deck[:, _DEAL].reshape(n, 2, 4)
+    seen = np.zeros((n, 2, 4), dtype=bool)
+    seen[:, :, 2:] = True
+    return Games(deck, np.full(n, 51 - len(_DEAL), dtype=np.int16), hands, seen)
+
+
+def estimate(games, seat):
+    """(n, 4) worth of each card in ``seat``'s hand, as that player sees it."""
+    return np.where(games.seen[:, seat], SCORES[games.hands[:, seat]], UNSEEN)
+
+
+def score(games):
+    scores = SCORES[games.hands].sum(axis=2)
+    winner = np.where(scores[:, 0] < scores[:, 1], P1_WINS,
+                      np.where(scores[:, 1] < scores[:, 0], P2_WINS, TIE)).astype(np.int8)
+    return scores, winner
+
+
+def play(games, strategies=(Strategy(), Strategy()), seat=0, must_draw=False, history=None):
+    """
+    Play ``games`` to the end in place, ``seat`` moving first, and return
+    ``Results``. ``strategies`` has one ``Strategy`` per seat; with
+    ``must_draw`` the first turn is a draw whatever ``seat``'s strategy
+    says. When ``history`` is a list, one ``(seat, ended, drew, kept_at)``
+    tuple of arrays is appended per turn, ``kept_at`` being -1 where the
+    drawn card was discarded.
+    """
+    n = len(games)
+    rows = np.arange(n)
+    end_at = [strategy.end_at for strategy in strategies]
+    keep_margin = [strategy.keep_margin for strategy in strategies]
+    ender = np.full(n, -1, dtype=np.int8)
+    turns = np.zeros(n, dtype=np.int16)
+    active = np.ones(n, dtype=bool)
+
+    while active.any():
+        values = estimate(games, seat)
+        # End the game when the hand looks good enough, or there's nothing left to draw.
+        ended = active & (games.top < 0)
+        if not must_draw:
+            ended |= active & (values.sum(axis=1) <= end_at[seat])
+        must_draw = False
+        ender[ended] = seat
+        active &= ~ended
+
+        card = games.deck[rows, np.maximum(games.top, 0)]
+        games.top -= active
+        turns += active
+        pos = values.argmax(axis=1)
+        keep = active & (SCORES[card] + keep_margin[seat] < values[rows, pos])
+        kept = rows[keep]
+        games.hands[kept, seat, pos[keep]] = card[keep]
+        games.seen[kept, seat, pos[keep]] = True
+
+        if history is not None:
+            history.append((seat, ended, active.copy(), np.where(keep, pos, -1)))
+        seat = 1 - seat
+
+    scores, winner = score(games)
+    return Results(scores, winner, ender, turns)
+
+
+def simulate(n, strategies=(Strategy(), Strategy()), seed=None, chunk=100_000):
+    """Deal and play ``n`` games, ``chunk`` at a time to bound memory."""
+    rng = np.random.default_rng(seed)
+    parts = [play(deal(min(chunk, n - start), rng), strategies) for start in range(0, n, chunk)]
+    return Results(*(np.concatenate(field) for field in zip(*parts)))
+
+
+def summarize(results):
+    n = len(results.winner)
+    wins = np.bincount(results.winner, minlength=3) / n
+    return {
+        'games': n,
+        'player1_wins': float(wins[P1_WINS]),
+        'player2_wins': float(wins[P2_WINS]),
+        'ties': float(wins[TIE]),
+        'player1_mean': float(results.scores[:, 0].mean()),
+        'player2_mean': float(results.scores[:, 1].mean()),
+        'mean_turns': float(results.turns.mean()),
+    }
+
+
+def _sample(n, hand, drawn, deck_size, rng):
+    """
+    ``n`` games consistent with what seat 0 knows: its ``hand`` (None where
+    unseen), its ``drawn`` card and how many cards are left to draw.
+    Everything else is dealt at random from the cards seat 0 hasn't seen.
+    """
+    visible = [card for card in hand if card is not None] + ([drawn] if drawn is not None else [])
+    unseen = np.setdiff1d(np.arange(52, dtype=np.uint8), np.array(visible, dtype=np.uint8))
+    cards = rng.permuted(np.broadcast_to(unseen, (n, len(unseen))), axis=1)
+    blanks = [i for i, card in enumerate(hand) if card is None]
+
+    hands = np.empty((n, 2, 4), dtype=np.uint8)
+    hands[:, 0] = [0 if card is None else card for card in hand]
+    hands[:, 0, blanks] = cards[:, :len(blanks)]
+    hands[:, 1] = cards[:, len(blanks):len(blanks) + 4]
+    rest = cards[:, len(blanks) + 4:]
+    deck_size = min(deck_size, rest.shape[1])
+    deck = np.zeros((n, 52), dtype=np.uint8)
+    deck[:, :deck_size] = rest[:, :deck_size]
+
+    seen = np.zeros((n, 2, 4), dtype=bool)
+    seen[:, 0] = [card is not None for card in hand]
+    # Guess that the opponent has seen just their bottom two cards.
+    seen[:, 1, 2:] = True
+    return Games(deck, np.full(n, deck_size - 1, dtype=np.int16), hands, seen)
+
+
+def _wins(results):
+    """Seat 0's wins in ``results``, ties counting half."""
+    return float(np.count_nonzero(results.winner == P1_WINS) + 0.5 * np.count_nonzero(results.winner == TIE))
+
+
+def _outcome(games, move, drawn, strategies):
+    if move == 'end':
+        return Results(*score(games), None, None)
+    if move == 'draw':
+        return play(games, strategies, seat=0, must_draw=True)
+    if move != 'discard':
+        games.hands[:, 0, move] = drawn
+        games.seen[:, 0, move] = True
+    return play(games, strategies, seat=1)
+
+
+def choose(hand, drawn, deck_size, budget, strategy=Strategy(), batch=1000, seed=None):
+    """
+    The move that wins most often for a player on their turn, judging from
+    their ``hand`` (4 card ids, None for cards they haven't seen), the card
+    they ``drew`` (None before drawing) and the number of cards left to
+    draw. Before drawing the moves are ``'end'`` and ``'draw'``; after,
+    ``'discard'`` or the position to swap the drawn card into.
+
+    Every move is played out over the same sampled games, ``batch`` at a
+    time, until ``budget`` seconds have passed (at least one batch); both
+    players follow ``strategy`` afterwards.
+    """
+    deadline = time.perf_counter() + budget
+    if drawn is None:
+        if deck_size == 0:
+            return 'end'
+        moves = ['end', 'draw']
+    else:
+        moves = ['discard', 0, 1, 2, 3]
+    rng = np.random.default_rng(seed)
+    wins = dict.fromkeys(moves, 0.0)
+    while True:
+        games = _sample(batch, hand, drawn, deck_size, rng)
+        for move in moves:
+            wins[move] += _wins(_outcome(games.take(slice(None)), move, drawn, (strategy, strategy)))
+        if time.perf_counter() >= deadline:
+            return max(moves, key=wins.get)
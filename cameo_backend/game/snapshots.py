@@ -0,0 +1,159 @@
+"""
+Snapshots of the in-memory game store, so a restart doesn't end every game.
+
+A background thread appends every game whose version changed since the last
+pass (and a tombstone for every game that went away) to a local file, using
+``GameState.to_bytes``. Once the dead records outnumber the live ones the
+file is rewritten from scratch, next to the old one, and swapped in with
+``os.replace``. Nothing here runs on the event loop.
+
+On startup ``restore`` maps the file with ``mmap`` and replays the records
+(last one per code wins) straight into the store, before the first socket is
+served. A torn record at the end, from a crash mid-write, is ignored.
+
+File layout: ``MAGIC``, then records of ``kind (B), length (I), body``.
+"""
+import atexit
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'CAMEOSN\x01'
+_RECORD = struct.Struct('<BI')
+_GAME, _TOMBSTONE = 1, 2
+
+
+def _record(kind, body):
+    return _RECORD.pack(kind, len(body)) + body
+
+
+def read_snapshot(path, state_class):
+    """Return ``{code: game}`` from the snapshot at ``path`` ({} if there is none)."""
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return {}
+    games = {}
+    with f:
+        if os.fstat(f.fileno()).st_size < len(MAGIC):
+            return {}
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:len(MAGIC)] != MAGIC:
+                logger.warning("Ignoring %s: not a game snapshot", path)
+                return {}
+            offset = len(MAGIC)
+            while offset + _RECORD.size <= len(data):
+                kind, length = _RECORD.unpack_from(data, offset)
+                offset += _RECORD.size
+                if offset + length > len(data):
+                    logger.warning("Snapshot %s ends in a partial record; ignoring it", path)
+                    break
+                if kind == _GAME:
+                    game = state_class.from_bytes(data, offset)
+                    games[game.code] = game
+                elif kind == _TOMBSTONE:
+                    games.pop(bytes(data[offset:offset + length]).decode(), None)
+                offset += length
+    return games
+
+
+class Snapshotter:
+    """Keeps ``path`` in step with an ``InMemoryGameStore``."""
+
+    def __init__(self, store, path):
+        self.store = store
+        self.path = path
+        self._written = {}  # code -> version in the file
+        self._records = 0  # records in the file, live or not
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def restore(self, reserve_code):
+        """Load the snapshot into the store; ``reserve_code`` marks each code as taken."""
+        games = read_snapshot(self.path, self.store.state_class)
+        for game in games.values():
+            self.store.restore(game)
+            reserve_code(game.code)
+        with self._lock:
+            self._rewrite(games)
+        if games:
+            logger.info("Restored %d game(s) from %s", len(games), self.path)
+        return len(games)
+
+    def snapshot(self):
+        """Write out every change since the last call; returns how many records were written."""
+        with self._lock:
+            current = self.store.versions()
+            changed = [code for code, version in current.items() if self._written.get(code) != version]
+            removed = [code for code in self._written if code not in current]
+            if not changed and not removed:
+                return 0
+            if self._records + len(changed) + len(removed) > 2 * len(current) + 64:
+                self._rewrite(self._read(current))
+            else:
+                self._append(self._read(changed), removed)
+            return len(changed) + len(removed)
+
+    def _read(self, codes):
+        games = {}
+        for code in codes:
+            game = self.store.get(code)
+            if game is not None:
+                games[code] = game
+        return games
+
+    def _append(self, games, removed):
+        records = [_record(_GAME, game.to_bytes()) for game in games.values()]
+        records += [_record(_TOMBSTONE, code.encode()) for code in removed]
+        mode = 'ab' if os.path.exists(self.path) else 'wb'
+        with open(self.path, mode) as f:
+            if mode == 'wb':
+                f.write(MAGIC)
+            f.write(b''.join(records))
+            f.flush()
+            os.fsync(f.fileno())
+        for code, game in games.items():
+            self._written[code] = game.version
+        for code in removed:
+            del self._written[code]
+        self._records += len(records)
+
+    def _rewrite(self, games):
+        """Replace the file with one record for each of ``games``."""
+        body = [_record(_GAME, game.to_bytes()) for game in games.values()]
+        temp = f'{self.path}.tmp'
+        with open(temp, 'wb') as f:
+            f.write(MAGIC)
+            f.write(b''.join(body))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.path)
+        self._written = {code: game.version for code, game in games.items()}
+        self._records = len(body)
+
+    def start(self, interval):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._snapshot_forever, args=(interval,),
+                                            name='game-snapshotter', daemon=True)
+            self._thread.start()
+            # One last pass on a clean shutdown, e.g. a deploy's SIGTERM.
+            atexit.register(self._final_snapshot)
+
+    def _snapshot_forever(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.snapshot()
+            except Exception:
+                logger.exception("Game snapshot failed")
+
+    def _final_snapshot(self):
+        try:
+            self.snapshot()
+        except Exception:
+            logger.exception("Final game snapshot failed")
@@ -0,0 +1,261 @@
+"""
+Game state and cards, with no Django in sight: the rules engine, the
+simulator and bot worker processes import this without settings.
+"""
+import random
+import struct
+from array import array
+
+# GameState.to_bytes header: version, current_player, flags, drawn_card,
+# drawn_by, winner, code length.
+_STATE_HEADER = struct.Struct('<IBBBBBB')
+_NO_CARD = 255  # drawn_card / missing-array marker
+_WINNERS = (None, 'Player 1', 'Player 2', 'Tie')
+_GAME_STARTED, _GAME_ENDED, _REVEAL_ALL = 1, 2, 4
+
+
+class Deck:
+    """
+    Cards are ints 0-51: ``suit_index * 13 + rank_index``. They are only
+    turned back into ``(rank, suit)`` pairs at the wire boundary, see
+    ``card_to_wire``.
+    """
+    __slots__ = ('cards',)
+
+    suits = ['H', 'D', 'C', 'S']
+    ranks = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K']
+    values = {'A': 1, '2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8, '9': 9, '10': 10, 'J': 11, 'Q': 12, 'K': 13}
+
+    def __init__(self):
+        self.cards = bytearray(range(52))
+        random.shuffle(self.cards)
+
+    def draw(self, num=1):
+        return [self.cards.pop() for _ in range(min(num, len(self.cards)))]
+
+
+WIRE_CARDS = [(rank, suit) for suit in Deck.suits for rank in Deck.ranks]
+CARD_IDS = {card: i for i, card in enumerate(WIRE_CARDS)}
+# Score of every card id; red kings count 0, black kings 13.
+CARD_SCORES = bytes(0 if rank == 'K' and suit in ('H', 'D') else Deck.values[rank] for rank, suit in WIRE_CARDS)
+
+
+def card_to_wire(card):
+    return WIRE_CARDS[card] if card is not None else None
+
+
+def card_from_wire(card):
+    return CARD_IDS[tuple(card)]
+
+
+def hand_to_wire(hand):
+    return [WIRE_CARDS[card] for card in hand] if hand is not None else None
+
+
+def peeked_to_wire(peeked):
+    return [bool(flag) for flag in peeked] if peeked is not None else None
+
+
+def hand_score(hand):
+    return sum(CARD_SCORES[card] for card in hand)
+
+
+class GameState:
+    """
+    Hands are ``array('B')`` of card ids and peek flags are ``bytearray``s,
+    so a resident game is a few hundred bytes.
+
+    ``player1_peeked`` marks the cards of player 1's hand that player 1 has
+    looked at; ``player1_seen_by_opponent`` the ones player 2 has looked at
+    with ``peek_opponent``. Likewise for player 2.
+    """
+    __slots__ = ('code', 'deck', 'player1_cards', 'player2_cards', 'player1_peeked', 'player2_peeked',
+                 'player1_seen_by_opponent', 'player2_seen_by_opponent', 'current_player', 'game_ended', 'winner', 'game_started', 'drawn_card', 'drawn_by',
+                 'reveal_all', 'version')
+
+    def __init__(self, code):
+        self.code = code
+        self.deck = Deck()
+        self.player1_cards = array('B', self.deck.draw(4))
+        self.player2_cards = None
+        self.player1_peeked = bytearray(4)
+        self.player2_peeked = None
+        self.player1_seen_by_opponent = bytearray(4)
+        self.player2_seen_by_opponent = None
+        self.current_player = 1
+        self.game_ended = False
+        self.winner = None
+        self.game_started = False
+        self.drawn_card = None
+        self.drawn_by = None
+        self.reveal_all = False  # Define reveal_all here
+        self.version = 0  # Bumped by the game store on every successful save
+
+    def copy(self, deck=False, hands=False, peeked=False):
+        """
+        Shallow copy that shares the deck, hands and peek flags with this
+        game, except the ones named, which are copied.
+        """
+        game = GameState.__new__(GameState)
+        game.code = self.code
+        if deck:
+            game.deck = Deck.__new__(Deck)
+            game.deck.cards = bytearray(self.deck.cards)
+        else:
+            game.deck = self.deck
+        if hands:
+            game.player1_cards = _copy(self.player1_cards)
+            game.player2_cards = _copy(self.player2_cards)
+        else:
+            game.player1_cards = self.player1_cards
+            game.player2_cards = self.player2_cards
+        if peeked:
+            game.player1_peeked = _copy(self.player1_peeked)
+            game.player2_peeked = _copy(self.player2_peeked)
+            game.player1_seen_by_opponent = _copy(self.player1_seen_by_opponent)
+            game.player2_seen_by_opponent = _copy(self.player2_seen_by_opponent)
+        else:
+            game.player1_peeked = self.player1_peeked
+            game.player2_peeked = self.player2_peeked
+            game.player1_seen_by_opponent = self.player1_seen_by_opponent
+            game.player2_seen_by_opponent = self.player2_seen_by_opponent
+        game.current_player = self.current_player
+        game.game_ended = self.game_ended
+        game.winner = self.winner
+        game.game_started = self.game_started
+        game.drawn_card = self.drawn_card
+        game.drawn_by = self.drawn_by
+        game.reveal_all = self.reveal_all
+        game.version = self.version
+        return game
+
+    @property
+    def phase(self):
+        if self.player2_cards is None:
+            return 'lobby'
+        if self.game_ended:
+            return 'ended'
+        if self.game_started:
+            return 'started'
+        return 'peeking'
+
+    def to_dict(self):
+        return {
+            'code': self.code,
+            'deck': list(self.deck.cards),
+            'player1_cards': list(self.player1_cards),
+            'player2_cards': _list(self.player2_cards),
+            'player1_peeked': list(self.player1_peeked),
+            'player2_peeked': _list(self.player2_peeked),
+            'player1_seen_by_opponent': list(self.player1_seen_by_opponent),
+            'player2_seen_by_opponent': _list(self.player2_seen_by_opponent),
+            'current_player': self.current_player,
+            'game_ended': self.game_ended,
+            'winner': self.winner,
+            'game_started': self.game_started,
+            'drawn_card': self.drawn_card,
+            'drawn_by': self.drawn_by,
+            'reveal_all': self.reveal_all,
+        }
+
+    @classmethod
+    def from_dict(cls, data, version=0):
+        game = cls.__new__(cls)
+        game.code = data['code']
+        game.deck = Deck.__new__(Deck)
+        game.deck.cards = bytearray(data['deck'])
+        game.player1_cards = array('B', data['player1_cards'])
+        game.player2_cards = array('B', data['player2_cards']) if data['player2_cards'] is not None else None
+        game.player1_peeked = bytearray(data['player1_peeked'])
+        game.player2_peeked = bytearray(data['player2_peeked']) if data['player2_peeked'] is not None else None
+        game.player1_seen_by_opponent = bytearray(data['player1_seen_by_opponent'])
+        game.player2_seen_by_opponent = (bytearray(data['player2_seen_by_opponent'])
+                                         if data['player2_seen_by_opponent'] is not None else None)
+        game.current_player = data['current_player']
+        game.game_ended = data['game_ended']
+        game.winner = data['winner']
+        game.game_started = data['game_started']
+        game.drawn_card = data['drawn_card']
+        game.drawn_by = data['drawn_by']
+        game.reveal_all = data['reveal_all']
+        game.version = version
+        return game
+
+    def to_bytes(self):
+        """Compact binary encoding, used for snapshots; includes the version."""
+        code = self.code.encode()
+        flags = ((_GAME_STARTED if self.game_started else 0) | (_GAME_ENDED if self.game_ended else 0)
+                 | (_REVEAL_ALL if self.reveal_all else 0))
+        parts = [_STATE_HEADER.pack(
+            self.version,
+            self.current_player,
+            flags,
+            _NO_CARD if self.drawn_card is None else self.drawn_card,
+            self.drawn_by or 0,
+            _WINNERS.index(self.winner),
+            len(code),
+        ), code]
+        for values in (self.deck.cards, self.player1_cards, self.player2_cards,
+                       self.player1_peeked, self.player2_peeked,
+                       self.player1_seen_by_opponent, self.player2_seen_by_opponent):
+            if values is None:
+                parts.append(bytes((_NO_CARD,)))
+            else:
+                parts.append(bytes((len(values),)))
+                parts.append(bytes(values))
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data, offset=0):
+        """Decode ``to_bytes`` output starting at ``offset`` in any buffer."""
+        version, current_player, flags, drawn_card, drawn_by, winner, code_length = \
+            _STATE_HEADER.unpack_from(data, offset)
+        offset += _STATE_HEADER.size
+        game = cls.__new__(cls)
+        game.code = bytes(data[offset:offset + code_length]).decode()
+        offset += code_length
+        arrays = []
+        for _ in range(7):
+            length = data[offset]
+            offset += 1
+            if length == _NO_CARD:
+                arrays.append(None)
+            else:
+                arrays.append(bytearray(data[offset:offset + length]))
+                offset += length
+        (deck, player1_cards, player2_cards, player1_peeked, player2_peeked,
+         player1_seen_by_opponent, player2_seen_by_opponent) = arrays
+        game.deck = Deck.__new__(Deck)
+        game.deck.cards = deck
+        game.player1_cards = array('B', player1_cards)
+        game.player2_cards = array('B', player2_cards) if player2_cards is not None else None
+        game.player1_peeked = player1_peeked
+        game.player2_peeked = player2_peeked
+        game.player1_seen_by_opponent = player1_seen_by_opponent
+        game.player2_seen_by_opponent = player2_seen_by_opponent
+        game.current_player = current_player
+        game.game_started = bool(flags & _GAME_STARTED)
+        game.game_ended = bool(flags & _GAME_ENDED)
+        game.reveal_all = bool(flags & _REVEAL_ALL)
+        game.drawn_card = None if drawn_card == _NO_CARD else drawn_card
+        game.drawn_by = drawn_by or None
+        game.winner = _WINNERS[winner]
+        game.version = version
+        return game
+
+
+def _list(values):
+    return list(values) if values is not None else None
+
+
+def _copy(values):
+    return values[:] if values is not None else None
+
+
+def join_game(game):
+    if game.player2_cards is not None:
+        return False
+    game.player2_cards = array('B', game.deck.draw(4))
+    game.player2_peeked = bytearray(4)
+    game.player2_seen_by_opponent = bytearray(4)
+    return True
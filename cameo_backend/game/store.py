@@ -0,0 +1,385 @@
+"""
+Shared game storage.
+
+Games used to live in a module-level dict, which tied every game to the
+process that created it. A store keeps serialized ``GameState`` objects keyed
+by game code and only accepts a write when the caller saw the latest version
+(compare-and-set), so several daphne workers can serve the same game.
+
+``GAME_STORE_BACKEND`` selects the implementation:
+
+* ``memory`` - in-process store, for local development and tests.
+* ``redis``  - Redis hash per game at ``REDIS_URL``, with a small local
+  read-through cache in front of it.
+"""
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .codes import get_allocator
+from .state import GameState
+
+logger = logging.getLogger(__name__)
+
+# How many times callers re-read and re-apply a change after losing a
+# compare-and-set race before giving up.
+CAS_RETRIES = 5
+
+PHASES = ('lobby', 'peeking', 'started', 'ended')
+
+
+def encode_state(game):
+    # About 80 bytes against about 390 as JSON, and several times quicker
+    # both ways, which every action pays for.
+    return game.to_bytes()
+
+
+class GameStore:
+    """
+    Base class for game stores.
+
+    ``get`` returns a private copy of the game, so callers may mutate it
+    freely and then hand it back to ``save``. ``save`` only succeeds when
+    ``game.version`` still matches the stored version, and bumps the version
+    on success.
+    """
+
+    def __init__(self, state_class, ttls=None):
+        self.state_class = state_class
+        # Seconds a game may sit untouched in each phase before it is evicted.
+        self.ttls = ttls or {}
+        # Evicted games by reason: the phase they expired in, or 'lru'.
+        self.evictions = Counter()
+        # Called with the code of every game this store drops, so its code
+        # can be reused.
+        self.on_remove = None
+
+    def ttl_for(self, game):
+        return self.ttls.get(game.phase)
+
+    def _removed(self, codes):
+        if self.on_remove is not None:
+            for code in codes:
+                self.on_remove(code)
+
+    def decode(self, payload, version):
+        game = self.state_class.from_bytes(payload)
+        game.version = version
+        return game
+
+    def get(self, code):
+        raise NotImplementedError
+
+    def create(self, game):
+        """Store a new game; returns False if the code is already taken."""
+        raise NotImplementedError
+
+    def save(self, game):
+        raise NotImplementedError
+
+    def delete(self, code):
+        raise NotImplementedError
+
+    def count_by_phase(self):
+        """Number of stored games in each phase."""
+        raise NotImplementedError
+
+    def update(self, code, mutate):
+        """
+        Re-read and re-apply ``mutate(game)`` until the write wins the
+        compare-and-set. ``mutate`` returns a result for the caller; the game
+        is saved unless the result is False. Returns ``(game, result)``, or
+        ``(None, None)`` if the game does not exist.
+        """
+        for _ in range(CAS_RETRIES):
+            game = self.get(code)
+            if game is None:
+                return None, None
+            result = mutate(game)
+            if result is False or self.save(game):
+                return game, result
+        raise StoreConflict(code)
+
+    async def aget(self, code):
+        return await sync_to_async(self.get, thread_sensitive=False)(code)
+
+    async def asave(self, game):
+        return await sync_to_async(self.save, thread_sensitive=False)(game)
+
+
+class StoreConflict(Exception):
+    def __init__(self, code):
+        super().__init__(f"Too many concurrent updates to game {code}")
+        self.code = code
+
+
+class InMemoryGameStore(GameStore):
+    """
+    Single-process store. Games are kept serialized, exactly like in Redis,
+    so code that forgets to ``save`` behaves the same in tests and in
+    production.
+
+    Entries expire ``ttls[phase]`` seconds after their last write and are
+    removed by a background sweeper thread; beyond ``max_games`` the least
+    recently used game is evicted straight away.
+    """
+
+    def __init__(self, state_class, ttls=None, max_games=None):
+        super().__init__(state_class, ttls)
+        self.max_games = max_games
+        # code -> (version, payload, phase, expires_at); oldest access first
+        self._games = OrderedDict()
+        self._lock = threading.Lock()
+        self._sweeper = None
+
+    def get(self, code):
+        with self._lock:
+            entry = self._games.get(code)
+            if entry is None:
+                return None
+            self._games.move_to_end(code)
+        return self.decode(entry[1], entry[0])
+
+    def _put(self, game):
+        ttl = self.ttl_for(game)
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._games[game.code] = (game.version, encode_state(game), game.phase, expires_at)
+        self._games.move_to_end(game.code)
+
+    def create(self, game):
+        with self._lock:
+            if game.code in self._games:
+                return False
+            game.version = 1
+            self._put(game)
+            evicted = []
+            while self.max_games and len(self._games) > self.max_games:
+                code, _ = self._games.popitem(last=False)
+                evicted.append(code)
+                self.evictions['lru'] += 1
+                logger.info("Evicted game %s: over the %d resident game cap", code, self.max_games)
+        self._removed(evicted)
+        return True
+
+    def save(self, game):
+        with self._lock:
+            entry = self._games.get(game.code)
+            if entry is None or entry[0] != game.version:
+                return False
+            game.version += 1
+            self._put(game)
+            return True
+
+    def delete(self, code):
+        with self._lock:
+            removed = self._games.pop(code, None) is not None
+        if removed:
+            self._removed([code])
+
+    def versions(self):
+        """``{code: version}`` of every stored game."""
+        with self._lock:
+            return {code: entry[0] for code, entry in self._games.items()}
+
+    def restore(self, game):
+        """Put back a game from a snapshot, keeping its version."""
+        with self._lock:
+            self._put(game)
+
+    def count_by_phase(self):
+        with self._lock:
+            counts = Counter(entry[2] for entry in self._games.values())
+        return {phase: counts[phase] for phase in PHASES}
+
+    def sweep(self):
+        """Drop every expired game; returns how many were evicted."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [(code, entry[2]) for code, entry in self._games.items()
+                       if entry[3] is not None and entry[3] <= now]
+            for code, phase in expired:
+                del self._games[code]
+                self.evictions[phase] += 1
+        self._removed(code for code, _ in expired)
+        if expired:
+            logger.info("Evicted %d expired game(s), %d resident", len(expired), len(self._games))
+        return len(expired)
+
+    def start_sweeper(self, interval):
+        if self._sweeper is None:
+            self._sweeper = threading.Thread(target=self._sweep_forever, args=(interval,),
+                                             name='game-store-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def _sweep_forever(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Game store sweep failed")
+
+    # Nothing here blocks, so skip the thread hop.
+    async def aget(self, code):
+        return self.get(code)
+
+    async def asave(self, game):
+        return self.save(game)
+
+
+# KEYS[1] = game key; ARGV = expected version, new version, payload, ttl, phase.
+# A missing key reads as version 0, which is what ``create`` expects.
+_CAS_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'v')
+if (current or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'v', ARGV[2], 'b', ARGV[3], 'p', ARGV[5])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
+
+
+class RedisGameStore(GameStore):
+    """
+    Games stored as ``{v: version, b: GameState.to_bytes(), p: phase}`` hashes. Reads go through a
+    small LRU cache that is trusted for ``cache_ttl`` seconds; a stale read is
+    harmless because the following ``save`` fails the compare-and-set and the
+    caller re-reads.
+
+    Idle games are left to Redis key expiry: every write resets the key's
+    TTL to the one for the game's phase, so no sweeper is needed and Redis's
+    own eviction policy is the memory cap.
+    """
+
+    def __init__(self, state_class, url, prefix='cameo:game:', ttls=None,
+                 default_ttl=86400, cache_size=1024, cache_ttl=0.5):
+        super().__init__(state_class, ttls)
+        import redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._cas = self.redis.register_script(_CAS_SCRIPT)
+
+    def _key(self, code):
+        return f'{self.prefix}{code}'
+
+    def _remember(self, code, version, payload):
+        with self._lock:
+            self._cache[code] = (time.monotonic(), version, payload)
+            self._cache.move_to_end(code)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _forget(self, code):
+        with self._lock:
+            self._cache.pop(code, None)
+
+    def get(self, code):
+        with self._lock:
+            entry = self._cache.get(code)
+        if entry is not None and time.monotonic() - entry[0] < self.cache_ttl:
+            return self.decode(entry[2], entry[1])
+
+        version, payload = self.redis.hmget(self._key(code), 'v', 'b')
+        if payload is None:
+            self._forget(code)
+            return None
+        version = int(version)
+        self._remember(code, version, payload)
+        return self.decode(payload, version)
+
+    def _write(self, game, expected):
+        payload = encode_state(game)
+        ok = self._cas(keys=[self._key(game.code)],
+                       args=[expected, expected + 1, payload, self.ttl_for(game) or self.default_ttl, game.phase])
+        if not ok:
+            self._forget(game.code)
+            return False
+        game.version = expected + 1
+        self._remember(game.code, game.version, payload)
+        return True
+
+    def create(self, game):
+        return self._write(game, 0)
+
+    def save(self, game):
+        return self._write(game, game.version)
+
+    def delete(self, code):
+        self.redis.delete(self._key(code))
+        self._forget(code)
+        self._removed([code])
+
+    def count_by_phase(self):
+        # Walks every game key; fine at scrape intervals, not per request.
+        counts = Counter()
+        keys = list(self.redis.scan_iter(match=f'{self.prefix}*', count=1000))
+        for start in range(0, len(keys), 1000):
+            pipe = self.redis.pipeline(transaction=False)
+            for key in keys[start:start + 1000]:
+                pipe.hget(key, 'p')
+            counts.update(phase.decode() for phase in pipe.execute() if phase)
+        return {phase: counts[phase] for phase in PHASES}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the process-wide store configured by ``GAME_STORE_BACKEND``."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = _build_store()
+    return _store
+
+
+def _build_store():
+    store = _build_backend()
+    allocator = get_allocator()
+    store.on_remove = allocator.release
+    path = getattr(settings, 'GAME_SNAPSHOT_PATH', '')
+    if path and isinstance(store, InMemoryGameStore):
+        from .snapshots import Snapshotter
+
+        snapshotter = Snapshotter(store, path)
+        snapshotter.restore(allocator.reserve)
+        snapshotter.start(getattr(settings, 'GAME_SNAPSHOT_INTERVAL', 5))
+    return store
+
+
+def _build_backend():
+    backend = getattr(settings, 'GAME_STORE_BACKEND', 'memory')
+    idle_ttl = getattr(settings, 'GAME_TTL_IDLE', 3600)
+    ttls = {
+        'lobby': getattr(settings, 'GAME_TTL_LOBBY', 600),
+        'peeking': idle_ttl,
+        'started': idle_ttl,
+        'ended': getattr(settings, 'GAME_TTL_ENDED', 120),
+    }
+    if backend == 'redis':
+        logger.info("Using Redis game store at %s", settings.REDIS_URL)
+        return RedisGameStore(
+            GameState,
+            settings.REDIS_URL,
+            ttls=ttls,
+            cache_size=getattr(settings, 'GAME_STORE_CACHE_SIZE', 1024),
+            cache_ttl=getattr(settings, 'GAME_STORE_CACHE_TTL', 0.5),
+        )
+    if backend != 'memory':
+        raise ValueError(f"Unknown GAME_STORE_BACKEND: {backend!r}")
+    store = InMemoryGameStore(GameState, ttls=ttls, max_games=getattr(settings, 'GAME_MAX_RESIDENT', 10000))
+    store.start_sweeper(getattr(settings, 'GAME_SWEEP_INTERVAL', 30))
+    return store
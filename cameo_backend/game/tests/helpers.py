@@ -0,0 +1,147 @@
+"""Games to test with, versioned the way the store would, and a live-game test case."""
+import json
+import tempfile
+
+from channels.layers import channel_layers
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import SimpleTestCase, override_settings
+
+from .. import action_log, actors, codes, history, projections, store
+from ..engine import apply
+from ..frames import MSGPACK_SUBPROTOCOL, decode_binary_frame
+from ..routing import websocket_urlpatterns
+from ..state import GameState, join_game
+from ..tokens import seat_token
+
+
+def new_game(code='123456'):
+    game = GameState(code)
+    game.version = 1
+    return game
+
+
+def act(game, player, action, **data):
+    """``engine.apply`` plus the version bump the store would make."""
+    new, events = apply(game, dict(data, action=action, player=player))
+    new.version = game.version + 1
+    return new, events
+
+
+def started_game(code='123456'):
+    """A joined game in which both players have peeked their bottom cards."""
+    game = new_game(code)
+    join_game(game)
+    for player in (1, 2):
+        for position in (2, 3):
+            game, _ = act(game, player, 'peek_own', position=position)
+    return game
+
+
+class Socket:
+    """A ``WebsocketCommunicator`` that decodes what it receives, batches included."""
+
+    def __init__(self, path, binary=False):
+        self.communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns), path, subprotocols=[MSGPACK_SUBPROTOCOL] if binary else None)
+        self.binary = binary
+        self.pending = []
+
+    async def connect(self):
+        connected, _ = await self.communicator.connect()
+        return connected
+
+    async def send(self, message):
+        await self.communicator.send_json_to(message)
+
+    async def receive(self, timeout=2):
+        if not self.pending:
+            output = await self.communicator.receive_output(timeout)
+            if output['type'] == 'websocket.close':
+                raise ConnectionError(output.get('code'))
+            if output.get('bytes') is not None:
+                message = decode_binary_frame(output['bytes'])
+            else:
+                message = json.loads(output['text'])
+            self.pending = message['frames'] if message.get('type') == 'batch' else [message]
+        return self.pending.pop(0)
+
+    async def until(self, test, timeout=2):
+        """The first message passing ``test``, skipping the ones before it."""
+        while True:
+            message = await self.receive(timeout)
+            if test(message):
+                return message
+
+    async def nothing(self):
+        return not self.pending and await self.communicator.receive_nothing(0.05)
+
+    async def close(self):
+        await self.communicator.disconnect()
+
+
+class LiveGameTestCase(SimpleTestCase):
+    """
+    Plays games through the real consumers, actors, store and action log, on
+    the in-memory channel layer, with the log in a temporary directory.
+    Every test should use games of its own: actors outlive a test's event
+    loop.
+    """
+    live_settings = {}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._log_dir = tempfile.TemporaryDirectory()
+        cls._settings = override_settings(
+            CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+            GAME_STORE_BACKEND='memory',
+            GAME_SNAPSHOT_PATH='',
+            GAME_ACTION_LOG_DIR=cls._log_dir.name,
+            GAME_ACTION_RATE=0,
+            GAME_BROADCAST_WINDOW=0,
+            **cls.live_settings,
+        )
+        cls._settings.enable()
+        cls._reset()
+
+    @classmethod
+    def tearDownClass(cls):
+        action_log.get_action_log().flush()
+        cls._reset()
+        cls._settings.disable()
+        cls._log_dir.cleanup()
+        super().tearDownClass()
+
+    @classmethod
+    def _reset(cls):
+        channel_layers.backends.clear()
+        actors._actors.clear()
+        history._rings.clear()
+        projections._projections.clear()
+        store._store = None
+        codes._allocator = None
+        action_log._log = None
+
+    def create_game(self, joined=True):
+        from ..views import create_game, seat_player2
+
+        code = create_game().code
+        if joined:
+            seat_player2(code)
+        return code
+
+    def seat_path(self, code, player):
+        return f'/ws/game/{code}/?player={player}&token={seat_token(code, player)}'
+
+    async def seats(self, code, query='', binary=False):
+        """Sockets for both players of ``code``, past their first snapshot."""
+        sockets = {}
+        for player in (1, 2):
+            socket = sockets[player] = Socket(self.seat_path(code, player) + query, binary)
+            self.assertTrue(await socket.connect())
+            await socket.until(lambda message: message.get('type') == 'game_state')
+        return sockets
+
+    async def play(self, socket, player, action, **data):
+        await socket.send(dict(data, action=action, player=player))
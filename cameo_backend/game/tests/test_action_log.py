@@ -0,0 +1,70 @@
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..action_log import JOIN, ActionLog, FileLogSink
+from ..state import join_game
+from .helpers import act, new_game
+
+
+class ReplayTests(SimpleTestCase):
+    def test_replay_rebuilds_every_version(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log = ActionLog(FileLogSink(directory, retention=3600))
+            game = new_game()
+            log.record_start(game)
+            versions = {1: game.to_dict()}
+
+            join_game(game)
+            game.version = 2
+            log.record(game.code, 2, [JOIN])
+            versions[2] = game.to_dict()
+            moves = [(1, 'peek_own', {'position': 2}), (1, 'peek_own', {'position': 3}),
+                     (2, 'peek_own', {'position': 2}), (2, 'peek_own', {'position': 3}),
+                     (1, 'draw', {}), (1, 'swap', {'pos': 0}), (1, 'discard', {}),
+                     (2, 'peek_opponent', {'position': 1}), (1, 'draw', {}),
+                     (1, 'replace', {'position': 3}), (2, 'end_game', {})]
+            for player, action, data in moves:
+                game, _ = act(game, player, action, **data)
+                log.record(game.code, game.version, [dict(data, action=action, player=player)])
+                versions[game.version] = game.to_dict()
+
+            self.assertEqual(log.replay(game.code).to_dict(), game.to_dict())
+            for version, state in versions.items():
+                with self.subTest(version=version):
+                    replayed = log.replay(game.code, version)
+                    self.assertEqual(replayed.version, version)
+                    self.assertEqual(replayed.to_dict(), state)
+
+    def test_a_reused_code_starts_a_fresh_log(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log = ActionLog(FileLogSink(directory, retention=3600))
+            old = new_game()
+            log.record_start(old)
+            log.record(old.code, 2, [JOIN])
+            log.flush()
+            new = new_game()
+            log.record_start(new)
+            replayed = log.replay(new.code)
+            self.assertEqual(replayed.to_dict(), new.to_dict())
+            self.assertIsNone(replayed.player2_cards)
+
+    def test_no_log(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertIsNone(ActionLog(FileLogSink(directory, retention=3600)).replay('123456'))
+
+    def test_rejected_actions_are_skipped_and_failures_raised(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log = ActionLog(FileLogSink(directory, retention=3600))
+            game = new_game()
+            log.record_start(game)
+            log.record(game.code, 2, [JOIN, {'action': 'draw', 'player': 1}])
+            replayed = log.replay(game.code)
+            self.assertEqual(replayed.version, 2)
+            self.assertFalse(replayed.game_started)
+
+            log.record(game.code, 3, [{'action': 'peek_own', 'player': 1, 'position': 2}])
+            with mock.patch('game.action_log.apply', side_effect=KeyError('player')), \
+                    self.assertLogs('game.action_log', 'ERROR'), self.assertRaises(KeyError):
+                log.replay(game.code)
@@ -0,0 +1,135 @@
+import asyncio
+from unittest import mock
+
+from .. import actors, frames
+from ..store import get_store
+from .helpers import LiveGameTestCase, Socket
+
+
+def is_state(message):
+    return message.get('type') == 'game_state'
+
+
+class ActorTests(LiveGameTestCase):
+    live_settings = {'GAME_ACTOR_IDLE_TIMEOUT': 0.05}
+
+    async def test_actions_from_both_seats_are_applied_in_turn(self):
+        code = self.create_game()
+        sockets = await self.seats(code)
+        base = get_store().get(code).version
+        for position in (2, 3):
+            for player in (1, 2):
+                await self.play(sockets[player], player, 'peek_own', position=position)
+        for socket in sockets.values():
+            state = await socket.until(lambda message: 'error' in message or message.get('game_started'))
+            self.assertEqual(state['player1_peeked'], [False, False, True, True])
+            self.assertEqual(state['player2_peeked'], [False, False, True, True])
+            await socket.close()
+        self.assertLessEqual(get_store().get(code).version, base + 4)
+
+    async def test_actions_queued_together_share_one_save_and_broadcast(self):
+        code = self.create_game()
+        sockets = await self.seats(code)
+        base = get_store().get(code).version
+        replies = []
+
+        async def reply(message):
+            replies.append(message)
+
+        actor = actors.get_actor(code)
+        for player in (1, 2):
+            for position in (2, 3):
+                self.assertTrue(actor.submit({'action': 'peek_own', 'player': player, 'position': position}, reply))
+        state = await sockets[1].until(is_state)
+        self.assertEqual(state['version'], base + 1)
+        self.assertTrue(state['game_started'])
+        self.assertEqual(replies, [])
+        for socket in sockets.values():
+            await socket.close()
+
+    async def test_errors_go_to_the_sender_only(self):
+        code = self.create_game()
+        sockets = await self.seats(code)
+        await self.play(sockets[2], 2, 'peek_own', position=0)
+        self.assertEqual(await sockets[2].receive(), {'error': 'bad_position'})
+        self.assertTrue(await sockets[1].nothing())
+        for socket in sockets.values():
+            await socket.close()
+
+    async def test_idle_actors_retire(self):
+        code = self.create_game()
+        sockets = await self.seats(code)
+        await self.play(sockets[1], 1, 'peek_own', position=2)
+        await sockets[1].until(is_state)
+        self.assertIn(code, actors._actors)
+        await asyncio.sleep(0.1)
+        self.assertNotIn(code, actors._actors)
+        for socket in sockets.values():
+            await socket.close()
+
+
+class BroadcastEncodingTests(LiveGameTestCase):
+    def encoders(self):
+        return (mock.patch.object(frames, 'encode_frame', wraps=frames.encode_frame),
+                mock.patch.object(frames, 'encode_binary_frame', wraps=frames.encode_binary_frame))
+
+    async def test_only_subscribed_formats_are_encoded(self):
+        code = self.create_game()
+        sockets = await self.seats(code)
+        text, binary = self.encoders()
+        with text as encode_text, binary as encode_binary:
+            await self.play(sockets[1], 1, 'peek_own', position=2)
+            for socket in sockets.values():
+                await socket.until(is_state)
+        # One JSON state per seat: no msgpack, and no patches without ?deltas=1.
+        self.assertEqual(encode_text.call_count, 2)
+        self.assertEqual(encode_binary.call_count, 0)
+        for socket in sockets.values():
+            await socket.close()
+
+    async def test_each_seat_is_encoded_once_however_many_sockets(self):
+        code = self.create_game()
+        sockets = await self.seats(code)
+        extra = Socket(self.seat_path(code, 1))
+        watchers = [Socket(f'/ws/game/{code}/watch/') for _ in range(3)]
+        for socket in [extra, *watchers]:
+            self.assertTrue(await socket.connect())
+            await socket.until(is_state)
+        text, binary = self.encoders()
+        with text as encode_text, binary as encode_binary:
+            await self.play(sockets[1], 1, 'peek_own', position=2)
+            for socket in [*sockets.values(), extra, *watchers]:
+                await socket.until(is_state)
+        self.assertEqual(encode_text.call_count, 3)  # player 1, player 2, spectators
+        self.assertEqual(encode_binary.call_count, 0)
+        for socket in [*sockets.values(), extra, *watchers]:
+            await socket.close()
+
+    async def test_patches_and_msgpack_are_encoded_for_the_sockets_that_asked(self):
+        code = self.create_game()
+        sockets = await self.seats(code, query='&deltas=1', binary=True)
+        await self.play(sockets[1], 1, 'peek_own', position=2)  # Gives the actor a base for patches
+        for socket in sockets.values():
+            await socket.until(is_state)
+        text, binary = self.encoders()
+        with text as encode_text, binary as encode_binary:
+            await self.play(sockets[1], 1, 'peek_own', position=3)
+            for socket in sockets.values():
+                message = await socket.until(lambda message: message.get('type') == 'game_patch')
+                self.assertEqual(message['base_version'], message['version'] - 1)
+        self.assertEqual(encode_text.call_count, 0)
+        self.assertEqual(encode_binary.call_count, 2)  # One patch per seat
+        for socket in sockets.values():
+            await socket.close()
+
+
+class MissingGameTests(LiveGameTestCase):
+    async def test_actions_for_a_vanished_game_are_answered_with_no_game(self):
+        code = self.create_game()
+        sockets = await self.seats(code)
+        get_store().delete(code)
+        await self.play(sockets[1], 1, 'peek_own', position=2)
+        self.assertEqual(await sockets[1].receive(), {'type': 'error', 'code': 'no_game'})
+        self.assertTrue(await sockets[2].nothing())
+        for socket in sockets.values():
+            await socket.close()
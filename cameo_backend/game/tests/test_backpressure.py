@@ -0,0 +1,98 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from .. import metrics
+from ..backpressure import Outbox, TokenBucket
+from ..consumers import GameConsumer
+from .helpers import LiveGameTestCase
+
+
+class OutboxTests(SimpleTestCase):
+    def test_a_full_outbox_refuses_frames(self):
+        outbox = Outbox(2)
+        self.assertTrue(outbox.put('a'))
+        self.assertTrue(outbox.put('b', state=True))
+        self.assertTrue(outbox.full())
+        self.assertFalse(outbox.put('c'))
+
+    def test_dropping_states_keeps_the_other_frames_in_order(self):
+        outbox = Outbox(5)
+        for payload, state in (('s1', True), ('u1', False), ('s2', True), ('u2', False)):
+            outbox.put(payload, state)
+        self.assertEqual(outbox.drop_states(), 2)
+        self.assertEqual(outbox.take_all(), ['u1', 'u2'])
+
+    async def test_get_waits_for_a_frame(self):
+        outbox = Outbox(2)
+        waiting = asyncio.ensure_future(outbox.get())
+        await asyncio.sleep(0)
+        self.assertFalse(waiting.done())
+        outbox.put('a')
+        self.assertEqual(await asyncio.wait_for(waiting, 1), 'a')
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_bursts_then_the_rate(self):
+        with mock.patch('game.backpressure.time.monotonic', return_value=100.0) as now:
+            bucket = TokenBucket(rate=2, burst=3)
+            self.assertEqual([bucket.take() for _ in range(4)], [True, True, True, False])
+            now.return_value = 100.5  # One more token at 2 a second
+            self.assertEqual([bucket.take(), bucket.take()], [True, False])
+            now.return_value = 200.0  # Never more than the burst
+            self.assertEqual(sum(bucket.take() for _ in range(5)), 3)
+
+
+class SlowConsumerTests(LiveGameTestCase):
+    live_settings = {'GAME_SOCKET_QUEUE_SIZE': 2}
+
+    def stall_player2(self):
+        """Hold up every write to player 2's sockets until the returned event is set."""
+        gate = asyncio.Event()
+        send = GameConsumer.send
+
+        async def stalled(consumer, *args, **kwargs):
+            if consumer.seat == 'player2':
+                await gate.wait()
+            await send(consumer, *args, **kwargs)
+
+        patcher = mock.patch.object(GameConsumer, 'send', stalled)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return gate
+
+    def coalesced(self):
+        return metrics.frames_coalesced._values.get((), 0)
+
+    async def test_a_slow_client_skips_to_the_newest_state(self):
+        code = self.create_game()
+        sockets = await self.seats(code)
+        gate = self.stall_player2()
+        coalesced = self.coalesced()
+        for player, position in ((1, 2), (1, 3), (2, 2), (2, 3)):
+            await self.play(sockets[player], player, 'peek_own', position=position)
+            await sockets[1].until(lambda message: message.get('type') == 'game_state')
+        gate.set()
+        versions = []
+        while not await sockets[2].nothing():
+            versions.append((await sockets[2].receive())['version'])
+        latest = versions[-1]
+        # The first state was already being written; of the three behind it
+        # only the newest is left.
+        self.assertEqual(versions, [latest - 3, latest])
+        self.assertEqual(self.coalesced(), coalesced + 2)
+        for socket in sockets.values():
+            await socket.close()
+
+    async def test_a_client_that_cannot_catch_up_is_disconnected(self):
+        code = self.create_game()
+        sockets = await self.seats(code)
+        gate = self.stall_player2()
+        for _ in range(4):
+            # Errors can't be dropped like states.
+            await self.play(sockets[2], 2, 'peek_own', position=0)
+        output = await sockets[2].communicator.receive_output(1)
+        self.assertEqual(output, {'type': 'websocket.close', 'code': 1013})
+        gate.set()
+        await sockets[1].close()
@@ -0,0 +1,69 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from .. import bots
+from .helpers import LiveGameTestCase, act, started_game
+
+
+def bot(player=2):
+    return bots.Bot('123456', player, think_time=0, idle_timeout=60)
+
+
+class BotMoveTests(SimpleTestCase):
+    async def moves(self, bot, game, move='discard'):
+        with mock.patch.object(bots.Bot, '_think', mock.AsyncMock(return_value=move)) as think:
+            return await bot._moves(game), think
+
+    async def test_peeks_its_bottom_cards_first(self):
+        game = started_game()
+        game.game_started = False
+        game.player2_peeked[3] = False
+        moves, think = await self.moves(bot(), game)
+        self.assertEqual(moves, [{'action': 'peek_own', 'player': 2, 'position': 3}])
+        think.assert_not_called()
+
+    async def test_waits_for_its_turn(self):
+        moves, think = await self.moves(bot(), started_game())
+        self.assertEqual(moves, [])
+        think.assert_not_called()
+
+    async def test_thinks_with_only_what_its_seat_can_see(self):
+        game, _ = act(started_game(), 1, 'swap', pos1=0, pos2=3)
+        game, _ = act(game, 1, 'draw')
+        game, _ = act(game, 1, 'discard')
+        game, _ = act(game, 2, 'draw')
+        moves, think = await self.moves(bot(), game, move=1)
+        # Its card at 3 went to player 1 and the one it got is unseen.
+        hand = [None, None, game.player2_cards[2], None]
+        think.assert_awaited_once_with(hand, game.drawn_card, len(game.deck.cards))
+        self.assertEqual(moves, [{'action': 'swap', 'player': 2, 'pos': 1},
+                                 {'action': 'discard', 'player': 2}])
+
+    async def test_ends_or_draws_as_chosen(self):
+        game, _ = act(started_game(), 1, 'peek_opponent', position=0)
+        for move, action in (('end', 'end_game'), ('draw', 'draw')):
+            moves, _ = await self.moves(bot(), game, move=move)
+            self.assertEqual(moves, [{'action': action, 'player': 2}])
+
+
+class BotGameTests(LiveGameTestCase):
+    async def test_a_bot_plays_through_the_actor_until_the_game_ends(self):
+        code = self.create_game()
+        sockets = await self.seats(code)
+        await sockets[2].close()
+        with mock.patch.object(bots.Bot, '_think', mock.AsyncMock(return_value='end')):
+            await bots._spawn(code, 2)
+            task = bots._bots[code].task
+            for position in (2, 3):
+                await self.play(sockets[1], 1, 'peek_own', position=position)
+            await sockets[1].until(lambda message: message.get('game_started'))
+            await self.play(sockets[1], 1, 'draw')
+            await sockets[1].until(lambda message: message.get('drawn_by') == 1)
+            await self.play(sockets[1], 1, 'discard')
+            end = await sockets[1].until(lambda message: message.get('type') == 'game_end')
+            await asyncio.wait_for(task, 2)
+        self.assertIn(end['winner'], ('Player 1', 'Player 2', 'Tie'))
+        self.assertNotIn(code, bots._bots)
+        await sockets[1].close()
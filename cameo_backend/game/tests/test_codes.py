@@ -0,0 +1,88 @@
+import uuid
+from unittest import skipUnless
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from ..codes import FIRST_CODE, SIZE, CodeSpaceExhausted, InMemoryCodeAllocator, RedisCodeAllocator
+
+REDIS_URL = settings.REDIS_URL or 'redis://localhost:6379'
+
+
+def _redis_available():
+    import redis
+
+    try:
+        return redis.Redis.from_url(REDIS_URL, socket_connect_timeout=0.2).ping()
+    except redis.RedisError:
+        return False
+
+
+class InMemoryCodeAllocatorTests(SimpleTestCase):
+    def test_codes_are_six_digits_and_unique(self):
+        allocator = InMemoryCodeAllocator()
+        codes = [allocator.allocate() for _ in range(2000)]
+        self.assertEqual(len(set(codes)), len(codes))
+        self.assertTrue(all(len(code) == 6 and FIRST_CODE <= int(code) < FIRST_CODE + SIZE for code in codes))
+        self.assertEqual(allocator.allocated(), len(codes))
+
+    def test_codes_do_not_repeat_across_processes(self):
+        # Two fresh allocators stand in for two workers or restarts; with
+        # random draws their sequences share no pattern.
+        first, second = InMemoryCodeAllocator(), InMemoryCodeAllocator()
+        self.assertNotEqual([first.allocate() for _ in range(5)], [second.allocate() for _ in range(5)])
+
+    def test_release_and_reserve(self):
+        allocator = InMemoryCodeAllocator()
+        code = allocator.allocate()
+        allocator.release(code)
+        allocator.release(code)
+        allocator.release('not a code')
+        self.assertEqual(allocator.allocated(), 0)
+        allocator.reserve(code)
+        allocator.reserve(code)
+        self.assertEqual(allocator.allocated(), 1)
+
+    def test_a_nearly_full_space_is_scanned_and_a_full_one_refused(self):
+        allocator = InMemoryCodeAllocator(max_probes=1)
+        allocator._taken[:] = b'\x01' * SIZE
+        allocator._taken[123] = 0
+        self.assertEqual(allocator.allocate(), str(FIRST_CODE + 123))
+        with self.assertRaises(CodeSpaceExhausted):
+            allocator.allocate()
+
+
+@skipUnless(_redis_available(), f"Nothing answering at {REDIS_URL}")
+class RedisCodeAllocatorTests(SimpleTestCase):
+    def setUp(self):
+        prefix = f'test:{uuid.uuid4().hex}:'
+        self.allocator = RedisCodeAllocator(REDIS_URL, prefix=prefix + 'codes:', game_prefix=prefix + 'game:')
+        self.game_prefix = prefix + 'game:'
+        self.addCleanup(lambda: self.allocator.redis.delete(*self.allocator.keys))
+
+    def test_codes_are_unique_and_counted(self):
+        codes = []
+        for _ in range(200):
+            codes.append(self.allocator.allocate())
+            # As the store would; taken codes without a game get reclaimed.
+            self.allocator.redis.set(f'{self.game_prefix}{codes[-1]}', 1, ex=60)
+        self.assertEqual(len(set(codes)), len(codes))
+        self.assertEqual(self.allocator.allocated(), len(codes))
+        self.allocator.release(codes[0])
+        self.assertEqual(self.allocator.allocated(), len(codes) - 1)
+
+    def test_codes_of_expired_games_are_reclaimed(self):
+        self.allocator.max_probes = 1
+        bitmap = self.allocator.keys[0]
+        # Every code taken, and only one of them with a live game.
+        self.allocator.redis.setrange(bitmap, 0, b'\xff' * (SIZE // 8))
+        self.allocator.redis.set(f'{self.game_prefix}{FIRST_CODE + 7}', 1)
+        self.addCleanup(self.allocator.redis.delete, f'{self.game_prefix}{FIRST_CODE + 7}')
+        codes = {self.allocator.allocate() for _ in range(20)}
+        self.assertNotIn(str(FIRST_CODE + 7), codes)
+
+    def test_a_full_space_is_refused(self):
+        self.allocator.max_probes = 0
+        self.allocator.redis.setrange(self.allocator.keys[0], 0, b'\xff' * (SIZE // 8))
+        with self.assertRaises(CodeSpaceExhausted):
+            self.allocator.allocate()
@@ -0,0 +1,42 @@
+from rest_framework.test import APIRequestFactory
+
+from ..tokens import seat_token
+from ..views import ConnectGame, StartGame
+from .helpers import LiveGameTestCase, Socket
+
+
+class SeatTokenTests(LiveGameTestCase):
+    async def connects(self, path):
+        socket = Socket(path)
+        connected = await socket.connect()
+        await socket.close()
+        return connected
+
+    async def test_seats_need_their_own_token(self):
+        code = self.create_game()
+        self.assertFalse(await self.connects(f'/ws/game/{code}/?player=1'))
+        self.assertFalse(await self.connects(f'/ws/game/{code}/?player=1&token=guess'))
+        self.assertFalse(await self.connects(f'/ws/game/{code}/?player=1&token={seat_token(code, 2)}'))
+        self.assertFalse(await self.connects(f'/ws/game/{code}/?player=1&token={seat_token("999999", 1)}'))
+        self.assertTrue(await self.connects(self.seat_path(code, 1)))
+
+    async def test_a_code_alone_gets_the_spectator_view(self):
+        code = self.create_game()
+        sockets = await self.seats(code)
+        await self.play(sockets[1], 1, 'peek_own', position=2)
+        watcher = Socket(f'/ws/game/{code}/')
+        self.assertTrue(await watcher.connect())
+        state = await watcher.until(lambda message: message.get('type') == 'game_state')
+        self.assertEqual(state['player1_cards'], [None] * 4)
+        await watcher.send({'action': 'peek_own', 'player': 1, 'position': 3})
+        self.assertEqual(await watcher.until(lambda message: 'error' in message), {'error': 'not_your_seat'})
+        for socket in [watcher, *sockets.values()]:
+            await socket.close()
+
+    def test_game_views_hand_out_seat_tokens(self):
+        factory = APIRequestFactory()
+        started = StartGame.as_view()(factory.post('/api/start/', {}, format='json')).data
+        code = started['code']
+        joined = ConnectGame.as_view()(factory.post('/api/connect/', {'code': code}, format='json')).data
+        self.assertEqual(started, {'code': code, 'player': 1, 'token': seat_token(code, 1)})
+        self.assertEqual(joined, {'code': code, 'player': 2, 'token': seat_token(code, 2)})
@@ -0,0 +1,50 @@
+from django.test import SimpleTestCase
+
+from ..engine import ActionError, apply
+from ..state import join_game
+from .helpers import act, new_game, started_game
+
+
+class EngineRejectionTests(SimpleTestCase):
+    def assertRejected(self, code, game, player, action, **data):
+        with self.assertRaises(ActionError) as raised:
+            apply(game, dict(data, action=action, player=player))
+        self.assertEqual(raised.exception.code, code)
+
+    def test_malformed_actions(self):
+        game = started_game()
+        self.assertRejected('unknown_action', game, 1, 'fly')
+        self.assertRejected('bad_player', game, 3, 'draw')
+        self.assertRejected('bad_player', game, True, 'draw')
+        self.assertRejected('bad_position', game, 1, 'peek_opponent', position=4)
+        self.assertRejected('bad_position', game, 1, 'peek_opponent')
+
+    def test_before_the_game_starts(self):
+        game = new_game()
+        self.assertRejected('not_joined', game, 2, 'peek_own', position=2)
+        join_game(game)
+        self.assertRejected('not_started', game, 1, 'draw')
+        self.assertRejected('bad_position', game, 1, 'peek_own', position=0)
+        game, _ = act(game, 1, 'peek_own', position=2)
+        self.assertRejected('already_peeked', game, 1, 'peek_own', position=2)
+
+    def test_turns_and_drawn_cards(self):
+        game = started_game()
+        self.assertEqual(game.current_player, 1)
+        self.assertRejected('not_your_turn', game, 2, 'draw')
+        self.assertRejected('no_drawn_card', game, 1, 'discard')
+        self.assertRejected('no_drawn_card', game, 1, 'replace', position=0)
+        game, _ = act(game, 1, 'draw')
+        self.assertRejected('already_drawn', game, 1, 'draw')
+
+    def test_after_the_game_ends(self):
+        game, _ = act(started_game(), 2, 'end_game')
+        self.assertRejected('game_ended', game, 1, 'draw')
+
+    def test_rejected_and_applied_actions_leave_the_state_alone(self):
+        game = started_game()
+        before = game.to_dict()
+        self.assertRejected('not_your_turn', game, 2, 'draw')
+        act(game, 1, 'draw')
+        act(game, 1, 'peek_opponent', position=1)
+        self.assertEqual(game.to_dict(), before)
@@ -0,0 +1,66 @@
+import json
+
+import msgpack
+from django.test import SimpleTestCase
+
+from ..frames import (FIELD_CODES, decode_binary_frame, encode_batch, encode_binary_batch,
+                      encode_binary_frame, encode_frame, event_frame, for_layer, state_patch)
+
+STATE = {
+    'type': 'game_state',
+    'player1_cards': [['K', 'S'], None, None, ['7', 'H']],
+    'player2_cards': [None, None, None, None],
+    'current_player': 2,
+    'drawn_card': None,
+    'version': 7,
+    'seq': 2047,
+}
+
+
+class FrameTests(SimpleTestCase):
+    def test_json_frames_are_compact(self):
+        frame = encode_frame(STATE)
+        self.assertNotIn(' ', frame)
+        self.assertEqual(json.loads(frame), STATE)
+
+    def test_msgpack_frames_use_short_keys_and_round_trip(self):
+        frame = encode_binary_frame(STATE)
+        self.assertEqual(set(msgpack.unpackb(frame)), {FIELD_CODES[key] for key in STATE})
+        self.assertEqual(decode_binary_frame(frame), STATE)
+
+    def test_decode_rejects_anything_but_a_map(self):
+        with self.assertRaises(ValueError):
+            decode_binary_frame(msgpack.packb([1, 2]))
+
+    def test_batches_wrap_encoded_frames(self):
+        update = {'type': 'game_update', 'card': ['2', 'D'], 'player': 1, 'seq': 2048}
+        text = encode_batch([encode_frame(update), encode_frame(STATE)])
+        self.assertEqual(json.loads(text), {'type': 'batch', 'frames': [update, STATE]})
+        binary = encode_binary_batch([encode_binary_frame(update), encode_binary_frame(STATE)])
+        self.assertEqual(decode_binary_frame(binary), {'type': 'batch', 'frames': [update, STATE]})
+
+    def test_state_patch_holds_only_changed_fields(self):
+        new = dict(STATE, current_player=1, drawn_card=['3', 'C'], version=8)
+        self.assertEqual(state_patch(STATE, new), {'current_player': 1, 'drawn_card': ['3', 'C']})
+
+
+class EventFrameTests(SimpleTestCase):
+    def test_frames_are_encoded_on_first_use_and_kept(self):
+        event = {'type': 'game_state', 'seq': 2047, 'frame': STATE}
+        text = event_frame(event, 'frame', False)
+        self.assertEqual(text, encode_frame(STATE))
+        self.assertIs(event_frame(event, 'frame', False), text)
+        self.assertNotIn('frame_bytes', event)
+
+    def test_layer_events_carry_every_encoding_and_no_messages(self):
+        patch = {'type': 'game_patch', 'version': 8, 'base_version': 7, 'changes': {'current_player': 1}}
+        state = {'type': 'game_state', 'seq': 2303, 'version': 8, 'base_version': 7, 'frame': STATE, 'patch': patch}
+        update = {'type': 'game_update', 'seq': 2048, 'frame': {'type': 'game_update', 'card': None, 'player': 1}}
+        sent = for_layer({'type': 'game_batch', 'events': [update, state]})
+        self.assertEqual([set(event) for event in sent['events']], [
+            {'type', 'seq', 'frame_text', 'frame_bytes'},
+            {'type', 'seq', 'version', 'base_version', 'frame_text', 'frame_bytes', 'patch_text', 'patch_bytes'},
+        ])
+        self.assertEqual(decode_binary_frame(sent['events'][1]['patch_bytes']), patch)
+        # Recipients of the layer copy use its encodings as they are.
+        self.assertIs(event_frame(sent['events'][1], 'frame', False), sent['events'][1]['frame_text'])
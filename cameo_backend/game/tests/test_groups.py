@@ -0,0 +1,90 @@
+from unittest import mock
+
+from channels.layers import channel_layers, get_channel_layer
+from channels_redis.core import RedisChannelLayer
+from django.test import SimpleTestCase, override_settings
+
+from .. import groups
+from ..frames import encode_frame
+
+EVENT = {'type': 'game_state', 'seq': 1, 'frame': {'type': 'game_state', 'version': 1}}
+
+
+class Member:
+    """A consumer as far as ``groups`` is concerned."""
+
+    def __init__(self, channel_name):
+        self.channel_name = channel_name
+        self.received = []
+
+    async def game_state(self, event):
+        self.received.append(event)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class GroupSendTests(SimpleTestCase):
+    def setUp(self):
+        channel_layers.backends.clear()
+        self.addCleanup(channel_layers.backends.clear)
+        self.addCleanup(groups._local.clear)
+
+    async def member(self, group, local=True):
+        layer = get_channel_layer()
+        member = Member(await layer.new_channel())
+        await layer.group_add(group, member.channel_name)
+        if local:
+            groups.join(group, member)
+        return member
+
+    async def test_local_members_are_called_and_remote_ones_sent_through_the_layer(self):
+        layer = get_channel_layer()
+        local = await self.member('g')
+        remote = await self.member('g', local=False)
+        with mock.patch.object(layer, 'group_send', wraps=layer.group_send) as layer_group_send:
+            await groups.group_send('g', dict(EVENT))
+        layer_group_send.assert_not_called()
+        self.assertEqual([event['frame'] for event in local.received], [EVENT['frame']])
+        sent = await layer.receive(remote.channel_name)
+        self.assertEqual(sent['frame_text'], encode_frame(EVENT['frame']))
+
+    async def test_groups_without_local_members_use_group_send(self):
+        layer = get_channel_layer()
+        remote = await self.member('g', local=False)
+        with mock.patch.object(layer, 'group_send', wraps=layer.group_send) as layer_group_send:
+            await groups.group_send('g', dict(EVENT))
+        layer_group_send.assert_called_once()
+        self.assertIn('frame_bytes', await layer.receive(remote.channel_name))
+
+    async def test_empty_groups_are_not_sent_to(self):
+        layer = get_channel_layer()
+        with mock.patch.object(layer, 'group_send') as layer_group_send:
+            await groups.group_send('nobody', dict(EVENT))
+        layer_group_send.assert_not_called()
+
+    async def test_left_members_are_no_longer_called(self):
+        member = await self.member('g')
+        groups.leave('g', member)
+        await groups.group_send('g', dict(EVENT))
+        self.assertEqual(member.received, [])
+
+
+class RedisInternalsTests(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(groups._unsupported.clear)
+
+    def test_redis_layers_without_the_internals_take_the_normal_path(self):
+        layer = RedisChannelLayer(hosts=['redis://127.0.0.1:1'])
+        self.assertTrue(groups._lists_members(layer))
+        with mock.patch.object(RedisChannelLayer, 'consistent_hash', None):
+            self.assertFalse(groups._lists_members(layer))
+            self.assertEqual(groups.cache_ttl(layer), 0)
+
+    async def test_a_failing_lookup_falls_back_to_group_send_from_then_on(self):
+        layer = RedisChannelLayer(hosts=['redis://127.0.0.1:1'])
+        with mock.patch.object(RedisChannelLayer, '_group_key', side_effect=TypeError), \
+                mock.patch.object(groups, 'get_channel_layer', return_value=layer), \
+                mock.patch.object(layer, 'group_send') as layer_group_send, \
+                self.assertLogs('game.groups', 'ERROR'):
+            await groups.group_send('g', dict(EVENT))
+        layer_group_send.assert_called_once()
+        self.assertFalse(groups._lists_members(layer))
@@ -0,0 +1,74 @@
+from django.test import SimpleTestCase
+
+from .. import history, metrics
+from ..store import get_store
+from .helpers import LiveGameTestCase, Socket
+
+
+def is_state(message):
+    return message.get('type') == 'game_state'
+
+
+class SeqTests(SimpleTestCase):
+    def test_a_broadcast_ends_on_its_version_snapshot_seq(self):
+        seqs = [history.frame_seq(7, i, 3) for i in range(3)]
+        self.assertEqual(seqs, [7 * 256, 7 * 256 + 1, history.snapshot_seq(7)])
+        self.assertLess(history.snapshot_seq(7), history.frame_seq(8, 0, 2))
+
+    def test_broadcasts_too_long_to_number_are_refused(self):
+        history.frame_seq(7, 0, history.SEQ_PER_VERSION)
+        with self.assertRaises(ValueError):
+            history.frame_seq(7, 0, history.SEQ_PER_VERSION + 1)
+
+
+class ResumeTests(LiveGameTestCase):
+    live_settings = {'GAME_RESUME_BUFFER_SIZE': 1}
+
+    def resumes(self, result):
+        return metrics.resumes._values.get((result,), 0)
+
+    async def reconnect(self, code, since):
+        socket = Socket(self.seat_path(code, 2) + f'&since={since}')
+        self.assertTrue(await socket.connect())
+        return socket
+
+    async def test_a_reconnect_gets_just_the_frames_it_missed(self):
+        code = self.create_game()
+        sockets = await self.seats(code)
+        await self.play(sockets[1], 1, 'peek_own', position=2)
+        last = await sockets[2].until(is_state)
+        await sockets[2].close()
+        await self.play(sockets[1], 1, 'peek_own', position=3)
+        await sockets[1].until(is_state)
+
+        replayed = self.resumes('frames')
+        socket = await self.reconnect(code, last['seq'])
+        missed = await socket.until(is_state)
+        self.assertEqual(self.resumes('frames'), replayed + 1)
+        self.assertEqual(missed['version'], last['version'] + 1)
+        self.assertEqual(missed['seq'], history.snapshot_seq(missed['version']))
+        self.assertEqual(missed['player1_peeked'], [False, False, True, True])
+        self.assertTrue(await socket.nothing())
+        await self.play(socket, 2, 'peek_own', position=2)
+        self.assertEqual((await socket.until(is_state))['version'], last['version'] + 2)
+        for socket in [socket, sockets[1]]:
+            await socket.close()
+
+    async def test_a_reconnect_from_beyond_the_buffer_gets_a_snapshot(self):
+        code = self.create_game()
+        sockets = await self.seats(code)
+        since = history.snapshot_seq(get_store().get(code).version)
+        await sockets[2].close()
+        for position in (2, 3):
+            await self.play(sockets[1], 1, 'peek_own', position=position)
+            await sockets[1].until(is_state)
+
+        snapshots = self.resumes('snapshot')
+        socket = await self.reconnect(code, since)
+        snapshot = await socket.until(is_state)
+        self.assertEqual(self.resumes('snapshot'), snapshots + 1)
+        self.assertEqual(snapshot['seq'], history.snapshot_seq(snapshot['version']))
+        self.assertEqual(snapshot['player1_peeked'], [False, False, True, True])
+        self.assertTrue(await socket.nothing())
+        for socket in [socket, sockets[1]]:
+            await socket.close()
@@ -0,0 +1,141 @@
+import asyncio
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from .. import matchmaking
+from ..matchmaking import PENDING, InMemoryMatchQueue
+from ..tokens import check_seat_token
+from .helpers import LiveGameTestCase
+
+
+class InMemoryMatchQueueTests(SimpleTestCase):
+    def setUp(self):
+        self.queue = InMemoryMatchQueue()
+
+    def test_pairs_the_longest_waiting_ticket(self):
+        self.assertIsNone(self.queue.pair('a', 'any', 30))
+        self.assertIsNone(self.queue.pair('b', '7', 30))
+        self.assertEqual(self.queue.pair('c', 'any', 30), 'a')
+        self.assertEqual(self.queue.result('a'), PENDING)
+        self.assertIsNone(self.queue.touch('a', 30))
+        self.assertIsNone(self.queue.pair('d', 'any', 30))
+        self.assertEqual(self.queue.touch('d', 30), 'any')
+        self.assertEqual(self.queue.pair('e', '7', 30), 'b')
+
+    def test_a_ticket_is_not_paired_with_itself(self):
+        self.assertIsNone(self.queue.pair('a', 'any', 30))
+        self.assertIsNone(self.queue.pair('a', 'any', 30))
+        self.assertEqual(self.queue.pair('b', 'any', 30), 'a')
+
+    def test_expired_and_departed_tickets_are_skipped(self):
+        self.queue.pair('gone', 'any', 30)
+        self.queue.leave('gone')
+        self.queue.pair('stale', 'any', -1)
+        self.queue.pair('live', 'any', 30)
+        self.assertEqual(self.queue.pair('new', 'any', 30), 'live')
+        self.assertIsNone(self.queue.result('stale'))
+
+    def test_requeue_puts_a_ticket_first_and_clears_its_result(self):
+        self.queue.pair('a', 'any', 30)
+        self.assertEqual(self.queue.pair('b', 'any', 30), 'a')
+        self.assertIsNone(self.queue.pair('c', 'any', 30))
+        self.queue.requeue('a', 'any', 30)
+        self.assertIsNone(self.queue.result('a'))
+        self.assertEqual(self.queue.pair('d', 'any', 30), 'a')
+
+    def test_assign_wakes_the_waiting_request(self):
+        async def scenario():
+            waiting = asyncio.ensure_future(self.queue.wait('a', 2))
+            await asyncio.sleep(0.05)
+            self.queue.assign('a', '123456')
+            return await waiting, await self.queue.wait('b', 0.01)
+
+        self.assertEqual(asyncio.run(scenario()), ('123456', None))
+        self.assertEqual(self.queue.result('a'), '123456')
+
+
+class MatchmakeViewTests(LiveGameTestCase):
+    live_settings = {'GAME_MATCH_WAIT': 0.5}
+
+    def setUp(self):
+        matchmaking._queue = None
+
+    def tearDown(self):
+        matchmaking._queue = None
+
+    async def post(self, **data):
+        response = await self.async_client.post('/api/matchmake/', json.dumps(data), content_type='application/json')
+        return response.status_code, response.json()
+
+    def assertSeat(self, body, player):
+        self.assertEqual(body['player'], player)
+        self.assertTrue(check_seat_token(body['code'], player, body['token']))
+
+    def test_two_players_are_seated_in_one_game(self):
+        async def scenario():
+            waiting = asyncio.ensure_future(self.post())
+            await asyncio.sleep(0.1)
+            return await self.post(), await waiting
+
+        (status2, second), (status1, first) = asyncio.run(scenario())
+        self.assertEqual((status1, status2), (200, 200))
+        self.assertSeat(first, 1)
+        self.assertSeat(second, 2)
+        self.assertEqual(first['code'], second['code'])
+
+    def test_a_ticket_keeps_its_place_across_polls(self):
+        async def scenario():
+            status, body = await self.post(rating=1450)
+            self.assertEqual(status, 202)
+            polling = asyncio.ensure_future(self.post(ticket=body['ticket']))
+            await asyncio.sleep(0.1)
+            return await self.post(rating=1499), await polling
+
+        (_, second), (status, first) = asyncio.run(scenario())
+        self.assertEqual(status, 200)
+        self.assertSeat(first, 1)
+        self.assertEqual(first['code'], second['code'])
+
+    def test_a_popped_ticket_waits_for_its_game_instead_of_queueing_again(self):
+        queue = matchmaking.get_queue()
+        code = self.create_game()
+
+        async def scenario():
+            self.assertIsNone(queue.pair('waiting', 'any', 30))
+            # Another request has popped the ticket but not created the game yet.
+            self.assertEqual(queue.pair('pairing', 'any', 30), 'waiting')
+            polling = asyncio.ensure_future(self.post(ticket='waiting'))
+            await asyncio.sleep(0.1)
+            self.assertIsNone(queue.touch('waiting', 30))
+            queue.assign('waiting', code)
+            return await polling
+
+        status, body = asyncio.run(scenario())
+        self.assertEqual(status, 200)
+        self.assertEqual(body['code'], code)
+        self.assertSeat(body, 1)
+        # It was never queued again, so nobody can be paired with it.
+        self.assertIsNone(queue.pair('late', 'any', 30))
+
+    def test_a_ticket_whose_game_could_not_be_created_is_next_in_line(self):
+        async def scenario():
+            _, body = await self.post()
+            with mock.patch('game.views.create_game', return_value=None):
+                refused = await self.post()
+            return body['ticket'], refused
+
+        ticket, (status, _) = asyncio.run(scenario())
+        self.assertEqual(status, 503)
+        self.assertEqual(matchmaking.get_queue().pair('next', 'any', 30), ticket)
+
+    def test_leaving_the_queue(self):
+        async def scenario():
+            _, body = await self.post()
+            response = await self.async_client.delete(f'/api/matchmake/?ticket={body["ticket"]}')
+            self.assertEqual(response.status_code, 204)
+            return await self.post()
+
+        status, body = asyncio.run(scenario())
+        self.assertEqual(status, 202)
@@ -0,0 +1,61 @@
+from django.test import SimpleTestCase
+
+from .. import metrics
+from .helpers import LiveGameTestCase
+
+
+class MetricTests(SimpleTestCase):
+    def metric(self, cls, *args, **kwargs):
+        metric = cls(*args, **kwargs)
+        self.addCleanup(metrics._registry.remove, metric)
+        return metric
+
+    def test_counters_and_gauges_render_per_label(self):
+        counter = self.metric(metrics.Counter, 'test_total', 'A counter.', ['kind'])
+        counter.inc(kind='a')
+        counter.inc(2, kind='b"c')
+        gauge = self.metric(metrics.Gauge, 'test_open', 'A gauge.')
+        gauge.inc(3)
+        gauge.dec()
+        self.assertEqual(counter.render(), [
+            '# HELP test_total A counter.', '# TYPE test_total counter',
+            'test_total{kind="a"} 1', 'test_total{kind="b\\"c"} 2',
+        ])
+        self.assertEqual(gauge.render()[2:], ['test_open 2'])
+
+    def test_histograms_render_cumulative_buckets(self):
+        histogram = self.metric(metrics.Histogram, 'test_seconds', 'A histogram.', buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.render()[2:], [
+            'test_seconds_bucket{le="0.1"} 2',
+            'test_seconds_bucket{le="1.0"} 3',
+            'test_seconds_bucket{le="+Inf"} 4',
+            'test_seconds_count 4',
+            'test_seconds_sum 3.65',
+        ])
+
+
+class MetricsEndpointTests(LiveGameTestCase):
+    def scrape(self):
+        response = self.client.get('/api/metrics')
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        return response.content.decode().splitlines()
+
+    def sample(self, lines, name):
+        values = [float(line.rsplit(' ', 1)[1]) for line in lines if line.startswith(name + ' ')]
+        return values[0] if values else 0
+
+    async def test_actions_sockets_and_games_are_counted(self):
+        before = self.sample(self.scrape(), 'cameo_actions_processed_total{action="peek_own"}')
+        code = self.create_game()
+        sockets = await self.seats(code)
+        await self.play(sockets[1], 1, 'peek_own', position=2)
+        await sockets[1].until(lambda message: message.get('type') == 'game_state')
+        lines = self.scrape()
+        self.assertEqual(self.sample(lines, 'cameo_actions_processed_total{action="peek_own"}'), before + 1)
+        self.assertGreaterEqual(self.sample(lines, 'cameo_websocket_connections{seat="player1"}'), 1)
+        self.assertGreaterEqual(self.sample(lines, 'cameo_games{phase="peeking"}'), 1)
+        self.assertGreaterEqual(self.sample(lines, 'cameo_action_broadcast_seconds_count'), 1)
+        for socket in sockets.values():
+            await socket.close()
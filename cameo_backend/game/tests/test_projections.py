@@ -0,0 +1,89 @@
+from django.test import SimpleTestCase
+
+from .. import projections
+from ..state import card_to_wire, join_game
+from .helpers import act, new_game, started_game
+
+
+class ProjectionTests(SimpleTestCase):
+    def setUp(self):
+        projections._projections.clear()
+
+    def visible(self, game, seat, hand):
+        return [i for i, card in enumerate(projections.project(game, seat)[hand]) if card is not None]
+
+    def test_players_see_only_the_cards_they_peeked(self):
+        game = new_game()
+        join_game(game)
+        game, _ = act(game, 1, 'peek_own', position=2)
+        self.assertEqual(self.visible(game, 'player1', 'player1_cards'), [2])
+        self.assertEqual(self.visible(game, 'player1', 'player2_cards'), [])
+        self.assertEqual(self.visible(game, 'player2', 'player1_cards'), [])
+        self.assertEqual(self.visible(game, 'player2', 'player2_cards'), [])
+        for hand in ('player1_cards', 'player2_cards'):
+            self.assertEqual(self.visible(game, 'spectator', hand), [])
+
+    def test_peek_opponent_shows_the_card_to_the_peeker(self):
+        game, _ = act(started_game(), 1, 'peek_opponent', position=0)
+        self.assertEqual(self.visible(game, 'player1', 'player2_cards'), [0])
+        self.assertEqual(projections.project(game, 'player1')['player2_cards'][0],
+                         card_to_wire(game.player2_cards[0]))
+        # The owner hasn't looked at it, and spectators never see hands.
+        self.assertEqual(self.visible(game, 'player2', 'player2_cards'), [2, 3])
+        self.assertEqual(self.visible(game, 'spectator', 'player2_cards'), [])
+
+    def test_hand_swaps_move_what_each_player_has_seen_with_the_cards(self):
+        game = started_game()
+        own, theirs = game.player1_cards[2], game.player2_cards[0]
+        game, _ = act(game, 1, 'swap', pos1=2, pos2=0)
+        # Player 1 had seen only the card they gave away, now at player 2's 0.
+        self.assertEqual(self.visible(game, 'player1', 'player1_cards'), [3])
+        self.assertEqual(self.visible(game, 'player1', 'player2_cards'), [0])
+        self.assertEqual(projections.project(game, 'player1')['player2_cards'][0], card_to_wire(own))
+        # Player 2 had seen neither.
+        self.assertEqual(self.visible(game, 'player2', 'player2_cards'), [2, 3])
+        self.assertEqual(self.visible(game, 'player2', 'player1_cards'), [])
+        self.assertEqual(game.player1_cards[2], theirs)
+
+    def test_hand_swaps_carry_opponent_peeks(self):
+        game, _ = act(started_game(), 1, 'peek_opponent', position=3)
+        game, _ = act(game, 2, 'swap', pos1=0, pos2=3)
+        # The card player 1 peeked at is in their own hand now.
+        self.assertEqual(self.visible(game, 'player1', 'player1_cards'), [0, 2, 3])
+        self.assertEqual(self.visible(game, 'player1', 'player2_cards'), [])
+        # Player 2's own card at 3 went to player 1, which player 2 still knows.
+        self.assertEqual(self.visible(game, 'player2', 'player1_cards'), [0])
+        self.assertEqual(self.visible(game, 'player2', 'player2_cards'), [2])
+
+    def test_a_drawn_card_put_in_the_hand_is_seen_by_the_drawer_only(self):
+        game, _ = act(started_game(), 1, 'peek_opponent', position=0)
+        game, _ = act(game, 2, 'peek_opponent', position=1)
+        game, _ = act(game, 1, 'draw')
+        game, _ = act(game, 1, 'replace', position=1)
+        self.assertEqual(self.visible(game, 'player1', 'player1_cards'), [1, 2, 3])
+        self.assertEqual(self.visible(game, 'player2', 'player1_cards'), [])
+        game, _ = act(game, 2, 'draw')
+        drawn = game.drawn_card
+        game, _ = act(game, 2, 'swap', pos=0)
+        self.assertEqual(projections.project(game, 'player2')['player2_cards'][0], card_to_wire(drawn))
+        self.assertEqual(self.visible(game, 'player2', 'player2_cards'), [0, 2, 3])
+        self.assertEqual(self.visible(game, 'player1', 'player2_cards'), [])
+
+    def test_drawn_card_is_only_shown_to_the_drawer(self):
+        game, _ = act(started_game(), 1, 'draw')
+        self.assertIsNotNone(projections.project(game, 'player1')['drawn_card'])
+        self.assertIsNone(projections.project(game, 'player2')['drawn_card'])
+        self.assertIsNone(projections.project(game, 'spectator')['drawn_card'])
+
+    def test_game_update_hides_the_card_from_everyone_else(self):
+        game = started_game()
+        message = {'type': 'game_update', 'card': ['K', 'S'], 'player': 1}
+        self.assertEqual(projections.project_message(message, game, 'player1')['card'], ['K', 'S'])
+        self.assertIsNone(projections.project_message(message, game, 'player2')['card'])
+        self.assertIsNone(projections.project_message(message, game, 'spectator')['card'])
+
+    def test_everything_is_revealed_at_the_end(self):
+        game, _ = act(started_game(), 1, 'end_game')
+        for seat in projections.SEATS:
+            for hand in ('player1_cards', 'player2_cards'):
+                self.assertEqual(self.visible(game, seat, hand), [0, 1, 2, 3])
@@ -0,0 +1,60 @@
+from io import StringIO
+
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from .. import simulator
+from ..state import Deck, hand_score
+
+RED_KING, BLACK_KING = Deck.ranks.index('K'), 3 * 13 + Deck.ranks.index('K')
+ACE, TWO = 0, 1  # Of hearts
+QUEEN = Deck.ranks.index('Q')
+
+
+class SimulatorTests(SimpleTestCase):
+    def test_deals_are_shuffled_decks_with_the_bottom_cards_seen(self):
+        games = simulator.deal(100, seed=1)
+        self.assertTrue((np.sort(games.deck, axis=1) == np.arange(52)).all())
+        self.assertTrue((games.hands[:, 0] == games.deck[:, 51:47:-1]).all())
+        self.assertTrue((games.seen[:, :, 2:]).all())
+        self.assertFalse((games.seen[:, :, :2]).any())
+        self.assertTrue((simulator.deal(100, seed=1).deck == games.deck).all())
+
+    def test_played_games_are_scored_from_the_final_hands(self):
+        games = simulator.deal(500, seed=2)
+        results = simulator.play(games)
+        for index in range(0, 500, 50):
+            scores = [hand_score(games.hands[index, seat].tolist()) for seat in (0, 1)]
+            self.assertEqual(results.scores[index].tolist(), scores)
+            expected = simulator.TIE if scores[0] == scores[1] else int(scores[1] < scores[0])
+            self.assertEqual(results.winner[index], expected)
+        self.assertTrue(np.isin(results.ender, (0, 1)).all())
+
+    def test_a_player_satisfied_with_any_hand_ends_at_once(self):
+        results = simulator.play(simulator.deal(50, seed=3), (simulator.Strategy(end_at=1000), simulator.Strategy()))
+        self.assertTrue((results.ender == 0).all())
+        self.assertTrue((results.turns == 0).all())
+
+    def test_simulated_games_match_the_rules_engine(self):
+        out = StringIO()
+        call_command('simulate', games=200, check=50, stdout=out)
+        self.assertIn('50 simulated games match the rules engine', out.getvalue())
+
+
+class ChooseTests(SimpleTestCase):
+    def choose(self, hand, drawn, deck_size=30):
+        return simulator.choose(hand, drawn, deck_size, budget=0, seed=0)
+
+    def test_a_red_king_replaces_the_worst_card(self):
+        self.assertEqual(self.choose([ACE, TWO, QUEEN, ACE], RED_KING), 2)
+
+    def test_a_black_king_is_discarded(self):
+        self.assertEqual(self.choose([ACE, TWO, QUEEN, ACE], BLACK_KING), 'discard')
+
+    def test_a_strong_hand_ends_the_game_and_a_weak_one_draws(self):
+        self.assertEqual(self.choose([ACE, RED_KING, ACE + 13, 13 + RED_KING], None), 'end')
+        self.assertEqual(self.choose([None, None, QUEEN, BLACK_KING], None), 'draw')
+
+    def test_an_empty_deck_ends_the_game(self):
+        self.assertEqual(self.choose([None, None, QUEEN, BLACK_KING], None, deck_size=0), 'end')
@@ -0,0 +1,38 @@
+import os
+import tempfile
+
+from django.test import SimpleTestCase
+
+from ..snapshots import Snapshotter, read_snapshot
+from ..state import GameState, join_game
+from ..store import InMemoryGameStore
+
+
+class SnapshotTests(SimpleTestCase):
+    def assertSameGame(self, decoded, game):
+        self.assertEqual(decoded.to_dict(), game.to_dict())
+        self.assertEqual(decoded.version, game.version)
+
+    def test_snapshot_round_trip(self):
+        store = InMemoryGameStore(GameState)
+        for code in ('111111', '222222', '333333'):
+            store.create(GameState(code))
+        store.update('222222', join_game)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'games.snapshot')
+            snapshotter = Snapshotter(store, path)
+            self.assertEqual(snapshotter.snapshot(), 3)
+            store.delete('333333')
+            store.update('111111', join_game)
+            self.assertEqual(snapshotter.snapshot(), 2)
+
+            games = read_snapshot(path, GameState)
+            self.assertEqual(sorted(games), ['111111', '222222'])
+            for code, game in games.items():
+                self.assertSameGame(game, store.get(code))
+
+            restored = InMemoryGameStore(GameState)
+            reserved = []
+            self.assertEqual(Snapshotter(restored, path).restore(reserved.append), 2)
+            self.assertEqual(sorted(reserved), ['111111', '222222'])
+            self.assertEqual(restored.versions(), store.versions())
@@ -0,0 +1,30 @@
+from django.test import SimpleTestCase
+
+from ..state import GameState
+from .helpers import act, new_game, started_game
+
+
+class EncodingTests(SimpleTestCase):
+    def assertSameGame(self, decoded, game):
+        self.assertEqual(decoded.to_dict(), game.to_dict())
+        self.assertEqual(decoded.version, game.version)
+
+    def test_bytes_round_trip_in_every_phase(self):
+        lobby = new_game()
+        started = started_game()
+        drawn, _ = act(started, 1, 'draw')
+        peeked, _ = act(started, 1, 'peek_opponent', position=0)
+        ended, _ = act(drawn, 2, 'end_game')
+        for game in (lobby, started, drawn, peeked, ended):
+            with self.subTest(phase=game.phase):
+                self.assertSameGame(GameState.from_bytes(game.to_bytes()), game)
+
+    def test_from_bytes_at_an_offset(self):
+        game = started_game()
+        self.assertSameGame(GameState.from_bytes(b'junk' + game.to_bytes(), 4), game)
+
+    def test_dict_round_trip(self):
+        peeked, _ = act(started_game(), 1, 'peek_opponent', position=0)
+        for game in (new_game(), peeked):
+            with self.subTest(phase=game.phase):
+                self.assertSameGame(GameState.from_dict(game.to_dict(), game.version), game)
@@ -0,0 +1,48 @@
+from django.test import SimpleTestCase
+
+from ..state import GameState, join_game
+from ..store import InMemoryGameStore, StoreConflict
+
+
+class StoreTests(SimpleTestCase):
+    def setUp(self):
+        self.store = InMemoryGameStore(GameState)
+        self.store.create(GameState('123456'))
+
+    def test_save_with_stale_version_fails(self):
+        first, second = self.store.get('123456'), self.store.get('123456')
+        self.assertTrue(self.store.save(first))
+        self.assertEqual(first.version, 2)
+        self.assertFalse(self.store.save(second))
+        self.assertEqual(self.store.get('123456').version, 2)
+
+    def test_update_retries_after_a_conflict(self):
+        calls = []
+
+        def mutate(game):
+            calls.append(game.version)
+            if len(calls) == 1:
+                # Someone else saves between our read and our write.
+                self.store.save(self.store.get('123456'))
+            return join_game(game)
+
+        game, joined = self.store.update('123456', mutate)
+        self.assertTrue(joined)
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(game.version, 3)
+        self.assertIsNotNone(self.store.get('123456').player2_cards)
+
+    def test_update_gives_up_after_repeated_conflicts(self):
+        def mutate(game):
+            self.store.save(self.store.get('123456'))
+
+        with self.assertRaises(StoreConflict):
+            self.store.update('123456', mutate)
+
+    def test_update_of_a_missing_game(self):
+        self.assertEqual(self.store.update('000000', join_game), (None, None))
+
+    def test_get_returns_a_private_copy(self):
+        game = self.store.get('123456')
+        join_game(game)
+        self.assertIsNone(self.store.get('123456').player2_cards)
@@ -0,0 +1,19 @@
+"""
+Seat tokens. StartGame, ConnectGame and Matchmake give each player a token
+for their seat, and the game socket has to present it (``?token=``) to be
+sent that seat's projection and to act for it; a game code alone only gets
+the spectator view.
+
+Tokens are HMACs of the code and seat under ``SECRET_KEY``, so any worker
+can check one without a lookup.
+"""
+from django.core import signing
+from django.utils.crypto import constant_time_compare
+
+
+def seat_token(code, player):
+    return signing.Signer(salt='game.seat').signature(f'{code}:{player}')
+
+
+def check_seat_token(code, player, token):
+    return bool(token) and constant_time_compare(token, seat_token(code, player))
@@ -1,45 +1,34 @@
 from django.shortcuts import render
-from django.http import FileResponse, Http404
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
 from django.views.decorators.clickjacking import xframe_options_exempt
+from django.views.decorators.csrf import csrf_exempt
+from asgiref.sync import sync_to_async
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.conf import settings
-import random
+import json
+import logging
 import os
+from . import metrics
+from .action_log import JOIN, get_action_log
+from .codes import CodeSpaceExhausted, get_allocator
+from .state import GameState, join_game
+from .store import get_store, StoreConflict
+from .tokens import seat_token
 
-class Deck:
-    suits = ['H', 'D', 'C', 'S']
-    ranks = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K']
-    values = {'A': 1, '2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8, '9': 9, '10': 10, 'J': 11, 'Q': 12, 'K': 13}
-
-    def __init__(self):
-        self.cards = [(rank, suit) for suit in self.suits for rank in self.ranks]
-        random.shuffle(self.cards)
-
-    def draw(self, num=1):
-        return [self.cards.pop() for _ in range(min(num, len(self.cards)))]
-
-class GameState:
-    def __init__(self, code):
-        self.code = code
-        self.deck = Deck()
-        self.player1_cards = self.deck.draw(4)
-        self.player2_cards = None
-        self.player1_peeked = [False] * 4
-        self.player2_peeked = None
-        self.current_player = 1
-        self.game_ended = False
-        self.winner = None
-        self.game_started = False
-        self.drawn_card = None
-        self.drawn_by = None
-        self.reveal_all = False  # Define reveal_all here
-
-games = {}
+logger = logging.getLogger(__name__)
+
+CREATE_ATTEMPTS = 10
 
 def index(request):
     return render(request, 'index.html')
 
+def metrics_view(request):
+    """This worker's metrics in the Prometheus text format."""
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 #@xframe_options_exempt
 #def serve_rules_pdf(request):
 #    pdf_path = os.path.join(settings.STATIC_ROOT, 'cameo_game_rules.pdf')
@@ -51,22 +40,175 @@ def index(request):
 
 class StartGame(APIView):
     def post(self, request):
-        code = str(random.randint(100000, 999999))
-        games[code] = GameState(code)
-        return Response({'code': code, 'player': 1})
+        bot = bool(request.data.get('bot'))
+        if bot:
+            # Only bot games need bots (and NumPy) imported.
+            from . import bots
+
+            if not bots.available():
+                return Response({'error': 'No bot available, try again later'}, status=503)
+        game = create_game()
+        if game is None:
+            return Response({'error': 'Could not allocate a game code'}, status=503)
+        if bot:
+            # Nobody else has the code yet, so the seat is free.
+            seat_player2(game.code)
+            bots.start(game.code)
+        return Response(_seat(game.code, 1))
+
+def _seat(code, player):
+    """What a player needs to open their seat's game socket."""
+    return {'code': code, 'player': player, 'token': seat_token(code, player)}
+
+def create_game():
+    """A new game under a free code, its action log started; None if no code is free."""
+    store = get_store()
+    allocator = get_allocator()
+    for _ in range(CREATE_ATTEMPTS):
+        try:
+            code = allocator.allocate()
+        except CodeSpaceExhausted:
+            logger.error("No free game codes left")
+            break
+        # Only fails if another worker reclaimed the same expired code.
+        game = GameState(code)
+        if store.create(game):
+            get_action_log().record_start(game)
+            logger.info("Created game %s", code)
+            return game
+    return None
+
+class ReplayGame(APIView):
+    """
+    Any version of a game rebuilt from its action log, for post-game review
+    and debugging. Live games are only replayable with DEBUG on or by staff,
+    since the replay shows every card.
+    """
+    def get(self, request, code):
+        from .actions import state_message
+
+        log = get_action_log()
+        latest = log.replay(code)
+        if latest is None:
+            return Response({'error': 'No action log for this game'}, status=404)
+        if not (latest.game_ended or settings.DEBUG or request.user.is_staff):
+            return Response({'error': 'Replay is available once the game has ended'}, status=403)
+        version = request.query_params.get('version')
+        if version is None:
+            game = latest
+        else:
+            try:
+                game = log.replay(code, int(version))
+            except ValueError:
+                return Response({'error': 'Invalid version'}, status=400)
+        state = dict(state_message(game), game_ended=game.game_ended, winner=game.winner)
+        return Response({'code': code, 'version': game.version, 'latest_version': latest.version, 'state': state})
 
 class ConnectGame(APIView):
     def post(self, request):
         code = request.data.get('code')
-        print(f"Connect attempt with code: {code}")
-        if code in games:
-            if games[code].player2_cards is None:
-                games[code].player2_cards = games[code].deck.draw(4)
-                games[code].player2_peeked = [False] * 4
-                print(f"Player 2 connected to game {code}")
-                return Response({'code': code, 'player': 2})
-            else:
-                print(f"Game {code} already full")
-                return Response({'error': 'Game already full'}, status=400)
-        print(f"Invalid game code: {code}")
-        return Response({'error': 'Invalid game code'}, status=400)
\ No newline at end of file
+        logger.debug("Connect attempt with code %s", code)
+        try:
+            game, joined = seat_player2(code) if code else (None, None)
+        except StoreConflict:
+            logger.warning("Game %s is busy", code)
+            return Response({'error': 'Game is busy, try again'}, status=409)
+        if game is None:
+            logger.info("Invalid game code %s", code)
+            return Response({'error': 'Invalid game code'}, status=400)
+        if not joined:
+            logger.info("Game %s already full", code)
+            return Response({'error': 'Game already full'}, status=400)
+        logger.info("Player 2 joined game %s", code)
+        return Response(_seat(code, 2))
+
+def seat_player2(code):
+    """
+    Join player 2 to game ``code`` and log it. Returns the game (None if
+    there is none) and whether this call took the seat. Raises
+    ``StoreConflict`` when the game is too busy to update.
+    """
+    game, joined = get_store().update(code, join_game)
+    if joined:
+        get_action_log().record(code, game.version, [JOIN])
+    return game, joined
+
+@method_decorator(csrf_exempt, name='dispatch')
+class Matchmake(View):
+    """
+    Quick match; see ``matchmaking``. A plain async Django view rather than
+    an ``APIView``: DRF views run in a thread, and a long poll must not
+    hold one for its whole wait.
+    """
+    async def post(self, request):
+        from . import matchmaking
+
+        try:
+            data = json.loads(request.body or b'{}')
+            if not isinstance(data, dict):
+                raise ValueError("Expected an object")
+            ticket = data.get('ticket')
+            rating = data.get('rating')
+            if ticket is not None and not isinstance(ticket, str):
+                raise ValueError("Bad ticket")
+            if rating is not None and (type(rating) not in (int, float) or not 0 <= rating < 1e9):
+                raise ValueError("Bad rating")
+        except ValueError:
+            return JsonResponse({'error': 'Invalid request'}, status=400)
+
+        queue = matchmaking.get_queue()
+        wait = getattr(settings, 'GAME_MATCH_WAIT', 25)
+        ttl = wait + matchmaking.TICKET_GRACE
+        paired = False
+        if ticket:
+            bucket = await sync_to_async(queue.touch, thread_sensitive=False)(ticket, ttl)
+            if bucket is None:
+                # Not queued: either popped, which sets its result in the
+                # same step, or expired.
+                code = await sync_to_async(queue.result, thread_sensitive=False)(ticket)
+                if code:
+                    return JsonResponse(_seat(code, 1))
+                paired = code == matchmaking.PENDING
+        else:
+            ticket, bucket = matchmaking.new_ticket(), None
+        if bucket is None and not paired:
+            bucket = matchmaking.bucket_for(rating)
+            other = await sync_to_async(queue.pair, thread_sensitive=False)(ticket, bucket, ttl)
+            if other is not None:
+                code = await sync_to_async(_start_match, thread_sensitive=False)(queue, other, bucket, ttl)
+                if code is None:
+                    return JsonResponse({'error': 'Could not allocate a game code'}, status=503)
+                return JsonResponse(_seat(code, 2))
+
+        metrics.match_waiters.inc()
+        try:
+            code = await queue.wait(ticket, wait)
+        finally:
+            metrics.match_waiters.dec()
+        if not code:
+            return JsonResponse({'ticket': ticket}, status=202)
+        return JsonResponse(_seat(code, 1))
+
+    async def delete(self, request):
+        from .matchmaking import get_queue
+
+        ticket = request.GET.get('ticket')
+        if ticket:
+            await sync_to_async(get_queue().leave, thread_sensitive=False)(ticket)
+        return HttpResponse(status=204)
+
+def _start_match(queue, ticket, bucket, ttl):
+    """
+    Create a game for the caller and the waiting ``ticket``; the caller
+    takes seat 2. Returns the code, or None (putting ``ticket`` back first
+    in line) when no game could be created.
+    """
+    game = create_game()
+    if game is None:
+        queue.requeue(ticket, bucket, ttl)
+        return None
+    seat_player2(game.code)
+    queue.assign(ticket, game.code)
+    metrics.matches_made.inc()
+    logger.info("Quick match: game %s", game.code)
+    return game.code
@@ -11,24 +11,5 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedStaticFilesStorage'
 # Add whitenoise for better static file serving, but use simpler version
 WHITENOISE_USE_FINDERS = True
 
-# Redis configuration
-REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379')
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
-    },
-}
-
-if REDIS_URL:
-    try:
-        CHANNEL_LAYERS = {
-            'default': {
-                'BACKEND': 'channels_redis.core.RedisChannelLayer',
-                'CONFIG': {
-                    'hosts': [REDIS_URL],
-                },
-            },
-        }
-    except:
-        # Fallback to in-memory channels if Redis isn't available
-        pass 
\ No newline at end of file
+# Redis and the channel layer are configured in cameo_backend/settings.py
+# (REDIS_URL, CHANNEL_LAYER_BACKEND and the CHANNEL_LAYER_* limits).